@@ -25,6 +25,7 @@ import logging
 import copy
 import tempfile
 import queue
+from collections import deque
 
 from listpick.pane.pane_utils import get_file_attributes
 from listpick.pane.left_pane_functions import *
@@ -37,18 +38,30 @@ from listpick.utils.filtering import *
 from listpick.ui.input_field import *
 from listpick.utils.clipboard_operations import *
 from listpick.utils.paste_operations import *
-from listpick.utils.searching import search
+from listpick.utils.searching import search, SearchState
+from listpick.utils.search_and_filter_utils import compile_query, HighlightRules
 from listpick.ui.help_screen import help_lines
 from listpick.ui.keys import picker_keys, notification_keys, options_keys, help_keys
 from listpick.utils.generate_data_multithreaded import generate_picker_data_from_file
+from listpick.utils.generate_cache import ResultCache
+from listpick.utils.cell_scheduler import CellScheduler
 from listpick.utils.dump import dump_state, load_state, dump_data
 from listpick.ui.build_help import build_help_rows
 from listpick.ui.footer import StandardFooter, CompactFooter, NoFooter
+from listpick.ui.frame_buffer import FrameBuffer
 from listpick.utils.picker_log import setup_logger
-from listpick.utils.user_input import get_char, open_tty, restore_terminal_settings
-from listpick.pane.pane_functions import right_split_file_attributes, right_split_file_attributes_dynamic, right_split_graph, right_split_display_list
+from listpick.utils.user_input import get_char, input_pending, open_tty, restore_terminal_settings
+from listpick.pane.pane_functions import right_split_file_attributes, right_split_file_attributes_dynamic, right_split_graph, right_split_display_list, right_split_placeholder
 from listpick.pane.get_data import *
+from listpick.pane.pane_data import PaneDataError, PaneDataService
 from listpick.utils.file_state import FileState, SheetState
+from listpick.utils.column_store import ColumnStore, RowView
+from listpick.utils.lazy_table import LazyTable, LazyIndexedRows, index_table_in_chunks
+from listpick.utils.parallel_filter import ParallelMatcher, FilterCancelled
+from listpick.utils.selection import Selections, CellSelections
+from listpick.utils.row_merge import RowDelta, merge_rows
+from listpick.utils.picker_state import PickerState
+from listpick.utils.event_loop import Wakeup, NotifyingEvent, watch_resize, unwatch_resize, POLL_INTERVAL, DATA_WAKEUP_INTERVAL, TIMER_MARGIN
 
 COLOURS_SET = False
 help_colours, notification_colours = {}, {}
@@ -83,6 +96,7 @@ class Picker:
         track_entries_upon_refresh: bool = True,
         pin_cursor: bool = False,
         id_column: int = 0,
+        merge_rows_on_refresh: bool = False,
 
         unselectable_indices: list =[],
         highlights: list =[],
@@ -133,6 +147,7 @@ class Picker:
         sort_reverse: list[bool] = [False],
         selected_column: int = 0,
         sort_column : int = 0,
+        sort_columns: list[Tuple[int, int, bool]] = [],
 
         columns_sort_method: list[int] = [0],
         key_chain: str = "",
@@ -216,6 +231,7 @@ class Picker:
 
         screen_size_function = lambda stdscr: os.get_terminal_size()[::-1],
         generate_data_for_hidden_columns: bool = False,
+        max_frame_rate: float = 60,
 
 
         # getting_data: threading.Event = threading.Event(),
@@ -223,7 +239,7 @@ class Picker:
     ):
 
         self.screen_size_function = screen_size_function
-        self.stdscr = stdscr
+        self.stdscr = FrameBuffer(stdscr)
         self.items = items
         self.cursor_pos = cursor_pos
         self.colours = get_colours(colour_theme_number)
@@ -244,6 +260,7 @@ class Picker:
         self.track_entries_upon_refresh = track_entries_upon_refresh
         self.pin_cursor = pin_cursor
         self.id_column = id_column
+        self.merge_rows_on_refresh = merge_rows_on_refresh
 
         self.unselectable_indices = unselectable_indices
         self.highlights = highlights
@@ -270,12 +287,22 @@ class Picker:
         self.search_count = search_count
         self.search_index = search_index
         self.filter_query = filter_query
+        self.filter_state = FilterState()
+        self.search_state = SearchState()
+        # Increased whenever indexed_items is re-sorted in place; see search_cache_keys()
+        self.sort_version = 0
+        self.parallel_matcher = ParallelMatcher()
+        self.tty_fd = None
+        self.sort_key_cache = SortKeyCache()
+        self.row_string_cache = RowStringCache()
+        self.highlight_rules = HighlightRules()
+        self.highlight_span_cache = HighlightSpanCache()
         self.hidden_columns = hidden_columns
         self.indexed_items = indexed_items
         self.scroll_bar = scroll_bar
 
-        self.selections = selections
-        self.cell_selections = cell_selections
+        self.selections = Selections.from_dict(selections)
+        self.cell_selections = CellSelections.from_dict(cell_selections)
         self.selected_cells_by_row = selected_cells_by_row
         self.highlight_full_row = highlight_full_row
         self.crosshair_cursor = crosshair_cursor
@@ -290,6 +317,7 @@ class Picker:
         self.sort_reverse = sort_reverse
         self.selected_column = selected_column
         self.sort_column = sort_column
+        self.sort_columns = sort_columns
         self.columns_sort_method = columns_sort_method
         self.key_chain = key_chain
         self.last_key = last_key
@@ -349,6 +377,8 @@ class Picker:
         self.refreshing_data = False
         self.data_lock = threading.Lock()
         self.data_ready = False
+        self.row_delta = None       # Rows merged in place by fetch_data(); see apply_row_delta()
+        self.retired_tables = []    # LazyTables replaced by fetch_data(); closed once indexed_items no longer uses them
         self.cursor_pos_id = 0
         self.cursor_pos_prev = 0
         self.ids = []
@@ -397,10 +427,34 @@ class Picker:
         self.visible_rows_indices = []
 
         self.generate_data_for_hidden_columns = generate_data_for_hidden_columns
+        self.max_frame_rate = max_frame_rate
         self.thread_stop_event = threading.Event()
-        self.data_generation_queue = queue.PriorityQueue()
+        self.load_progress = {}
+        self.data_generation_queue = CellScheduler()
         self.threads = []
 
+        # Dirty tracking for initialise_variables()
+        #   items_version is increased whenever self.items is replaced or modified in place
+        #   items_modified is set by background threads when they write to self.items
+        #   stage_keys holds the inputs that were used the last time each stage was calculated
+        self.items_version = 0
+        # Woken by background threads when they modify the items or finish getting data; see wait_for_event()
+        self.wakeup = Wakeup()
+        self.resize_watched = False
+        self.last_data_wakeup = 0.0
+        # Keys which have been read from the tty but not yet handled; see take_repeated_keys()
+        self.pending_keys = deque()
+        # The main loop draws at most max_frame_rate frames per second; a frame which is due is drawn when it wakes
+        self.last_frame_time = 0.0
+        self.frame_pending = False
+        self.frame_clear = False
+        self.items_modified = NotifyingEvent(self.wakeup)
+        # Gets the data of panes with "async": True in the background; see pane_data.py
+        self.pane_data = PaneDataService(self.wakeup)
+        self.stage_items = None
+        self.stage_keys = {}
+        self.indexed_items_version = 0
+
 
         self.process_manager = multiprocessing.Manager()
         # self.data_generation_queue = ProcessSafePriorityQueue
@@ -411,15 +465,19 @@ class Picker:
 
         self.initialise_picker_state(reset_colours=self.reset_colours)
 
-        # Note: We have to set the footer after initialising the picker state so that the footer can use the get_function_data method
-        self.footer_options = [StandardFooter(self.stdscr, colours_start, self.get_function_data), CompactFooter(self.stdscr, colours_start, self.get_function_data), NoFooter(self.stdscr, colours_start, self.get_function_data)]
+        # A live view of the state which is passed to the footer, panes and refresh function rather than building
+        #   get_function_data() for each of them on every frame
+        self.state = PickerState(self)
+
+        # Note: We have to set the footer after initialising the picker state so that the footer can use the state
+        self.footer_options = [StandardFooter(self.stdscr, colours_start, self.get_state), CompactFooter(self.stdscr, colours_start, self.get_state), NoFooter(self.stdscr, colours_start, self.get_state)]
         self.footer = self.footer_options[self.footer_style]
         self.footer.adjust_sizes(self.term_h, self.term_w)
 
 
 
         # getting_data.is_set() is True when we are getting data
-        self.getting_data = threading.Event()
+        self.getting_data = NotifyingEvent(self.wakeup)
         self.getting_data.set()
 
     def __sizeof__(self):
@@ -642,6 +700,12 @@ class Picker:
         # self.visible_rows_indices = [v[0] for v in self.indexed_items[start_index:end_index]] if len(self.indexed_items) else []
         self.visible_rows_indices.clear()
         self.visible_rows_indices.extend([v[0] for v in self.indexed_items[start_index:end_index]])
+
+        # Cells which are being generated are filled on screen first, then a page above and below
+        if self.data_generation_queue:
+            near_start, near_end = max(0, start_index - self.items_per_page), min(len(self.indexed_items), end_index + self.items_per_page)
+            near_rows_indices = [v[0] for v in self.indexed_items[end_index:near_end]] + [v[0] for v in self.indexed_items[near_start:start_index]]
+            self.data_generation_queue.set_viewport(self.visible_rows_indices, near_rows_indices)
         return self.visible_rows
 
     def initialise_picker_state(self, reset_colours=False) -> None:
@@ -686,8 +750,79 @@ class Picker:
         except:
             logging.warning("Error trying to set curses.set_escdelay")
 
+    def rows_appended_from(self, stage_key: Optional[tuple], *inputs) -> int:
+        """
+        Return the number of rows that a stage has already been applied to if rows have only been appended to
+            self.items since; otherwise return 0. stage_key is (items_version, len(items), *inputs) from the last
+            time the stage was calculated.
+        """
+        if not stage_key or stage_key[0] != self.items_version or tuple(stage_key[2:]) != inputs:
+            return 0
+        if not 0 < stage_key[1] < len(self.items) or self.items == [[]]:
+            return 0
+        return stage_key[1]
+
+    def mark_items_changed(self) -> None:
+        """ Record that self.items has been modified in place so that initialise_variables() recalculates each stage. """
+        self.items_version += 1
+        self.filter_state.invalidate()
+        self.parallel_matcher.invalidate()
+
+    def search_cache_keys(self) -> dict:
+        """
+        Return the arguments with which search() keeps its matches in self.search_state: they are reused until the items
+            change or indexed_items is replaced, filtered or re-sorted.
+        """
+        return {
+            "search_state": self.search_state,
+            "items_key": (id(self.items), self.items_version),
+            "order_key": (id(self.indexed_items), self.indexed_items_version, self.sort_version),
+        }
+
+    def key_pressed(self) -> bool:
+        """ Return True if a key is waiting to be read. Used to abandon a filter or search preview when the user keeps typing. """
+        return self.tty_fd is not None and input_pending(self.tty_fd)
+
+    def preview_filter(self, query: str) -> None:
+        """
+        Show the rows which match the filter query while it is being typed. A filter which is still running when
+            another key is pressed is abandoned so that typing isn't held up by a large table.
+        """
+        try:
+            indexed_items = filter_items(self.items, self.indexed_items, query, filter_state=self.filter_state, matcher=self.parallel_matcher, cancel=self.key_pressed)
+        except FilterCancelled:
+            return
+        self.indexed_items = indexed_items
+        self.indexed_items_version += 1
+        self.cursor_pos = min(self.cursor_pos, max(0, len(self.indexed_items)-1))
+        if self.columns_sort_method[self.sort_column] != 0:
+            self.apply_sort()
+
+    def preview_search(self, query: str, cursor_pos: int) -> None:
+        """ Move the cursor to the first match after cursor_pos of the search query while it is being typed; see preview_filter. """
+        try:
+            return_val, tmp_cursor, tmp_index, tmp_count, tmp_highlights = search(
+                query=query,
+                indexed_items=self.indexed_items,
+                highlights=self.highlights,
+                cursor_pos=cursor_pos,
+                unselectable_indices=self.unselectable_indices,
+                items=self.items,
+                matcher=self.parallel_matcher,
+                **self.search_cache_keys(),
+                cancel=self.key_pressed,
+            )
+        except FilterCancelled:
+            return
+        self.highlights = tmp_highlights
+        if return_val:
+            self.cursor_pos, self.search_index, self.search_count = tmp_cursor, tmp_index, tmp_count
+        else:
+            self.cursor_pos, self.search_index, self.search_count = cursor_pos, 0, 0
+
     def mark_current_file_modified(self) -> None:
         """Mark the currently loaded file as modified (dirty flag)."""
+        self.mark_items_changed()
         if 0 <= self.loaded_file_index < len(self.loaded_file_states_new):
             self.loaded_file_states_new[self.loaded_file_index].mark_modified()
             self.logger.debug(f"Marked file {self.loaded_file} as modified")
@@ -701,6 +836,9 @@ class Picker:
         The cursor_pos and selections are retained by tracking the id of the rows (where the id 
         is row[self.id_column]). 
 
+        The stages (normalise items -> filter -> search -> sort) are only recalculated when their
+        inputs have changed since the last call. See mark_items_changed().
+
         Parameters:
         - get_data (bool): If True, pulls data synchronously and updates tracking variables.
         """
@@ -716,8 +854,8 @@ class Picker:
                 tracking = True
                 selected_indices = get_selected_indices(self.selections)
                 self.selected_cells_by_row = get_selected_cells_by_row(self.cell_selections)
-                self.ids = [item[self.id_column] for i, item in enumerate(self.items) if i in selected_indices]
-                self.ids_tuples = [(i, item[self.id_column]) for i, item in enumerate(self.items) if i in selected_indices]
+                self.ids = [self.items[i][self.id_column] for i in selected_indices]
+                self.ids_tuples = [(i, self.items[i][self.id_column]) for i in selected_indices]
         
                 if len(self.indexed_items) > 0 and self.cursor_pos < len(self.indexed_items) and len(self.indexed_items[0][1]) >= self.id_column:
                     self.cursor_pos_id = self.indexed_items[self.cursor_pos][1][self.id_column]
@@ -731,31 +869,59 @@ class Picker:
                 self.header,
                 self.visible_rows_indices,
                 self.getting_data,
-                self.get_function_data(),
+                self.state,
             )
+            self.items_version += 1
+            self.parallel_matcher.invalidate()
+
+        # Rows which fetch_data() has merged, inserted or removed only need their own stages updated
+        row_delta, self.row_delta = self.row_delta, None
+        merged_rows = row_delta is not None and self.items is self.stage_items
+        cursor_row = self.apply_row_delta(row_delta) if merged_rows else None
+
+        # Check whether the items have been replaced or written to by a background thread
+        if self.items_modified.is_set():
+            self.items_modified.clear()
+            self.items_version += 1
+            self.parallel_matcher.invalidate()
+        if self.items is not self.stage_items:
+            self.stage_items = self.items
+            self.items_version += 1
 
-                    
         # Ensure that an emtpy items object has the form [[]]
-        if self.items == []: self.items = [[]]
+        # An empty ColumnStore or LazyTable is kept as rows may still be loaded into it.
+        if isinstance(self.items, list) and self.items == []: self.items = self.stage_items = [[]]
 
         # Ensure that items is a List[List[Str]] object
-        if len(self.items) > 0 and not isinstance(self.items[0], list):
-            self.items = [[item] for item in self.items]
+        if len(self.items) > 0 and not isinstance(self.items[0], (list, RowView)):
+            self.items = self.stage_items = [[item] for item in self.items]
 
         # Convert all cell values to strings (for xlsx files with numeric values)
         # Note: We modify in place to preserve references for background threads
-        if len(self.items) > 0:
-            for i, row in enumerate(self.items):
+        # A ColumnStore or LazyTable only holds strings and its rows are always the same length.
+        # If rows have only been appended since the last call (e.g., by a file being loaded in chunks)
+        #   then only the new rows are normalised and filtered.
+        normalise_key = (self.items_version, len(self.items))
+        normalise_items = self.stage_keys.get("normalise") != normalise_key and not isinstance(self.items, (ColumnStore, LazyTable))
+        normalise_from = self.rows_appended_from(self.stage_keys.get("normalise"))
+        if normalise_items and len(self.items) > 0:
+            for i in range(normalise_from, len(self.items)):
+                row = self.items[i]
                 for j, cell in enumerate(row):
-                    self.items[i][j] = str(cell) if cell is not None else ""
+                    row[j] = str(cell) if cell is not None else ""
 
         # Ensure that the each of the rows of the items are of the same length
         # Note: We modify in place to preserve references for background threads
-        if self.items and self.items != [[]]:
-            max_length = max(len(row) for row in self.items)
-            for row in self.items:
+        if normalise_items and self.items and self.items != [[]]:
+            max_length = max(len(self.items[i]) for i in range(normalise_from, len(self.items)))
+            if normalise_from and max_length > len(self.items[0]):
+                normalise_from = 0
+            max_length = max(max_length, len(self.items[0]))
+            for i in range(normalise_from, len(self.items)):
+                row = self.items[i]
                 while len(row) < max_length:
                     row.append('')
+        self.stage_keys["normalise"] = normalise_key
 
         # Ensure that header elements are all strings
         if self.header:
@@ -769,14 +935,16 @@ class Picker:
 
 
         # Ensure that the selection-tracking variables are the correct shape
+        self.selections = Selections.from_dict(self.selections)
+        self.cell_selections = CellSelections.from_dict(self.cell_selections)
         if len(self.selections) != len(self.items):
-            self.selections = {i : False if i not in self.selections else bool(self.selections[i]) for i in range(len(self.items))}
+            self.selections.resize(len(self.items))
 
         if len(self.items) and len(self.cell_selections) != len(self.items)*len(self.items[0]):
-            self.cell_selections = {(i, j) : False if (i, j) not in self.cell_selections else self.cell_selections[(i, j)] for i in range(len(self.items)) for j in range(len(self.items[0]))}
+            self.cell_selections.resize(len(self.items), len(self.items[0]))
             self.selected_cells_by_row = get_selected_cells_by_row(self.cell_selections)
         elif len(self.items) == 0:
-            self.cell_selections = {}
+            self.cell_selections = CellSelections()
             self.selected_cells_by_row = {}
 
         def extend_list_to_length(lst, length, default_value):
@@ -789,9 +957,12 @@ class Picker:
         col_count = len(self.items[0]) if row_count else 0
 
         # Ensure that the length of the option lists are of the correct length.
-        if row_count > 0:
+        # The per-row option lists are not extended for a LazyTable, which may have more rows than fit in memory; rows
+        #   past the end of the lists use the defaults.
+        if row_count > 0 and not isinstance(self.items, LazyTable):
             extend_list_to_length(self.require_option, length=row_count, default_value=self.require_option_default)
             extend_list_to_length(self.option_functions, length=row_count, default_value=self.default_option_function)
+        if row_count > 0:
             extend_list_to_length(self.columns_sort_method, length=col_count, default_value=0)
             extend_list_to_length(self.sort_reverse, length=col_count, default_value=False)
             extend_list_to_length(self.editable_columns, length=col_count, default_value=self.editable_by_default)
@@ -801,17 +972,46 @@ class Picker:
 
 
         
-        # Create an indexed list of the items which will track the visible rows
-        if self.items == [[]]: self.indexed_items = []
-        else: self.indexed_items = list(enumerate(self.items))
+        filter_key = (self.items_version, len(self.items), self.filter_query)
+        filter_from = self.rows_appended_from(self.stage_keys.get("filter"), self.filter_query)
+        if filter_from and self.stage_keys.get("filter") != filter_key:
+            if self.filter_query:
+                new_rows = filter_items(self.items, [], self.filter_query, filter_state=self.filter_state, appended_from=filter_from, matcher=self.parallel_matcher)
+            elif isinstance(self.items, LazyTable):
+                new_rows = self.items.indexed_rows(range(filter_from, len(self.items)))
+            else:
+                new_rows = [(i, self.items[i]) for i in range(filter_from, len(self.items))]
+            self.indexed_items.extend(new_rows)
+            self.stage_keys["filter"] = filter_key
+            self.indexed_items_version += 1
+        elif self.stage_keys.get("filter") != filter_key:
+            # Create an indexed list of the items which will track the visible rows
+            if self.items == [[]]: self.indexed_items = []
+            elif isinstance(self.items, LazyTable): self.indexed_items = self.items.indexed_rows()
+            else: self.indexed_items = list(enumerate(self.items))
+
+            # Apply the filter query
+            if self.filter_query:
+                # prev_index = self.indexed_items[cursor_pos][0] if len(self.indexed_items)>0 else 0
+                # The items may have changed since the last filter so we have to check every row.
+                if self.stage_keys.get("filter", (None,))[0] != self.items_version:
+                    self.filter_state.invalidate()
+                self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query, filter_state=self.filter_state, matcher=self.parallel_matcher)
+                if self.cursor_pos in [x[0] for x in self.indexed_items]: self.cursor_pos = [x[0] for x in self.indexed_items].index(self.cursor_pos)
+                else: self.cursor_pos = 0
+            # Cells which are still to be generated are set aside for the rows which are filtered out, unless the
+            #   filter depends on one of the columns being generated.
+            if self.data_generation_queue:
+                filter_columns = {col for col, _ in compile_query(self.filter_query).patterns} if self.filter_query else set()
+                if self.filter_query and -1 not in filter_columns and not filter_columns & set(self.data_generation_queue.columns):
+                    self.data_generation_queue.set_active_rows([i for i, _ in self.indexed_items])
+                else:
+                    self.data_generation_queue.set_active_rows(None)
+            self.stage_keys["filter"] = filter_key
+            self.indexed_items_version += 1
 
-        # Apply the filter query
-        if self.filter_query:
-            # prev_index = self.indexed_items[cursor_pos][0] if len(self.indexed_items)>0 else 0
-            self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query)
-            if self.cursor_pos in [x[0] for x in self.indexed_items]: self.cursor_pos = [x[0] for x in self.indexed_items].index(self.cursor_pos)
-            else: self.cursor_pos = 0
-        if self.search_query:
+        search_key = (self.indexed_items_version, self.search_query)
+        if self.search_query and self.stage_keys.get("search") != search_key:
             return_val, tmp_cursor, tmp_index, tmp_count, tmp_highlights = search(
                 query=self.search_query,
                 indexed_items=self.indexed_items,
@@ -819,13 +1019,20 @@ class Picker:
                 cursor_pos=self.cursor_pos,
                 unselectable_indices=self.unselectable_indices,
                 continue_search=True,
+                items=self.items,
+                matcher=self.parallel_matcher,
+                **self.search_cache_keys(),
             )
             if return_val:
                 self.cursor_pos, self.search_index, self.search_count, self.highlights = tmp_cursor, tmp_index, tmp_count, tmp_highlights
+        self.stage_keys["search"] = search_key
 
         # Apply the current sort method
         if len(self.indexed_items) > 0:
-            sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+            sort_key = (self.indexed_items_version, self.sort_column, self.columns_sort_method[self.sort_column], self.sort_reverse[self.sort_column], tuple(self.sort_columns))
+            if self.stage_keys.get("sort") != sort_key:
+                self.apply_sort()  # Re-sort self.items based on new column
+                self.stage_keys["sort"] = sort_key
 
 
         # If we have more unselectable indices than rows, clear the unselectable_indices
@@ -863,25 +1070,32 @@ class Picker:
 
         # Ensure that the correct cursor_pos and selected indices are reselected
         #   if  we have fetched new data.
-        if self.track_entries_upon_refresh and (self.data_ready or tracking) and len(self.items) > 1:
-            selected_indices = []
-            all_ids = [item[self.id_column] for item in self.items]
-            self.selections = {i: False for i in range(len(self.items))}
-            if len(self.items) > 0:
-                self.cell_selections = {(i, j): False for i in range(len(self.items)) for j in range(len(self.items[0]))}
-            else:
-                self.cell_selections = {}
+        # Every row would have to be parsed to find the ids in a LazyTable so its rows are not tracked.
+        if merged_rows:
+            # The selections have been moved with their rows by apply_row_delta(); only the cursor may have to follow its row.
+            if cursor_row is not None and not self.pin_cursor:
+                for pos, (i, _) in enumerate(self.indexed_items):
+                    if i == cursor_row:
+                        self.cursor_pos = pos
+                        break
+        elif self.track_entries_upon_refresh and (self.data_ready or tracking) and len(self.items) > 1 and not isinstance(self.items, LazyTable):
+            # Map each id to the index of the first row with that id
+            id_index = {}
+            for i, item in enumerate(self.items):
+                id_index.setdefault(item[self.id_column], i)
+            self.selections = Selections(len(self.items))
+            self.cell_selections = CellSelections(len(self.items), len(self.items[0]))
 
             for id in self.ids:
-                if id in all_ids:
-                    selected_indices.append(all_ids.index(id))
-                    self.selections[all_ids.index(id)] = True
+                if id in id_index:
+                    self.selections[id_index[id]] = True
 
             for i, id in self.ids_tuples:
-                if id in all_ids:
+                if id in id_index:
                     # rows_with_selected_cells
-                    for j in self.selected_cells_by_row[i]:
-                        self.cell_selections[(all_ids.index(id), j)] = True
+                    for j in self.selected_cells_by_row.get(i, []):
+                        self.cell_selections[(id_index[id], j)] = True
+            self.selected_cells_by_row = get_selected_cells_by_row(self.cell_selections)
 
 
 
@@ -891,10 +1105,12 @@ class Picker:
                 if self.pin_cursor:
                     self.cursor_pos = min(self.cursor_pos_prev, len(self.indexed_items)-1)
                 else:
-                    if self.cursor_pos_id in all_ids:
-                        cursor_pos_x = all_ids.index(self.cursor_pos_id)
-                        if cursor_pos_x in [i[0] for i in self.indexed_items]:
-                            self.cursor_pos = [i[0] for i in self.indexed_items].index(cursor_pos_x)
+                    if self.cursor_pos_id in id_index:
+                        cursor_pos_x = id_index[self.cursor_pos_id]
+                        for pos, (i, _) in enumerate(self.indexed_items):
+                            if i == cursor_pos_x:
+                                self.cursor_pos = pos
+                                break
             else:
                 self.cursor_pos = 0
 
@@ -906,8 +1122,121 @@ class Picker:
         else: self.right_pane_index = 0
         
         # Ensure that cursor < len(self.items)
-        self.cursor_pos = min(self.cursor_pos, len(self.indexed_items)-1)
+        self.cursor_pos = min(max(0, self.cursor_pos), len(self.indexed_items)-1)
+
+
+    def apply_row_delta(self, delta: RowDelta) -> Optional[int]:
+        """
+        Update the filtered and sorted rows, the selections and the caches for the rows which fetch_data() has merged,
+            inserted or removed rather than recalculating every stage.
+
+        Returns the index of the row under the cursor if the rows may have moved, otherwise None.
+        """
+        if not self.items:
+            return None
+        moved = not delta.in_place
+        if not moved and not delta.changed:
+            return None
+        cursor_row = self.indexed_items[self.cursor_pos][0] if 0 <= self.cursor_pos < len(self.indexed_items) else None
 
+        row_count = len(self.items)
+        if moved:
+            # Rows keep their selections and cached matches and sort keys at their new indices
+            new_index = delta.new_index
+            self.selections.remap(new_index, row_count)
+            self.cell_selections.remap(new_index, row_count)
+            self.selected_cells_by_row = get_selected_cells_by_row(self.cell_selections)
+            self.search_state.rows_moved(new_index)
+            self.sort_key_cache.rows_moved(new_index)
+            if cursor_row is not None:
+                cursor_row = new_index[cursor_row] if cursor_row < len(new_index) and new_index[cursor_row] >= 0 else None
+            self.indexed_items = [(new_index[i], row) for i, row in self.indexed_items if i < len(new_index) and new_index[i] >= 0]
+
+        # The rows which were kept have already been padded to the length of the rows
+        row_length = next((len(self.items[k]) for k in delta.new_index if k >= 0), None) if moved else len(self.items[0])
+        updated = delta.changed + delta.inserted
+        if row_length is None or any(len(self.items[i]) > row_length for i in updated):
+            # Every row has to be padded to the new length
+            self.mark_items_changed()
+            return cursor_row
+        for i in updated:
+            row = self.items[i]
+            while len(row) < row_length:
+                row.append('')
+        self.filter_state.invalidate()
+        self.search_state.rows_changed(delta.changed)
+        self.parallel_matcher.invalidate()
+
+        sort_columns = {self.sort_column} | {col for col, _, _ in self.sort_columns}
+        resort = bool(delta.changed_columns & sort_columns) or delta.shuffled
+        if self.filter_query:
+            matches = compile_query(self.filter_query).matches
+            shown = {i for i, _ in self.indexed_items}
+            hidden = {i for i in delta.changed if i in shown and not matches(self.items[i])}
+            unhidden = [i for i in delta.changed if i not in shown and matches(self.items[i])]
+            unhidden += [i for i in delta.inserted if matches(self.items[i])]
+            if hidden:
+                self.indexed_items = [(i, row) for i, row in self.indexed_items if i not in hidden]
+            resort = resort or bool(hidden)
+        else:
+            unhidden = delta.inserted
+        self.indexed_items.extend((i, self.items[i]) for i in unhidden)
+        resort = resort or bool(unhidden)
+
+        # The stages which are keyed by the number of rows are still current if they were before the rows were merged
+        for stage in ("normalise", "filter"):
+            stage_key = self.stage_keys.get(stage)
+            if moved and stage_key and stage_key[0] == self.items_version:
+                self.stage_keys[stage] = (self.items_version, row_count) + stage_key[2:]
+
+        # The sort is kept if the rows haven't changed in a column which they are sorted by
+        previous_version = self.indexed_items_version
+        self.indexed_items_version += 1
+        sort_key = self.stage_keys.get("sort")
+        if not resort and sort_key and sort_key[0] == previous_version:
+            self.stage_keys["sort"] = (self.indexed_items_version,) + sort_key[1:]
+        return cursor_row if resort or moved else None
+
+    def apply_sort(self) -> None:
+        """ Sort indexed_items by each level in the sort stack (self.sort_columns) followed by the sort column. """
+        # The key cache holds every value of the sorted column so it is not used for a LazyTable.
+        key_cache = None if isinstance(self.items, LazyTable) else self.sort_key_cache
+        self.sort_version += 1
+        if self.sort_columns:
+            sort_levels = self.sort_columns + [(self.sort_column, self.columns_sort_method[self.sort_column], self.sort_reverse[self.sort_column])]
+            sort_items_by_levels(self.indexed_items, sort_levels, key_cache=key_cache)
+        else:
+            sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column], key_cache=key_cache)
+
+    def push_sort_level(self, col: Optional[int] = None) -> None:
+        """
+        Push a sort level onto the sort stack. 
+
+        If col is None then the current sort column is pushed with its sort method and order; otherwise col is pushed.
+        The rows are then sorted by the levels in the stack, with ties broken by the sort column.
+        """
+        self.logger.info(f"function: push_sort_level(col={col})")
+        if col is None:
+            col = self.sort_column
+        if col is None or not (0 <= col < len(self.columns_sort_method)):
+            return None
+        self.sort_columns = [level for level in self.sort_columns if level[0] != col]
+        self.sort_columns.append((col, self.columns_sort_method[col], self.sort_reverse[col]))
+        self.resort_keeping_cursor()
+
+    def pop_sort_level(self) -> None:
+        """ Remove the most recently pushed level from the sort stack. """
+        self.logger.info(f"function: pop_sort_level()")
+        if self.sort_columns:
+            self.sort_columns = self.sort_columns[:-1]
+            self.resort_keeping_cursor()
+
+    def resort_keeping_cursor(self) -> None:
+        """ Re-sort indexed_items and keep the cursor on the same row. """
+        if len(self.indexed_items) > 0:
+            current_index = self.indexed_items[self.cursor_pos][0]
+            self.apply_sort()
+            self.cursor_pos = [row[0] for row in self.indexed_items].index(current_index)
 
     def move_column(self, direction: int) -> None:
         """ 
@@ -934,6 +1263,8 @@ class Picker:
         # Swap columns in each row
         for row in self.items:
             row[self.selected_column], row[new_index] = row[new_index], row[self.selected_column]
+        self.mark_items_changed()
+        self.sort_key_cache.swap_columns(self.selected_column, new_index)
         if self.header:
             self.header[self.selected_column], self.header[new_index] = self.header[new_index], self.header[self.selected_column]
 
@@ -987,6 +1318,8 @@ class Picker:
     def draw_screen(self, clear: bool = True) -> None:
         """ Try-except wrapper for the draw_screen_ function. """
         try:
+            if clear:
+                self.stdscr.begin_frame()
             self.draw_screen_(clear)
         except Exception as e:
             import traceback
@@ -1003,6 +1336,8 @@ class Picker:
             self.logger.warning(f"sheets: {self.sheets}")
             self.logger.warning(f"sheet_states length: {len(self.sheet_states) if hasattr(self.sheet_states, '__len__') else 'N/A'}")
         finally:
+            if clear:
+                self.stdscr.end_frame()
             self.stdscr.refresh()
 
     def draw_screen_(self, clear: bool = True) -> None:
@@ -1010,8 +1345,6 @@ class Picker:
 
         self.logger.debug("Draw screen.")
 
-        if clear:
-            self.stdscr.erase()
 
         self.update_term_size()
 
@@ -1188,7 +1521,7 @@ class Picker:
                     cell_value = self.indexed_items[row][1][col][:self.column_widths[col]] + self.separator
                 cell_value = truncate_to_display_width(cell_value, min(cell_width, cell_max_width), self.centre_in_cols, self.unicode_char_width)
                 cell_value = truncate_to_display_width(cell_value, min(cell_width, cell_max_width), self.centre_in_cols, self.unicode_char_width)
-                if wcswidth(cell_value) + cell_pos > self.term_w:
+                if display_width(cell_value) + cell_pos > self.term_w:
                     cell_value = truncate_to_display_width(cell_value, self.term_w-cell_pos-10, self.centre_in_cols, self.unicode_char_width)
                 self.stdscr.addstr(y, cell_pos, cell_value, colour)
 
@@ -1200,71 +1533,66 @@ class Picker:
                 cell_value = f"{cell_value:^{self.column_widths[col]}}"
 
                 cell_value = cell_value[cell_start:visible_column_widths[col]][:self.rows_w-self.left_gutter_width]
-                cell_value = truncate_to_display_width(cell_value, min(wcswidth(cell_value), cell_width, cell_max_width), self.centre_in_cols, self.unicode_char_width)
+                cell_value = truncate_to_display_width(cell_value, min(display_width(cell_value), cell_width, cell_max_width), self.centre_in_cols, self.unicode_char_width)
                 cell_value += self.separator
-                cell_value = truncate_to_display_width(cell_value, min(wcswidth(cell_value), cell_width, cell_max_width), self.centre_in_cols, self.unicode_char_width)
+                cell_value = truncate_to_display_width(cell_value, min(display_width(cell_value), cell_width, cell_max_width), self.centre_in_cols, self.unicode_char_width)
                 self.stdscr.addstr(y, self.startx, cell_value, colour)
             else:
                 pass
 
 
 
-        def sort_highlights(highlights):
-            """ 
-            Sort highlights into lists based on their display level.
-            Highlights with no level defined will be displayed at level 0.
-            """
-            l0 = []
-            l1 = []
-            l2 = []
-            for highlight in highlights:
-                if "level" in highlight:
-                    if highlight["level"] == 0: l0.append(highlight)
-                    elif highlight["level"] == 1: l1.append(highlight)
-                    elif highlight["level"] == 2: l2.append(highlight)
-                    else: l0.append(highlight)
-                else:
-                    l0.append(highlight)
-            return l0, l1, l2
-
-        def draw_highlights(highlights: list[dict], idx: int, y: int, item: tuple[int, list[str]]):
-            self.logger.debug(f"function: draw_highlights()")
-            if len(highlights) == 0: return None
-            full_row_str = format_row(item[1], self.hidden_columns, self.column_widths, self.separator, self.centre_in_cols, self.unicode_char_width)
-            row_str = full_row_str[self.leftmost_char:]
-            for highlight in highlights:
-                if "row" in highlight:
-                    if highlight["row"] != self.indexed_items[idx][0]:
+        def row_highlight_spans(item: tuple[int, list[str]]) -> tuple[list, list, list]:
+            """ Return the (start, end, colour) spans in the full formatted row of the highlights at each level. """
+            full_row_str = get_row_strings(item)[0]
+            levels = ([], [], [])
+            for level, rules in enumerate(self.highlight_rules.levels):
+                for rule in rules:
+                    if rule.row is not None and rule.row != item[0]:
                         continue
-                try:
-                    if highlight["field"] == "all":
-                        match = re.search(highlight["match"], full_row_str, re.IGNORECASE)
-                        if not match: continue
-                        highlight_start = match.start()
-                        highlight_end = match.end()
-                        if highlight_end - self.leftmost_char < 0:
-                            continue
-
-                    elif type(highlight["field"]) == type(0) and highlight["field"] not in self.hidden_columns:
-                        match = re.search(highlight["match"], truncate_to_display_width(item[1][highlight["field"]], self.column_widths[highlight["field"]], centre=False, unicode_char_width=self.unicode_char_width), re.IGNORECASE)
-                        if not match: continue
-                        field_start = sum([width for i, width in enumerate(self.column_widths[:highlight["field"]]) if i not in self.hidden_columns]) + sum([1 for i in range(highlight["field"]) if i not in self.hidden_columns])*wcswidth(self.separator)
-                        width = min(self.column_widths[highlight["field"]]-(field_start-self.leftmost_char), self.rows_w-self.left_gutter_width)
-
-                        ## We want to search the non-centred values but highlight the centred values.
-                        if self.centre_in_cols:
-                            tmp = truncate_to_display_width(item[1][highlight["field"]], width, self.centre_in_cols, self.unicode_char_width)
-                            field_start += (len(tmp) - len(tmp.lstrip()))
-
-                        highlight_start = field_start + match.start()
-                        highlight_end = match.end() + field_start
-                        if highlight_end - self.leftmost_char < 0:
+                    try:
+                        if rule.field == "all":
+                            match = rule.pattern.search(full_row_str)
+                            if not match: continue
+                            highlight_start = match.start()
+                            highlight_end = match.end()
+
+                        elif type(rule.field) == type(0) and rule.field not in self.hidden_columns:
+                            match = rule.pattern.search(truncate_to_display_width(item[1][rule.field], self.column_widths[rule.field], centre=False, unicode_char_width=self.unicode_char_width))
+                            if not match: continue
+                            field_start = field_starts[rule.field]
+                            width = min(self.column_widths[rule.field]-(field_start-self.leftmost_char), self.rows_w-self.left_gutter_width)
+
+                            ## We want to search the non-centred values but highlight the centred values.
+                            if self.centre_in_cols:
+                                tmp = truncate_to_display_width(item[1][rule.field], width, self.centre_in_cols, self.unicode_char_width)
+                                field_start += (len(tmp) - len(tmp.lstrip()))
+
+                            highlight_start = field_start + match.start()
+                            highlight_end = match.end() + field_start
+                        else:
                             continue
-                    else:
+                    except:
                         continue
-                    highlight_start -= self.leftmost_char
-                    highlight_end -= self.leftmost_char
-                    self.stdscr.addstr(y, max(self.startx, self.startx+highlight_start), row_str[max(highlight_start,0):min(self.rows_w-self.left_gutter_width, highlight_end)], curses.color_pair(self.colours_start+highlight["color"]) | curses.A_BOLD)
+                    levels[level].append((highlight_start, highlight_end, rule.color))
+            return levels
+
+        def draw_highlights(level: int, y: int, item: tuple[int, list[str]]):
+            """ Paint the cached spans of the highlights at level on the row. """
+            if not self.highlight_rules.levels[level]: return None
+            spans = self.highlight_span_cache.get(item[0], item[1])
+            if spans is None:
+                spans = row_highlight_spans(item)
+                self.highlight_span_cache.set(item[0], item[1], spans)
+            if not spans[level]: return None
+            row_str = get_row_strings(item)[0][self.leftmost_char:]
+            for highlight_start, highlight_end, color in spans[level]:
+                if highlight_end - self.leftmost_char < 0:
+                    continue
+                highlight_start -= self.leftmost_char
+                highlight_end -= self.leftmost_char
+                try:
+                    self.stdscr.addstr(y, max(self.startx, self.startx+highlight_start), row_str[max(highlight_start,0):min(self.rows_w-self.left_gutter_width, highlight_end)], curses.color_pair(self.colours_start+color) | curses.A_BOLD)
                 except:
                     pass
 
@@ -1277,33 +1605,40 @@ class Picker:
         #    6. top-level highlights l2
         ## Display rows and highlights
 
-        l0_highlights, l1_highlights, l2_highlights = sort_highlights(self.highlights)
+        # The highlights are compiled when they change and the spans that they match in each row are cached until the row,
+        #   the highlights or the layout change.
+        highlight_rules_version = self.highlight_rules.update(self.highlights)
+        field_starts = []
+        field_start = 0
+        for i, width in enumerate(self.column_widths):
+            field_starts.append(field_start)
+            if i not in self.hidden_columns:
+                field_start += width + display_width(self.separator)
 
 
         row_width = sum(self.visible_column_widths) + len(self.separator)*(len(self.visible_column_widths)-1)
+        trunc_width = max(0, min(self.rows_w-self.left_gutter_width, row_width, self.term_w - self.startx))
+
+        # Formatted rows are reused until the row or the layout changes
+        self.row_string_cache.set_layout((tuple(self.column_widths), tuple(self.hidden_columns), self.separator, self.centre_in_cols, self.leftmost_char, trunc_width))
+        self.highlight_span_cache.set_layout((self.row_string_cache.layout, self.rows_w, self.left_gutter_width, self.unicode_char_width, highlight_rules_version))
+
+        def get_row_strings(item: tuple[int, list[str]]) -> tuple[str, str]:
+            """ Return the full formatted row and the row as displayed (clipped by leftmost_char and truncated to the screen). """
+            row_strings = self.row_string_cache.get(item[0], item[1])
+            if row_strings is None:
+                row_str_orig = format_row(item[1], self.hidden_columns, self.column_widths, self.separator, self.centre_in_cols, self.unicode_char_width)
+                row_str_left_adj = clip_left(row_str_orig, self.leftmost_char)
+                row_str = truncate_to_display_width(row_str_left_adj, trunc_width, self.unicode_char_width)
+                row_strings = (row_str_orig, row_str)
+                self.row_string_cache.set(item[0], item[1], row_strings)
+            return row_strings
+
         for idx in range(start_index, end_index):
             item = self.indexed_items[idx]
             y = idx - start_index + self.top_space
 
-            # row_str = format_row(item[1], self.hidden_columns, self.column_widths, self.separator, self.centre_in_cols)[self.leftmost_char:]
-            # row_str = truncate_to_display_width(row_str, min(w-self.startx, visible_columns_total_width))
-            row_str_orig = format_row(item[1], self.hidden_columns, self.column_widths, self.separator, self.centre_in_cols, self.unicode_char_width)
-            row_str_left_adj = clip_left(row_str_orig, self.leftmost_char)
-            # rowstr off screen
-            # if self.leftmost_char > len(row_str_orig):
-            #     trunc_width = 0
-            # if self.leftmost_char + (self.rows_w-self.left_gutter_width) <= len(row_str_orig):
-            #     trunc_width = self.rows_w-self.startx
-            # elif self.leftmost_char <= len(row_str_orig):
-            #     trunc_width = len(row_str_orig) - self.leftmost_char
-            # else:
-            #     trunc_width = 0
-
-
-            trunc_width = max(0, min(self.rows_w-self.left_gutter_width, row_width, self.term_w - self.startx))
-
-            row_str = truncate_to_display_width(row_str_left_adj, trunc_width, self.unicode_char_width)
-            # row_str = truncate_to_display_width(row_str, min(w-self.startx, visible_columns_total_width))[self.leftmost_char:]
+            row_str = get_row_strings(item)[1]
 
             ## Display the standard row
             self.stdscr.addstr(y, self.startx, row_str, curses.color_pair(self.colours_start+2))
@@ -1318,7 +1653,7 @@ class Picker:
 
             # Draw the level 0 highlights
             if not self.highlights_hide:
-                draw_highlights(l0_highlights, idx, y, item)
+                draw_highlights(0, y, item)
 
             # Higlight cursor cell and selected cells
             if self.cell_cursor:
@@ -1382,7 +1717,7 @@ class Picker:
                             self.stdscr.addstr(y, max(self.startx-2,0), ' ', curses.color_pair(self.colours_start+10))
 
             if not self.highlights_hide:
-                draw_highlights(l1_highlights, idx, y, item)
+                draw_highlights(1, y, item)
 
 
 
@@ -1394,7 +1729,7 @@ class Picker:
                     self.stdscr.addstr(y, self.startx, row_str[:self.rows_w-self.left_gutter_width], curses.color_pair(self.colours_start+5) | curses.A_BOLD)
 
             if not self.highlights_hide:
-                draw_highlights(l2_highlights, idx, y, item)
+                draw_highlights(2, y, item)
 
 
         ## Display scrollbar
@@ -1443,13 +1778,13 @@ class Picker:
             # If we need to refresh the data then do so.
             pane = self.right_panes[self.right_pane_index]
             if pane["auto_refresh"] and ((time.time() - self.initial_right_split_time) > pane["refresh_time"]):
-                get_data = pane["get_data"]
-                data = pane["data"]
-                pane["data"] = get_data(data, self.get_function_data())
+                self.refresh_pane_data(pane)
                 self.initial_right_split_time = time.time()
 
             draw_pane = pane["display"]
-            data = pane["data"]
+            data = self.pane_display_data(pane)
+            if data is None or isinstance(data, PaneDataError):
+                draw_pane = right_split_placeholder
             # pane_width = int(pane["proportion"]*self.term_w)
 
             draw_pane(
@@ -1458,7 +1793,7 @@ class Picker:
                 y = self.top_space - int(bool(self.show_header and self.header)),
                 w = self.right_pane_width,
                 h = self.items_per_page + int(bool(self.show_header and self.header)),
-                state = self.get_function_data(),
+                state = self.state,
                 row = self.indexed_items[self.cursor_pos] if self.indexed_items else [],
                 cell = self.indexed_items[self.cursor_pos][1][self.selected_column] if self.indexed_items else "",
                 data=data,
@@ -1467,13 +1802,13 @@ class Picker:
             # If we need to refresh the data then do so.
             pane = self.left_panes[self.left_pane_index]
             if pane["auto_refresh"] and ((time.time() - self.initial_left_split_time) > pane["refresh_time"]):
-                get_data = pane["get_data"]
-                data = pane["data"]
-                pane["data"] = get_data(data, self.get_function_data())
+                self.refresh_pane_data(pane)
                 self.initial_left_split_time = time.time()
 
             draw_pane = pane["display"]
-            data = pane["data"]
+            data = self.pane_display_data(pane)
+            if data is None or isinstance(data, PaneDataError):
+                draw_pane = left_split_placeholder
             # pane_width = int(pane["proportion"]*self.term_w)
 
             draw_pane(
@@ -1482,7 +1817,7 @@ class Picker:
                 y = self.top_space - int(bool(self.show_header and self.header)),
                 w = self.left_pane_width,
                 h = self.items_per_page + int(bool(self.show_header and self.header)),
-                state = self.get_function_data(),
+                state = self.state,
                 row = self.indexed_items[self.cursor_pos] if self.indexed_items else [],
                 cell = self.indexed_items[self.cursor_pos][1][self.selected_column] if self.indexed_items else "",
                 data=data,
@@ -1561,9 +1896,13 @@ class Picker:
 
         return submenu_win
 
+    def get_state(self) -> PickerState:
+        """ Return a live view of the state; see PickerState. """
+        return self.state
+
     def get_function_data(self) -> dict:
         self.logger.debug(f"function: get_function_data()")
-        """ Returns a dict of the main variables needed to restore the state of list_pikcer. """
+        """ Returns a dict of the main variables needed to restore the state of list_pikcer. Use self.state for a view which isn't copied. """
         function_data = {
             "self":                                     self,
             "selections":                               self.selections,
@@ -1579,6 +1918,7 @@ class Picker:
             "sort_column":                              self.sort_column,
             "sort_method":                              self.sort_method,
             "sort_reverse":                             self.sort_reverse,
+            "sort_columns":                             self.sort_columns,
             "SORT_METHODS":                             self.SORT_METHODS,
             "hidden_columns":                           self.hidden_columns,
             "is_selecting":                             self.is_selecting,
@@ -1645,6 +1985,7 @@ class Picker:
             "track_entries_upon_refresh":               self.track_entries_upon_refresh,
             "pin_cursor":                               self.pin_cursor,
             "id_column":                                self.id_column,
+            "merge_rows_on_refresh":                    self.merge_rows_on_refresh,
             "startup_notification":                     self.startup_notification,
             "keys_dict":                                self.keys_dict,
             "macros":                                   self.macros,
@@ -1680,7 +2021,11 @@ class Picker:
             "left_pane_index":                          self.left_pane_index,
             "crosshair_cursor":                         self.crosshair_cursor,
             "generate_data_for_hidden_columns":         self.generate_data_for_hidden_columns,
+            "max_frame_rate":                           self.max_frame_rate,
             "thread_stop_event":                        self.thread_stop_event,
+            "items_modified":                           self.items_modified,
+            "data_lock":                                self.data_lock,
+            "load_progress":                            self.load_progress,
             "data_generation_queue":                    self.data_generation_queue,
             "process_manager":                          self.process_manager,
             "threads":                                  self.threads,
@@ -1750,14 +2095,14 @@ class Picker:
 
         self.logger.info(f"function: delete_entries()")
         # Remove selected items from the list
-        selected_indices = [index for index, selected in self.selections.items() if selected]
+        selected_indices = set(get_selected_indices(self.selections))
         if not selected_indices:
             # Remove the currently focused item if nothing is selected
-            selected_indices = [self.indexed_items[self.cursor_pos][0]]
+            selected_indices = {self.indexed_items[self.cursor_pos][0]}
 
         self.items = [item for i, item in enumerate(self.items) if i not in selected_indices]
         self.indexed_items = [(i, item) for i, item in enumerate(self.items)]
-        self.selections = {i:False for i in range(len(self.indexed_items))}
+        self.selections = Selections(len(self.indexed_items))
         self.cursor_pos = min(self.cursor_pos, len(self.indexed_items)-1)
         self.mark_current_file_modified()  # Track modification
         self.initialise_variables()
@@ -2009,6 +2354,8 @@ class Picker:
 
         ![0-9]+ show/hide column
         s[0-9]+ set column focus for sort
+        s+[0-9]* push the sort column (or the given column) onto the sort stack
+        s-      pop the last level from the sort stack
         g[0-9]+ go to index
         p[0-9]+ go to page
         nohl    hide search highlights
@@ -2044,10 +2391,14 @@ class Picker:
                         self.sort_column = int(setting[1:])
                         if len(self.indexed_items):
                             current_pos = self.indexed_items[self.cursor_pos][0]
-                        sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort items based on new column
+                        self.apply_sort()  # Re-sort items based on new column
                         if len(self.indexed_items):
                             new_pos = [row[0] for row in self.indexed_items].index(current_pos)
                             self.cursor_pos = new_pos
+                elif setting.startswith("s+") and (len(setting) == 2 or setting[2:].isnumeric()):
+                    self.push_sort_level(int(setting[2:]) if len(setting) > 2 else None)
+                elif setting == "s-":
+                    self.pop_sort_level()
                 elif setting == "ct":
                     self.centre_in_terminal = not self.centre_in_terminal
                 elif setting == "cc":
@@ -2218,24 +2569,36 @@ class Picker:
     def select_all(self) -> None:
         """ Select all in indexed_items. """
         self.logger.info(f"function: select_all()")
-        for i in range(len(self.indexed_items)):
-            self.selections[self.indexed_items[i][0]] = True
-        for i in self.cell_selections.keys():
-            self.cell_selections[i] = True
-        for row in range(len(self.indexed_items)):
-            self.selected_cells_by_row[row] = list(range(len(self.indexed_items[row][1])))
+        if len(self.indexed_items) == len(self.selections):
+            self.selections.select_all()
+        else:
+            for i, _ in self.indexed_items:
+                self.selections[i] = True
+        self.cell_selections.select_all()
+        for i, row in self.indexed_items:
+            self.selected_cells_by_row[i] = list(range(len(row)))
         self.draw_screen()
 
     def deselect_all(self) -> None:
         """ Deselect all items in indexed_items. """
         self.logger.info(f"function: deselect_all()")
-        for i in range(len(self.selections)):
-            self.selections[i] = False
-        for i in self.cell_selections.keys():
-            self.cell_selections[i] = False
+        self.selections.deselect_all()
+        self.cell_selections.deselect_all()
         self.selected_cells_by_row = {}
         self.draw_screen()
 
+    def invert_selection(self) -> None:
+        """ Invert the selection of the items in indexed_items. """
+        self.logger.info(f"function: invert_selection()")
+        if len(self.indexed_items) == len(self.selections):
+            self.selections.invert()
+            self.cell_selections.invert()
+            self.selected_cells_by_row = get_selected_cells_by_row(self.cell_selections)
+        else:
+            for i, _ in self.indexed_items:
+                self.selections[i] = not self.selections[i]
+        self.draw_screen()
+
     def handle_visual_selection(self, selecting:bool = True) -> None:
         """ Toggle visual selection or deselection. """
         self.logger.info(f"function: handle_visual_selection()")
@@ -2640,18 +3003,22 @@ class Picker:
         """ Refesh data asynchronously. When data has been fetched self.data_ready is set to True. """
         self.logger.info(f"function: fetch_data()")
         tmp_items, tmp_header = [], []
+        if isinstance(self.items, LazyTable):
+            tmp_items = self.items.reopen()
+        elif isinstance(self.items, ColumnStore):
+            tmp_items = ColumnStore()
         self.getting_data.clear()
         self.refresh_function(
             tmp_items, 
             tmp_header, 
             self.visible_rows_indices, 
             self.getting_data,
-            self.get_function_data(),
+            self.state,
         )
         if self.track_entries_upon_refresh:
             selected_indices = get_selected_indices(self.selections)
-            self.ids = [item[self.id_column] for i, item in enumerate(self.items) if i in selected_indices]
-            self.ids_tuples = [(i, item[self.id_column]) for i, item in enumerate(self.items) if i in selected_indices]
+            self.ids = [self.items[i][self.id_column] for i in selected_indices]
+            self.ids_tuples = [(i, self.items[i][self.id_column]) for i in selected_indices]
             self.selected_cells_by_row = get_selected_cells_by_row(self.cell_selections)
 
             if len(self.indexed_items) > 0 and len(self.indexed_items) >= self.cursor_pos and len(self.indexed_items[0][1]) >= self.id_column:
@@ -2662,8 +3029,23 @@ class Picker:
                     self.cursor_pos_id = -1
                 self.cursor_pos_prev = self.cursor_pos
         with self.data_lock:
-            self.items, self.header = tmp_items, tmp_header
+            # If the refresh function has finished then the rows are merged by their id so that only the rows which
+            #   have changed, been inserted or been removed are filtered and sorted again.
+            merged = None
+            if isinstance(self.items, LazyTable) and self.items is not tmp_items:
+                self.retired_tables.append(self.items)
+            if self.merge_rows_on_refresh and self.getting_data.is_set() and isinstance(self.items, list) and isinstance(tmp_items, list):
+                merged = merge_rows(self.items, tmp_items, self.id_column)
+            if merged is None:
+                self.items = tmp_items
+            else:
+                if not merged[1].in_place:
+                    # The list is kept so that the delta is applied to the same items as the previous stages
+                    self.items[:] = merged[0]
+                self.row_delta = merged[1]
+            self.header = tmp_header
             self.data_ready = True
+        self.wakeup.notify()
 
     def save_input_history(self, file_path: str, force_save: bool=True) -> bool:
         """ Save input field history. Returns True if successful save. """
@@ -2719,7 +3101,9 @@ class Picker:
         
         words = []
         # Extract words from lists
-        for row in [x[1] for x in self.indexed_items]:
+        # Only the rows of a LazyTable which have already been parsed are used.
+        rows = self.items.parsed_rows() if isinstance(self.items, LazyTable) else [x[1] for x in self.indexed_items]
+        for row in rows:
             for i, cell in enumerate(row):
                 if i != (self.id_column%len(row)):
                 # Split the item into words and strip punctuation from each word
@@ -3002,17 +3386,36 @@ class Picker:
         if len(self.right_panes):
             self.split_right = not self.split_right
             if self.right_panes[self.right_pane_index]["data"] in [[], None, {}]:
-                self.right_panes[self.right_pane_index]["data"] = self.right_panes[self.right_pane_index]["get_data"](self.right_panes[self.right_pane_index]["data"], self.get_function_data())
+                self.refresh_pane_data(self.right_panes[self.right_pane_index])
         self.ensure_no_overscroll()
 
     def toggle_left_pane(self):
         if len(self.left_panes):
             self.split_left = not self.split_left
             if self.left_panes[self.left_pane_index]["data"] in [[], None, {}]:
-                self.left_panes[self.left_pane_index]["data"] = self.left_panes[self.left_pane_index]["get_data"](self.left_panes[self.left_pane_index]["data"], self.get_function_data())
+                self.refresh_pane_data(self.left_panes[self.left_pane_index])
         self.ensure_no_overscroll()
 
 
+    def refresh_pane_data(self, pane: dict) -> None:
+        """ Get the data for the pane; panes with "async": True get it in the background. """
+        if pane.get("async"):
+            self.pane_data.refresh(pane, self.state)
+        else:
+            pane["data"] = pane["get_data"](pane["data"], self.state)
+
+    def pane_display_data(self, pane: dict):
+        """
+        Return the data to draw the pane with, None if the data of an asynchronous pane hasn't arrived yet or a
+            PaneDataError if it couldn't be got.
+        """
+        if not pane.get("async"):
+            return pane["data"]
+        data = self.pane_data.lookup(pane, self.state)
+        if data is not None and not isinstance(data, PaneDataError):
+            pane["data"] = data
+        return data
+
     def cycle_right_pane(self, increment=1):
         if len(self.right_panes) > 1:
             self.right_pane_index = (self.right_pane_index+1)%len(self.right_panes)
@@ -3063,18 +3466,111 @@ class Picker:
                 proc.terminate()
                 proc.join(timeout=0.01)
         self.processes = []
+        self.parallel_matcher.close()
+        self.pane_data.close()
+        self.stop_watching_resize()
+        with self.data_lock:
+            self.close_retired_tables()
+
+    def stop_watching_resize(self) -> None:
+        """ Give the SIGWINCH handler back to curses (or whichever handler was installed before run()) once run() returns. """
+        if self.resize_watched:
+            unwatch_resize(self.wakeup)
+            self.resize_watched = False
+
+    def close_retired_tables(self) -> None:
+        """
+        Close the LazyTables which fetch_data() has replaced. The rows being drawn are still read from the old table
+            until initialise_variables() has rebuilt indexed_items so this is called with data_lock held after that.
+        """
+        for table in self.retired_tables:
+            if table is not self.items:
+                table.close()
+        self.retired_tables = []
         self.items_sync_loop_event.set()
         if self.items_sync_thread != None:
             self.items_sync_thread.join(timeout=1)
 
     def cleanup_threads(self):
         self.thread_stop_event.set()
-        with self.data_generation_queue.mutex:
-            self.data_generation_queue.queue.clear()
+        self.data_generation_queue.clear()
         function_data = self.get_function_data()
         for t in self.threads:
             if t.is_alive():
                 t.join(timeout=0.01)
+        self.parallel_matcher.close()
+        self.pane_data.close()
+
+    def next_timer_timeout(self) -> Optional[float]:
+        """
+        Return the number of seconds until the next timer (auto-refresh, footer refresh, pane refresh) is due, or None
+            if there are no timers and the main loop can sleep until a key is pressed or it is notified.
+        """
+        now = time.time()
+        deadlines = []
+        if self.auto_refresh and not self.refreshing_data:
+            deadlines.append(self.initial_time + self.timer)
+        if self.footer_string_auto_refresh:
+            deadlines.append(self.initial_time_footer + self.footer_timer)
+        if self.split_right and len(self.right_panes) and self.right_panes[self.right_pane_index]["auto_refresh"]:
+            deadlines.append(self.initial_right_split_time + self.right_panes[self.right_pane_index]["refresh_time"])
+        if self.split_left and len(self.left_panes) and self.left_panes[self.left_pane_index]["auto_refresh"]:
+            deadlines.append(self.initial_left_split_time + self.left_panes[self.left_pane_index]["refresh_time"])
+        # Not every thread which loads data notifies the loop so the items (and a refresh which is in progress) are
+        #   checked regularly until it has finished
+        if not self.getting_data.is_set() or self.refreshing_data or not self.resize_watched:
+            deadlines.append(now + POLL_INTERVAL)
+        if self.frame_pending:
+            deadlines.append(self.last_frame_time + self.frame_interval())
+        if self.pane_data.next_deadline() is not None:
+            deadlines.append(self.pane_data.next_deadline())
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - now + TIMER_MARGIN)
+
+    def wait_for_event(self, tty_fd: int) -> int:
+        """
+        Sleep until a key is pressed, a background thread notifies self.wakeup, the terminal is resized or the next
+            timer is due. Returns the key or -1 if no key was pressed.
+        """
+        if self.pending_keys:
+            return self.pending_keys.popleft()
+        readable = self.wakeup.wait([tty_fd], self.next_timer_timeout())
+        if tty_fd in readable:
+            return get_char(tty_fd, timeout=0)
+        if self.wakeup.fileno() in readable:
+            self.wakeup.drain()
+            # Threads which generate data notify for each cell so the items are updated at most every
+            #   DATA_WAKEUP_INTERVAL, though a key which is pressed in the meantime is handled straight away.
+            delay = self.last_data_wakeup + DATA_WAKEUP_INTERVAL - time.time()
+            if delay > 0 and not self.wakeup.resized:
+                key = get_char(tty_fd, timeout=delay)
+                if key != -1:
+                    return key
+            self.last_data_wakeup = time.time()
+        return -1
+
+    def take_repeated_keys(self, key: int) -> int:
+        """
+        Take the keys waiting on the tty which repeat key (e.g., while j is held down) and return how many there were,
+            so that they can be handled as one motion. The first key which differs is kept for the next pass of the main
+            loop; the keys after it are left on the tty.
+        """
+        count = 0
+        while True:
+            if self.pending_keys:
+                if self.pending_keys[0] != key:
+                    break
+                self.pending_keys.popleft()
+                count += 1
+            elif self.tty_fd is not None and input_pending(self.tty_fd):
+                self.pending_keys.append(get_char(self.tty_fd, timeout=0))
+            else:
+                break
+        return count
+
+    def frame_interval(self) -> float:
+        return 1/self.max_frame_rate if self.max_frame_rate > 0 else 0
 
     def run(self) -> Tuple[list[int], str, dict]:
         """ Run the picker. """
@@ -3128,6 +3624,7 @@ class Picker:
 
         # Open tty to accept input
         tty_fd, self.saved_terminal_state = open_tty()
+        self.tty_fd = tty_fd
 
         self.update_term_size()
         self.calculate_section_sizes()
@@ -3139,14 +3636,21 @@ class Picker:
 
         COLS, LINES = os.get_terminal_size()
 
+        # Background threads may have been given the events of an earlier Picker along with its state
+        for event in (self.items_modified, self.getting_data):
+            if isinstance(event, NotifyingEvent):
+                event.wakeup = self.wakeup
+        self.resize_watched = watch_resize(self.wakeup)
 
-        getting_data_prev = False
+        # Reinitialise on the first pass in case data was fetched in the background before the loop started.
+        getting_data_prev = True
+        self.wakeup.notify()
 
         # Main loop
         while True:
             # key = self.stdscr.getch()
 
-            key = get_char(tty_fd, timeout=0.2)
+            key = self.wait_for_event(tty_fd)
             if key != -1:
                 self.logger.info(f"key={key}")
                 self.last_key = key
@@ -3154,16 +3658,24 @@ class Picker:
             # Ensure that
 
             if not self.getting_data.is_set():
-                self.initialise_variables()
+                with self.data_lock:
+                    self.initialise_variables()
                 getting_data_prev = True
             elif getting_data_prev:
                 ## Ensure that we reinitialise one final time after all data is retrieved.
-                self.initialise_variables()
+                with self.data_lock:
+                    self.initialise_variables()
                 getting_data_prev = False
 
+            self.wakeup.resized = False
             self.term_resize_event = terminal_resized(COLS, LINES)
             COLS, LINES = os.get_terminal_size()
             if self.term_resize_event: 
+                # SIGWINCH is handled by watch_resize() rather than curses so curses has to be given the new size
+                try:
+                    curses.resizeterm(LINES, COLS)
+                except curses.error:
+                    pass
                 key = curses.KEY_RESIZE
 
             if key in self.disabled_keys: continue
@@ -3176,6 +3688,7 @@ class Picker:
                     if self.data_ready:
                         self.logger.debug(f"Data ready after refresh")
                         self.initialise_variables()
+                        self.close_retired_tables()
 
                         self.initial_time = time.time()
 
@@ -3198,6 +3711,7 @@ class Picker:
                     t = threading.Thread(target=self.fetch_data)
                     t.start()
                 else:
+                    self.stop_watching_resize()
                     function_data = self.get_function_data()
                     return [], "refresh", function_data
 
@@ -3222,15 +3736,11 @@ class Picker:
                 self.draw_screen()
 
             if self.split_right and len(self.right_panes) and self.right_panes[self.right_pane_index]["auto_refresh"] and ((time.time() - self.initial_right_split_time) > self.right_panes[self.right_pane_index]["refresh_time"]):
-                get_data = self.right_panes[self.right_pane_index]["get_data"]
-                data = self.right_panes[self.right_pane_index]["data"]
-                self.right_panes[self.right_pane_index]["data"] = get_data(data, self.get_function_data())
+                self.refresh_pane_data(self.right_panes[self.right_pane_index])
                 self.initial_right_split_time = time.time()
 
             if self.split_left and len(self.left_panes) and self.left_panes[self.left_pane_index]["auto_refresh"] and ((time.time() - self.initial_left_split_time) > self.left_panes[self.left_pane_index]["refresh_time"]):
-                get_data = self.left_panes[self.left_pane_index]["get_data"]
-                data = self.left_panes[self.left_pane_index]["data"]
-                self.left_panes[self.right_pane_index]["data"] = get_data(data, self.get_function_data())
+                self.refresh_pane_data(self.left_panes[self.left_pane_index])
                 self.initial_left_split_time = time.time()
 
             if self.check_key("help", key, self.keys_dict):
@@ -3514,7 +4024,7 @@ class Picker:
             #     # self.move_column(direction=1)
 
             elif self.check_key("cursor_down", key, self.keys_dict):
-                page_turned = self.cursor_down()
+                page_turned = self.cursor_down(count=1+self.take_repeated_keys(key))
                 if not page_turned: clear_screen = False
             elif self.check_key("half_page_down", key, self.keys_dict):
                 self.cursor_down(count=self.items_per_page//2)
@@ -3524,7 +4034,7 @@ class Picker:
                 self.cursor_down(count=5)
                 clear_screen = True
             elif self.check_key("cursor_up", key, self.keys_dict):
-                page_turned = self.cursor_up()
+                page_turned = self.cursor_up(count=1+self.take_repeated_keys(key))
                 if not page_turned: clear_screen = False
             elif self.check_key("five_up", key, self.keys_dict):
                 # if self.cursor_up(count=5): clear_screen = True
@@ -3539,7 +4049,7 @@ class Picker:
                     item_index = self.indexed_items[self.cursor_pos][0]
                     cell_index = (self.indexed_items[self.cursor_pos][0], self.selected_column)
                     row, col = cell_index
-                    selected_count = sum(self.selections.values())
+                    selected_count = get_selection_count(self.selections)
                     if self.max_selected == -1 or selected_count >= self.max_selected:
                         self.toggle_item(item_index)
 
@@ -3570,6 +4080,8 @@ class Picker:
 
             elif self.check_key("select_none", key, self.keys_dict):  # Deselect all (M or ctrl-r)
                 self.deselect_all()
+            elif self.check_key("invert_selection", key, self.keys_dict):
+                self.invert_selection()
 
             elif self.check_key("cursor_top", key, self.keys_dict):
                 new_pos = 0
@@ -3608,9 +4120,11 @@ class Picker:
                 options_sufficient = True
                 usrtxt = self.user_opts
                 for index in selected_indices:
-                    if self.require_option[index]:
-                        if self.option_functions[index] != None:
-                            options_sufficient, usrtxt = self.option_functions[index](
+                    require_option = self.require_option[index] if index < len(self.require_option) else self.require_option_default
+                    if require_option:
+                        option_function = self.option_functions[index] if index < len(self.option_functions) else self.default_option_function
+                        if option_function != None:
+                            options_sufficient, usrtxt = option_function(
                                 stdscr=self.stdscr,
                                 refresh_screen_function=lambda: self.draw_screen(),
                             )
@@ -3632,10 +4146,12 @@ class Picker:
                     restore_terminal_settings(tty_fd, self.saved_terminal_state)
                     return selected_indices, usrtxt, function_data
             elif self.check_key("page_down", key, self.keys_dict):  # Next page
-                self.cursor_pos = min(len(self.indexed_items) - 1, self.cursor_pos+self.items_per_page)
+                pages = 1 + self.take_repeated_keys(key)
+                self.cursor_pos = min(len(self.indexed_items) - 1, self.cursor_pos+pages*self.items_per_page)
 
             elif self.check_key("page_up", key, self.keys_dict):
-                self.cursor_pos = max(0, self.cursor_pos-self.items_per_page)
+                pages = 1 + self.take_repeated_keys(key)
+                self.cursor_pos = max(0, self.cursor_pos-pages*self.items_per_page)
 
             elif self.check_key("redraw_screen", key, self.keys_dict):
                 self.refresh_and_draw_screen()
@@ -3647,7 +4163,7 @@ class Picker:
                     self.sort_column = self.selected_column
                 if len(self.indexed_items) > 0:
                     current_index = self.indexed_items[self.cursor_pos][0]
-                    sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                    self.apply_sort()  # Re-sort self.items based on new column
                     self.cursor_pos = [row[0] for row in self.indexed_items].index(current_index)
 
                 self.logger.info(f"key_function cycle_sort_method. (sort_column, sort_method) = ({self.sort_column}, {self.columns_sort_method[self.sort_column]})")
@@ -3657,7 +4173,7 @@ class Picker:
                 self.columns_sort_method[self.sort_column] = (self.columns_sort_method[self.sort_column]-1) % len(self.SORT_METHODS)
                 if len(self.indexed_items) > 0:
                     current_index = self.indexed_items[self.cursor_pos][0]
-                    sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                    self.apply_sort()  # Re-sort self.items based on new column
                     self.cursor_pos = [row[0] for row in self.indexed_items].index(current_index)
                 self.logger.info(f"key_function cycle_sort_method. (sort_column, sort_method) = ({self.sort_column}, {self.columns_sort_method[self.sort_column]})")
 
@@ -3665,10 +4181,16 @@ class Picker:
                 self.sort_reverse[self.sort_column] = not self.sort_reverse[self.sort_column]
                 if len(self.indexed_items) > 0:
                     current_index = self.indexed_items[self.cursor_pos][0]
-                    sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                    self.apply_sort()  # Re-sort self.items based on new column
                     self.draw_screen()
                     self.cursor_pos = [row[0] for row in self.indexed_items].index(current_index)
                 self.logger.info(f"key_function cycle_sort_order. (sort_column, sort_method, sort_reverse) = ({self.sort_column}, {self.columns_sort_method[self.sort_column]}, {self.sort_reverse[self.sort_column]})")
+            elif self.check_key("sort_push", key, self.keys_dict):
+                self.push_sort_level()
+                self.logger.info(f"key_function sort_push. sort_columns = {self.sort_columns}")
+            elif self.check_key("sort_pop", key, self.keys_dict):
+                self.pop_sort_level()
+                self.logger.info(f"key_function sort_pop. sort_columns = {self.sort_columns}")
             elif self.check_key("col_select", key, self.keys_dict):
                 col_index = key - ord('0')
                 self.logger.info(f"key_function col_select {col_index}")
@@ -3676,7 +4198,7 @@ class Picker:
                     self.sort_column = col_index
                     if len(self.indexed_items) > 0:
                         current_index = self.indexed_items[self.cursor_pos][0]
-                        sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                        self.apply_sort()  # Re-sort self.items based on new column
                         self.cursor_pos = [row[0] for row in self.indexed_items].index(current_index)
             elif self.check_key("col_select_next", key, self.keys_dict):
                 self.logger.info(f"key_function col_select_next {self.selected_column}")
@@ -3890,6 +4412,9 @@ class Picker:
                 else: field_end_f = lambda: self.get_term_size()[1]-3
                 self.set_registers()
                 words = self.get_word_list()
+                # The rows are filtered as the query is typed and put back once it is committed or abandoned
+                prev_indexed_items, prev_cursor_pos = self.indexed_items, self.cursor_pos
+                prev_index = self.indexed_items[self.cursor_pos][0] if len(self.indexed_items)>0 else 0
                 usrtxt, return_val = input_field(
                     self.stdscr,
                     usrtxt=usrtxt,
@@ -3906,25 +4431,29 @@ class Picker:
                     function_auto_complete=False,
                     word_auto_complete=True,
                     auto_complete_words=words,
+                    live_function=self.preview_filter,
                 )
+                if self.indexed_items is not prev_indexed_items:
+                    self.indexed_items, self.cursor_pos = prev_indexed_items, prev_cursor_pos
+                    self.indexed_items_version += 1
                 if return_val:
                     self.filter_query = usrtxt
                     self.history_filter_and_search.append(usrtxt)
 
+                    # The query has been committed so the filter isn't cancelled by keys which are typed while it runs
+                    self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query, filter_state=self.filter_state, matcher=self.parallel_matcher)
                     # If the current mode filter has been changed then go back to the first mode
                     if self.modes and "filter" in self.modes[self.mode_index] and self.modes[self.mode_index]["filter"] not in self.filter_query:
                         self.mode_index = 0
                     # elif "filter" in modes[mode_index] and modes[mode_index]["filter"] in filter_query:
                     #     filter_query.split(modes[mode_index]["filter"])
 
-                    prev_index = self.indexed_items[self.cursor_pos][0] if len(self.indexed_items)>0 else 0
-                    self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query)
                     if prev_index in [x[0] for x in self.indexed_items]: new_index = [x[0] for x in self.indexed_items].index(prev_index)
                     else: new_index = 0
                     self.cursor_pos = new_index
                     # Re-sort self.items after applying filter
                     if self.columns_sort_method[self.selected_column] != 0:
-                        sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                        self.apply_sort()  # Re-sort self.items based on new column
 
             elif self.check_key("search_input", key, self.keys_dict):
                 self.logger.info(f"key_function search_input")
@@ -3935,6 +4464,8 @@ class Picker:
                 else: field_end_f = lambda: self.get_term_size()[1]-3
                 self.set_registers()
                 words = self.get_word_list()
+                # The cursor moves to the matches as the query is typed and is put back once it is committed or abandoned
+                prev_search = (self.cursor_pos, self.highlights, self.search_index, self.search_count)
                 usrtxt, return_val = input_field(
                     self.stdscr,
                     usrtxt=usrtxt,
@@ -3950,7 +4481,9 @@ class Picker:
                     function_auto_complete=False,
                     word_auto_complete=True,
                     auto_complete_words=words,
+                    live_function=lambda query: self.preview_search(query, prev_search[0]),
                 )
+                self.cursor_pos, self.highlights, self.search_index, self.search_count = prev_search
                 if return_val:
                     self.search_query = usrtxt
                     self.history_filter_and_search.append(usrtxt)
@@ -3960,7 +4493,11 @@ class Picker:
                         highlights=self.highlights,
                         cursor_pos=self.cursor_pos,
                         unselectable_indices=self.unselectable_indices,
+                        items=self.items,
+                        matcher=self.parallel_matcher,
+                        **self.search_cache_keys(),
                     )
+                    self.stage_keys["search"] = (self.indexed_items_version, self.search_query)
                     if return_val:
                         self.cursor_pos, self.search_index, self.search_count, self.highlights = tmp_cursor, tmp_index, tmp_count, tmp_highlights
                     else:
@@ -3975,6 +4512,9 @@ class Picker:
                     cursor_pos=self.cursor_pos,
                     unselectable_indices=self.unselectable_indices,
                     continue_search=True,
+                    items=self.items,
+                    matcher=self.parallel_matcher,
+                    **self.search_cache_keys(),
                 )
                 if return_val:
                     self.cursor_pos, self.search_index, self.search_count, self.highlights = tmp_cursor, tmp_index, tmp_count, tmp_highlights
@@ -3988,6 +4528,9 @@ class Picker:
                     unselectable_indices=self.unselectable_indices,
                     continue_search=True,
                     reverse=True,
+                    items=self.items,
+                    matcher=self.parallel_matcher,
+                    **self.search_cache_keys(),
                 )
                 if return_val:
                     self.cursor_pos, self.search_index, self.search_count, self.highlights = tmp_cursor, tmp_index, tmp_count, tmp_highlights
@@ -4019,14 +4562,15 @@ class Picker:
                         self.filter_query = ""
                         self.mode_index = 0
                     prev_index = self.indexed_items[self.cursor_pos][0] if len(self.indexed_items)>0 else 0
-                    self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query)
+                    self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query, filter_state=self.filter_state, matcher=self.parallel_matcher)
                     if prev_index in [x[0] for x in self.indexed_items]: new_index = [x[0] for x in self.indexed_items].index(prev_index)
                     else: new_index = 0
                     self.cursor_pos = new_index
                     # Re-sort self.items after applying filter
                     if self.columns_sort_method[self.selected_column] != 0:
-                        sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                        self.apply_sort()  # Re-sort self.items based on new column
                 elif self.cancel_is_back:
+                    self.stop_watching_resize()
                     function_data = self.get_function_data()
                     return [], "escape", function_data
 
@@ -4085,7 +4629,7 @@ class Picker:
                             else:
                                 prev_index = self.indexed_items[self.cursor_pos][0] if len(self.indexed_items)>0 else 0
 
-                            self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query)
+                            self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query, filter_state=self.filter_state, matcher=self.parallel_matcher)
                             if prev_index >= 0 and prev_index in [x[0] for x in self.indexed_items]:
                                 new_index = [x[0] for x in self.indexed_items].index(prev_index)
                             else:
@@ -4093,7 +4637,7 @@ class Picker:
                             self.cursor_pos = new_index
                             # Re-sort self.items after applying filter
                             if len(self.items) and self.items != [[]]:
-                                sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                                self.apply_sort()  # Re-sort self.items based on new column
             elif self.check_key("mode_prev", key, self.keys_dict): # shift+tab key
                 self.logger.info(f"key_function mode_prev")
                 if len(self.modes):
@@ -4108,12 +4652,12 @@ class Picker:
                             prev_index = self.indexed_items[self.cursor_pos][0] if len(self.indexed_items)>0 else 0
 
                             # if len(self.items) and self.items != [[]]:
-                            self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query)
+                            self.indexed_items = filter_items(self.items, self.indexed_items, self.filter_query, filter_state=self.filter_state, matcher=self.parallel_matcher)
                             if prev_index in [x[0] for x in self.indexed_items]: new_index = [x[0] for x in self.indexed_items].index(prev_index)
                             else: new_index = 0
                             self.cursor_pos = new_index
                             # Re-sort self.items after applying filter
-                            sort_items(self.indexed_items, sort_method=self.columns_sort_method[self.sort_column], sort_column=self.sort_column, sort_reverse=self.sort_reverse[self.sort_column])  # Re-sort self.items based on new column
+                            self.apply_sort()  # Re-sort self.items based on new column
             elif self.check_key("file_next", key, self.keys_dict):
                 self.switch_file(increment=1)
 
@@ -4304,8 +4848,8 @@ class Picker:
 
                 if len(self.indexed_items) > 0 and self.editable_columns[self.selected_column]:
 
-                    selected_cells = [self.items[index][self.selected_column] for index, selected in self.selections.items() if selected ]
-                    selected_cells_indices = [(index, self.selected_column) for index, selected in self.selections.items() if selected ]
+                    selected_cells = [self.items[index][self.selected_column] for index in get_selected_indices(self.selections)]
+                    selected_cells_indices = [(index, self.selected_column) for index in get_selected_indices(self.selections)]
 
                     edited_cells = edit_strings_in_nvim(selected_cells)
                     count = 0
@@ -4347,6 +4891,7 @@ class Picker:
                     if return_val:
                         self.indexed_items[self.cursor_pos][1][self.selected_column] = usrtxt
                         self.history_edits.append(usrtxt)
+                        self.mark_items_changed()
             elif self.check_key("edit_ipython", key, self.keys_dict):
                 self.logger.info(f"key_function edit_ipython")
                 try:
@@ -4404,7 +4949,15 @@ class Picker:
 
 
 
-            self.draw_screen(clear=clear_screen)
+            # Draw at most max_frame_rate frames per second so that a burst of keys is drawn once
+            self.frame_clear = self.frame_clear or clear_screen
+            if time.time() - self.last_frame_time >= self.frame_interval():
+                self.draw_screen(clear=self.frame_clear)
+                self.last_frame_time = time.time()
+                self.frame_clear = False
+                self.frame_pending = False
+            else:
+                self.frame_pending = True
 
 
 
@@ -4479,13 +5032,25 @@ def parse_arguments() -> Tuple[argparse.Namespace, dict]:
     parser.add_argument('--stdin', dest='stdin', action='store_true', help='Table passed on stdin')
     parser.add_argument('--stdin2', action='store_true', help='Table passed on stdin')
     parser.add_argument('--generate', '-g', type=str, help='Pass file to generate data for listpick Picker.')
+    parser.add_argument('--no-cache', action="store_true", help="Generate every cell with --generate rather than using the cells cached in ~/.cache/listpick.")
+    parser.add_argument('--clear-cache', action="store_true", help="Clear the cache of generated cells in ~/.cache/listpick.")
     parser.add_argument('--delimiter', '-d', dest='delimiter', default='\t', help='Delimiter for rows in the table (default: tab)')
     parser.add_argument('-t', dest='file_type', choices=['tsv', 'csv', 'json', 'xlsx', 'ods', 'pkl'], help='Type of file (tsv, csv, json, xlsx, ods)')
     parser.add_argument('--debug', action="store_true", help="Enable debug log.")
     parser.add_argument('--debug-verbose', action="store_true", help="Enable debug verbose log.")
     parser.add_argument('--headerless', action="store_true", help="By default the first row is loaded as data. If --headerless is passed then the first row is interpreted as a header row.")
+    parser.add_argument('--columnar', action="store_true", help="Hold the table in a compact column store. Reduces memory usage for large tables.")
+    parser.add_argument('--stream', action="store_true", help="Load csv and tsv files in chunks so that the Picker can be used while a large file is still loading.")
+    parser.add_argument('--lazy', action="store_true", help="Memory-map csv and tsv files and only parse the rows which are used. For files which are larger than memory.")
     args = parser.parse_args()
 
+    if args.clear_cache:
+        cache = ResultCache()
+        cache.clear()
+        cache.close()
+        print(f"Cleared {cache.path}")
+        if not (args.file or args.stdin or args.stdin2 or args.generate or args.load):
+            sys.exit(0)
 
     function_data = {
         "items" : [],
@@ -4516,7 +5081,7 @@ def parse_arguments() -> Tuple[argparse.Namespace, dict]:
     #     input_arg = args.filename
 
     elif args.generate:
-        function_data["refresh_function"] = lambda items, header, visible_rows_indices, getting_data, state: generate_picker_data_from_file(args.generate, items, header, visible_rows_indices, getting_data, state)
+        function_data["refresh_function"] = lambda items, header, visible_rows_indices, getting_data, state: generate_picker_data_from_file(args.generate, items, header, visible_rows_indices, getting_data, state, use_cache=not args.no_cache)
         function_data["get_data_startup"] = True
         function_data["get_new_data"] = True
         return args, function_data
@@ -4538,14 +5103,40 @@ def parse_arguments() -> Tuple[argparse.Namespace, dict]:
         filetype = args.file_type
     
 
+    if args.lazy and args.file and filetype in ['csv', 'tsv']:
+        lazy_table = LazyTable(os.path.expandvars(os.path.expanduser(input_arg)), file_type=filetype)
+        function_data["items"] = lazy_table
+        function_data["refresh_function"] = lambda items, header, visible_rows_indices, getting_data, state: index_table_in_chunks(items, header, getting_data, state, first_row_is_header=args.headerless)
+        function_data["get_data_startup"] = True
+        function_data["get_new_data"] = True
+        function_data["loaded_file"] = args.file[0]
+        function_data["loaded_files"] = args.file
+        function_data["loaded_file_states_new"] = [FileState(path=f) for f in args.file]
+        return args, function_data
+
+    if args.stream and args.file and filetype in ['csv', 'tsv']:
+        function_data["refresh_function"] = lambda items, header, visible_rows_indices, getting_data, state: load_table_in_chunks(input_arg, items, header, getting_data, state, file_type=filetype, first_row_is_header=args.headerless)
+        function_data["get_data_startup"] = True
+        function_data["get_new_data"] = True
+        function_data["loaded_file"] = args.file[0]
+        function_data["loaded_files"] = args.file
+        function_data["loaded_file_states_new"] = [FileState(path=f) for f in args.file]
+        if args.columnar:
+            function_data["items"] = ColumnStore()
+        return args, function_data
+
     while True:
         try:
-            items, header, sheets = table_to_list(
-                input_arg=input_arg, 
-                delimiter=args.delimiter, 
-                file_type = filetype,
-                first_row_is_header=args.headerless,
-            )
+            if args.columnar and args.file and filetype in ['csv', 'tsv']:
+                # The rows are encoded as they are read rather than converted once the whole table is in memory
+                items, header, sheets = table_to_column_store(input_arg, file_type=filetype, first_row_is_header=args.headerless)
+            else:
+                items, header, sheets = table_to_list(
+                    input_arg=input_arg, 
+                    delimiter=args.delimiter, 
+                    file_type = filetype,
+                    first_row_is_header=args.headerless,
+                )
             if args.file:
                 function_data["loaded_file"] = args.file[0]
                 function_data["loaded_files"] = args.file
@@ -4562,6 +5153,9 @@ def parse_arguments() -> Tuple[argparse.Namespace, dict]:
             else:
                 break
 
+    if args.columnar and not isinstance(items, ColumnStore):
+        items = ColumnStore.from_rows(items)
+
     function_data["items"] = items
     if header: function_data["header"] = header
     function_data["sheets"] = sheets
@@ -4824,7 +5418,7 @@ def main() -> None:
             "data": [],
             "refresh_time": 1.0,
         },
-        # File attributes dynamic
+        # File attributes dynamic, got in the background
         {
             "proportion": 1/3,
             "auto_refresh": True,
@@ -4832,6 +5426,8 @@ def main() -> None:
             "display": right_split_file_attributes_dynamic,
             "data": [],
             "refresh_time": 2.0,
+            "async": True,
+            "prefetch": 1,
         },
         # List of random numbers generated each second
         {
@@ -4889,7 +5485,7 @@ def main() -> None:
             "data": [],
             "refresh_time": 1.0,
         },
-        # File attributes dynamic
+        # File attributes dynamic, got in the background
         {
             "proportion": 1/3,
             "auto_refresh": True,
@@ -4897,6 +5493,8 @@ def main() -> None:
             "display": left_split_file_attributes_dynamic,
             "data": [],
             "refresh_time": 2.0,
+            "async": True,
+            "prefetch": 1,
         },
         # List of random numbers generated each second
         {
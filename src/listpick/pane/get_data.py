@@ -9,6 +9,7 @@ License: MIT
 """
 
 from listpick.pane.pane_utils import get_file_attributes
+from listpick.pane.time_series import RingBuffer
 
 def data_refresh_randint_by_row(data, state):
     """
@@ -20,6 +21,8 @@ def data_refresh_randint_by_row(data, state):
     data[0]: 0,1,2,...,n+1
     data[1]: randint(), randint(), ...
     data[2]: row id
+
+    data[0] and data[1] are RingBuffers so only the last GRAPH_CAPACITY points are kept.
     """
     from random import randint
     if state["indexed_items"]:
@@ -27,7 +30,7 @@ def data_refresh_randint_by_row(data, state):
     else:
         return [[0], [0], -1]
     if data in [[], {}, None] or data[2] != id:
-        return [[0], [randint(0, 1000)], id]
+        return [RingBuffer([0]), RingBuffer([randint(0, 1000)]), id]
     else:
         data[0].append(data[0][-1]+1)
         data[1].append(randint(0, 1000))
@@ -43,11 +46,13 @@ def data_refresh_randint(data, state):
     data[0]: 0,1,2,...,n+1
     data[1]: randint(), randint(), ...
     data[2]: row id
+
+    data[0] and data[1] are RingBuffers so only the last GRAPH_CAPACITY points are kept.
     """
     from random import randint
 
     if data in [[], {}, None]:
-        return [[0], [randint(0, 1000)], -1]
+        return [RingBuffer([0]), RingBuffer([randint(0, 1000)]), -1]
     else:
         data[0].append(data[0][-1]+1)
         data[1].append(randint(0, 1000))
@@ -78,6 +83,8 @@ def get_dl(data, state):
     data[0]: 0,1,2,...,n+1
     data[1]: dl_speed_at_0, dl_speed_at_1, ...
     data[2]: row id
+
+    data[0] and data[1] are RingBuffers so only the last GRAPH_CAPACITY points are kept.
     """
     from aria2tui.utils import aria2c_utils
 
@@ -90,7 +97,7 @@ def get_dl(data, state):
     dl, ul = int(dl), int(ul)
 
     if data in [[], {}, None]:
-        return [[0], [dl], gid]
+        return [RingBuffer([0]), RingBuffer([dl]), gid]
     else:
         data[0].append(data[0][-1]+1)
         data[1].append(dl)
@@ -0,0 +1,193 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+pane_data.py
+Get the data for panes in the background so that a slow get_data function doesn't block drawing or moving the cursor.
+
+A pane is handled by the PaneDataService if it has "async": True. These keys of the pane are also used:
+    "cache_ttl":    seconds for which the data of a row is kept (default PANE_CACHE_TTL; refresh_time if the pane
+                    has auto_refresh)
+    "prefetch":     the number of rows either side of the cursor for which data is also got (default 0)
+
+get_data(data, state) is run on a worker thread. The state which it is given is the state of the picker except that
+    state["indexed_items"] holds only the row that the data is for and state["cursor_pos"] is 0, so the get_data
+    functions which read the row under the cursor (e.g., update_file_attributes) can get the data for any row. It
+    should return new data rather than modifying data, which may be being drawn.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import logging
+import threading
+import time
+from collections import ChainMap, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Mapping, Optional, Tuple
+
+logger = logging.getLogger('picker_log')
+
+# Seconds for which the data for a row is kept if the pane doesn't set cache_ttl
+PANE_CACHE_TTL = 30.0
+# The number of (pane, row) entries which are kept; the least recently used are dropped first
+PANE_CACHE_SIZE = 512
+# Seconds after which get_data is tried again for a row whose data it failed to get
+PANE_ERROR_TTL = 5.0
+# Data is only requested once the cursor has stayed on a row for this long (in seconds) while it is moving quickly
+PANE_DEBOUNCE = 0.1
+# The number of threads which run get_data
+PANE_WORKERS = 2
+
+
+class PaneDataError(str):
+    """ Cached in place of the data of a row when get_data fails before any data has been got for the row. """
+
+
+class PaneDataService:
+    """
+    Run the get_data functions of asynchronous panes on worker threads and cache their data by (pane, row id).
+
+    lookup() is called when a pane is drawn. It returns the cached data for the row under the cursor, or None if
+        there is none yet, in which case a placeholder should be drawn, and requests the data if it is missing or
+        older than the pane's TTL. If get_data failed before any data was got for the row then it returns a
+        PaneDataError, which a placeholder can show, and the data is requested again after PANE_ERROR_TTL.
+        wakeup.notify() is called when data arrives so that the pane can be drawn again.
+    """
+
+    def __init__(self, wakeup=None, cache_size: int = PANE_CACHE_SIZE, debounce: float = PANE_DEBOUNCE, workers: int = PANE_WORKERS):
+        self.wakeup = wakeup
+        self.cache_size = cache_size
+        self.debounce = debounce
+        self.workers = workers
+
+        # (id(pane), row id) -> (time, data)
+        self.cache: OrderedDict[Tuple[int, Any], Tuple[float, Any]] = OrderedDict()
+        self.in_flight: set[Tuple[int, Any]] = set()
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+        self.cursor_key: Optional[Tuple[int, Any]] = None
+        self.cursor_time = 0.0
+        self.fetch_after = 0.0
+        self.deadline: Optional[float] = None
+
+    def ttl(self, pane: dict) -> float:
+        if pane.get("auto_refresh"):
+            return pane["refresh_time"]
+        return pane.get("cache_ttl", PANE_CACHE_TTL)
+
+    def expired(self, pane: dict, entry: Optional[Tuple[float, Any]], now: float) -> bool:
+        """ Return True if the cached entry is missing or should be got again. """
+        if entry is None:
+            return True
+        ttl = self.ttl(pane)
+        if isinstance(entry[1], PaneDataError):
+            ttl = min(ttl, PANE_ERROR_TTL)
+        return now - entry[0] >= ttl
+
+    def row_key(self, pane: dict, state: Mapping, index: int) -> Tuple[int, Any]:
+        """ Return the cache key of the pane's data for the row at index in state["indexed_items"]. """
+        indexed_items = state["indexed_items"]
+        if not 0 <= index < len(indexed_items):
+            return (id(pane), None)
+        row = indexed_items[index][1]
+        try:
+            return (id(pane), row[state["id_column"]])
+        except (IndexError, KeyError, TypeError):
+            return (id(pane), indexed_items[index][0])
+
+    def row_state(self, state: Mapping, index: int) -> Mapping:
+        """ Return the state for get_data with only the row at index in indexed_items. """
+        indexed_items = state["indexed_items"]
+        if not 0 <= index < len(indexed_items):
+            return state
+        return ChainMap({"indexed_items": [indexed_items[index]], "cursor_pos": 0}, state)
+
+    def lookup(self, pane: dict, state: Mapping) -> Any:
+        """ Return the data of the pane for the row under the cursor, or None if it hasn't been got yet. """
+        now = time.time()
+        index = state["cursor_pos"]
+        key = self.row_key(pane, state, index)
+        if key != self.cursor_key:
+            # Wait for the cursor to settle if it moved less than self.debounce ago
+            moving = now - self.cursor_time < self.debounce
+            self.cursor_key, self.cursor_time = key, now
+            self.fetch_after = now + self.debounce if moving else now
+
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+
+        if now < self.fetch_after:
+            self.deadline = self.fetch_after
+        else:
+            self.deadline = None
+            if self.expired(pane, entry, now):
+                self.request(pane, state, index, key, None if entry is None else entry[1])
+            for offset in range(1, pane.get("prefetch", 0) + 1):
+                for adjacent in (index + offset, index - offset):
+                    if 0 <= adjacent < len(state["indexed_items"]):
+                        self.prefetch(pane, state, adjacent, now)
+
+        return None if entry is None else entry[1]
+
+    def prefetch(self, pane: dict, state: Mapping, index: int, now: float) -> None:
+        key = self.row_key(pane, state, index)
+        with self.lock:
+            entry = self.cache.get(key)
+        if self.expired(pane, entry, now):
+            self.request(pane, state, index, key, None if entry is None else entry[1])
+
+    def refresh(self, pane: dict, state: Mapping) -> None:
+        """ Get the data of the pane for the row under the cursor again, e.g., when its refresh_time is up. """
+        index = state["cursor_pos"]
+        key = self.row_key(pane, state, index)
+        with self.lock:
+            entry = self.cache.get(key)
+        self.request(pane, state, index, key, None if entry is None else entry[1])
+
+    def request(self, pane: dict, state: Mapping, index: int, key: Tuple[int, Any], data: Any) -> None:
+        with self.lock:
+            if key in self.in_flight:
+                return
+            self.in_flight.add(key)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pane_data")
+            executor = self.executor
+        executor.submit(self.fetch, pane, key, self.row_state(state, index), data)
+
+    def fetch(self, pane: dict, key: Tuple[int, Any], state: Mapping, data: Any) -> None:
+        if isinstance(data, PaneDataError):
+            data = None
+        try:
+            result = pane["get_data"](data if data is not None else [], state)
+        except Exception as e:
+            logger.error(f"PaneDataService: get_data failed for {key[1]!r}: {e}")
+            # Keep showing the stale data if there is any
+            result = data if data is not None else PaneDataError(f"{type(e).__name__}: {e}")
+        with self.lock:
+            self.in_flight.discard(key)
+            self.cache[key] = (time.time(), result)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        if self.wakeup is not None:
+            self.wakeup.notify()
+
+    def next_deadline(self) -> Optional[float]:
+        """ Return the time at which the main loop should wake to request the data for a row that it has settled on. """
+        return self.deadline
+
+    def clear(self) -> None:
+        with self.lock:
+            self.cache.clear()
+
+    def close(self) -> None:
+        with self.lock:
+            executor, self.executor = self.executor, None
+            # The fetches which are cancelled would never take their keys out of in_flight, so the rows would not be
+            #   requested again when the Picker is next run
+            self.in_flight.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
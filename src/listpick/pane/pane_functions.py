@@ -12,6 +12,7 @@ import curses
 import os
 from listpick.pane.pane_utils import get_file_attributes, get_graph_string, escape_ansi
 from listpick.pane.get_data import update_file_attributes
+from listpick.pane.pane_data import PaneDataError
 
 def right_split_file_attributes(stdscr, x, y, w, h, state, row, cell, data: list = [], test: bool = False):
     """
@@ -172,4 +173,28 @@ def right_split_display_list(stdscr, x, y, w, h, state, row, cell, data: list =
         stdscr.addstr(y+1+number_to_display, x+2, f" ... {len(items)-number_to_display} more"[:w-2])
 
 
+    return []
+
+def right_split_placeholder(stdscr, x, y, w, h, state, row, cell, data: list = [], test: bool = False):
+    """
+    Display a placeholder in the right pane while its data is being got in the background, or the error if data is
+        a PaneDataError.
+    """
+    if test: return True
+
+    # Separator
+    for j in range(h):
+        stdscr.addstr(j+y, x, ' ', curses.color_pair(state["colours_start"]+16))
+
+    # Display pane count
+    pane_count = len(state["right_panes"])
+    pane_index = state["right_pane_index"]
+    if pane_count > 1:
+        s = f" {pane_index+1}/{pane_count} "
+        stdscr.addstr(y+h-1, x+w-len(s)-1, s, curses.color_pair(state["colours_start"]+20))
+
+    s = str(data) if isinstance(data, PaneDataError) else "Loading..."
+    if len(s) < w-1: s = f"{s:^{w-1}}"
+    stdscr.addstr(y+2, x+1, s[:w-1], curses.color_pair(state["colours_start"]+20))
+
     return []
@@ -9,6 +9,8 @@ License: MIT
 """
 
 import re
+import weakref
+from listpick.pane.time_series import RingBuffer, downsample
 
 def escape_ansi(line: str) -> str:
     """ Remove ansi characters from string. """
@@ -16,15 +18,34 @@ def escape_ansi(line: str) -> str:
     return ansi_escape.sub('', line)
 
 
+# Rendered graphs of RingBuffer series; see get_graph_string()
+_graph_cache: "weakref.WeakKeyDictionary[RingBuffer, tuple]" = weakref.WeakKeyDictionary()
+
 def get_graph_string(x_vals, y_vals, width=50, height=20, title=None, x_label=None, y_label=None):
-    """ Generate a graph of x_vals, y_vals using plotille"""
+    """
+    Generate a graph of x_vals, y_vals using plotille.
+
+    Series with more points than the graph has braille dots across are downsampled to one point per dot: the mean
+        is plotted with the min and max of each bucket. If x_vals and y_vals are RingBuffers then the graph is cached
+        and only rendered again when points are added or the size changes.
+    """
+    cache_key = None
+    if isinstance(x_vals, RingBuffer) and isinstance(y_vals, RingBuffer):
+        cache_key = (x_vals.version, y_vals.version, width, height, title, x_label, y_label)
+        cached = _graph_cache.get(y_vals)
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
 
     import plotille as plt
     # Create a figure and axis object using plotille
     fig = plt.Figure()
-    
-    # Plot the data on the figure
-    fig.plot(x_vals, y_vals)
+
+    # Plot the data on the figure; each character of the graph is two braille dots wide
+    xs, mins, maxs, means = downsample(x_vals, y_vals, max(1, 2*(width-10)))
+    if len(xs) < min(len(x_vals), len(y_vals)):
+        fig.plot(xs, mins)
+        fig.plot(xs, maxs)
+    fig.plot(xs, means)
     
     # Set the dimensions of the graph
     fig.width = width-10
@@ -42,6 +63,9 @@ def get_graph_string(x_vals, y_vals, width=50, height=20, title=None, x_label=No
     
     # Generate the ASCII art of the graph
     graph_str = str(fig.show())
+
+    if cache_key is not None:
+        _graph_cache[y_vals] = (cache_key, graph_str)
     
     return graph_str
 
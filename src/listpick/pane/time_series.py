@@ -0,0 +1,106 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+time_series.py
+A fixed-capacity series for the data of graph panes, and downsampling of a series to the width of a pane.
+
+The graph panes are given data = [x_vals, y_vals, id] and their get_data functions append a point on each refresh.
+    With RingBuffers for x_vals and y_vals only the last `capacity` points are kept so a pane which is left open
+    doesn't grow without bound.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+from array import array
+from typing import Iterable, Iterator, Sequence, Tuple
+
+# The number of points kept by a RingBuffer by default, e.g., an hour of points which are added each second
+GRAPH_CAPACITY = 3600
+
+
+class RingBuffer:
+    """
+    A list-like series of floats backed by an array which keeps only the last `capacity` values.
+
+    Supports append, extend, len, iteration and indexing (including negative indices and slices) so that it can be
+        used in place of the lists in the data of graph panes. version is increased whenever the values change so
+        that anything rendered from them can be cached.
+    """
+
+    def __init__(self, values: Iterable[float] = (), capacity: int = GRAPH_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.values = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.count = 0
+        self.version = 0
+        self.extend(values)
+
+    def append(self, value: float) -> None:
+        if self.count < self.capacity:
+            self.values[(self.start + self.count) % self.capacity] = value
+            self.count += 1
+        else:
+            self.values[self.start] = value
+            self.start = (self.start + 1) % self.capacity
+        self.version += 1
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.append(value)
+
+    def clear(self) -> None:
+        self.start = self.count = 0
+        self.version += 1
+
+    def tolist(self) -> list[float]:
+        """ Return the values in order, oldest first. """
+        end = self.start + self.count
+        if end <= self.capacity:
+            return self.values[self.start:end].tolist()
+        return self.values[self.start:].tolist() + self.values[:end - self.capacity].tolist()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.tolist()[index]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("RingBuffer index out of range")
+        return self.values[(self.start + index) % self.capacity]
+
+    def __repr__(self) -> str:
+        return f"RingBuffer({self.tolist()!r}, capacity={self.capacity})"
+
+
+def downsample(x_vals: Sequence[float], y_vals: Sequence[float], buckets: int) -> Tuple[list, list, list, list]:
+    """
+    Split the points into at most `buckets` consecutive buckets of (nearly) equal size and return the x of the
+        first point of each bucket and the min, max and mean of y in each bucket.
+
+    If there are no more points than buckets then every point is its own bucket.
+    """
+    x_vals = x_vals.tolist() if isinstance(x_vals, RingBuffer) else list(x_vals)
+    y_vals = y_vals.tolist() if isinstance(y_vals, RingBuffer) else list(y_vals)
+    n = min(len(x_vals), len(y_vals))
+    if n <= buckets or buckets < 1:
+        y_vals = y_vals[:n]
+        return x_vals[:n], y_vals, y_vals, y_vals
+
+    xs, mins, maxs, means = [], [], [], []
+    for b in range(buckets):
+        i, j = b * n // buckets, (b + 1) * n // buckets
+        bucket = y_vals[i:j]
+        xs.append(x_vals[i])
+        mins.append(min(bucket))
+        maxs.append(max(bucket))
+        means.append(sum(bucket) / len(bucket))
+    return xs, mins, maxs, means
@@ -87,6 +87,7 @@ def build_help_rows(keys_dict: dict, macros: list, debug: bool = False) -> list[
         "toggle_select":                    "Toggle selection.",
         "select_all":                       "Select all.",
         "select_none":                      "Select none.",
+        "invert_selection":                 "Invert selection.",
         "visual_selection_toggle":          "Toggle visual selection.",
         "visual_deselection_toggle":        "Toggle visual deselection.",
         "enter":                            "Accept selections.",
@@ -94,6 +95,8 @@ def build_help_rows(keys_dict: dict, macros: list, debug: bool = False) -> list[
         "cycle_sort_method":                "Cycle through sort methods.",
         "cycle_sort_method_reverse":        "Cycle through sort methods (reverse)",
         "cycle_sort_order":                 "Toggle sort order.",
+        "sort_push":                        "Push the sort column onto the sort stack (sort by several columns).",
+        "sort_pop":                         "Pop the last column from the sort stack.",
         "delete":                           "Delete row.",
         "delete_column":                    "Delete column.",
         "decrease_lines_per_page":          "Decrease lines per page.",
@@ -152,9 +155,9 @@ def build_help_rows(keys_dict: dict, macros: list, debug: bool = False) -> list[
     }
     sections = {
         "Navigation:": [ "cursor_down", "cursor_up", "half_page_up", "half_page_down", "page_up", "page_down", "cursor_bottom", "cursor_top", "five_up", "five_down", "scroll_right", "scroll_left", "scroll_right_25", "scroll_left_25", "scroll_far_right", "scroll_far_left", "col_select_next", "col_select_prev" , "col_select", "col_hide"],
-        "Selection:": [ "toggle_select", "select_all", "select_none", "visual_selection_toggle", "visual_deselection_toggle", "enter" ],
+        "Selection:": [ "toggle_select", "select_all", "select_none", "invert_selection", "visual_selection_toggle", "visual_deselection_toggle", "enter" ],
         "UI:": [ "toggle_footer", "redraw_screen", "decrease_lines_per_page", "increase_lines_per_page", "increase_column_width", "decrease_column_width", "notification_toggle", "toggle_right_pane", "cycle_right_pane", "toggle_left_pane", "cycle_left_pane"],
-        "Sort (On selected column):": [ "cycle_sort_method", "cycle_sort_method_reverse", "cycle_sort_order", ] ,
+        "Sort (On selected column):": [ "cycle_sort_method", "cycle_sort_method_reverse", "cycle_sort_order", "sort_push", "sort_pop", ] ,
         "Filter and search:": [ "filter_input", "search_input", "continue_search_forward", "continue_search_backward", ] ,
         "Settings:": [ "settings_input", "settings_options" ],
         "Options and modes:": [ "opts_input", "opts_select", "mode_next", "mode_prev", "pipe_input", "reset_opts" ],
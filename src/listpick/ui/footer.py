@@ -8,9 +8,26 @@ License: MIT
 
 import curses
 import logging
+from listpick.utils.utils import get_selection_count
 
 logger = logging.getLogger('picker_log')
 
+def load_progress_string(state: dict) -> str:
+    """
+    Return the percentage of the file loaded so far if a file is being loaded in chunks and the number of cells still
+        to be generated if data is being generated; otherwise "".
+    """
+    progress_str = ""
+    progress = state.get("load_progress")
+    if progress and not progress.get("done", True) and progress.get("total_bytes"):
+        progress_str += f" Loading {100*progress['bytes']//progress['total_bytes']}% |"
+    queue = state.get("data_generation_queue")
+    # Cells of rows which are filtered out are not being generated
+    backlog = queue.active() if queue else 0
+    if backlog:
+        progress_str += f" Generating {backlog} |"
+    return progress_str
+
 class Footer:
     def __init__(self, stdscr, colours_start, get_state_function):
         """
@@ -229,7 +246,7 @@ class StandardFooter(Footer):
         if state["pin_cursor"]: select_mode = f"{select_mode} "
 
         # Cursor & selection info
-        selected_count = sum(state["selections"].values())
+        selected_count = get_selection_count(state["selections"])
         if state["paginate"]:
             cursor_disp_str = f" [{selected_count}] {state['cursor_pos']+1}/{len(state['indexed_items'])} | Page {state['cursor_pos']//state['items_per_page']}/{len(state['indexed_items'])//state['items_per_page']} | {select_mode}"
         else:
@@ -239,6 +256,8 @@ class StandardFooter(Footer):
             else:
                 cursor_disp_str = f" [{selected_count}] {state['cursor_pos']+1}/{len(state['indexed_items'])} | {select_mode}"
 
+        cursor_disp_str = load_progress_string(state) + cursor_disp_str
+
         # Maximum chars that should be displayed
         max_chars = min(len(cursor_disp_str)+2, w)
         self.stdscr.addstr(self.picker_info_y, w-max_chars, f"{cursor_disp_str:>{max_chars-2}} ", curses.color_pair(self.colours_start+20))
@@ -249,7 +268,8 @@ class StandardFooter(Footer):
         sort_method_info = f"{state['SORT_METHODS'][state['columns_sort_method'][state['sort_column']]]}" if state['sort_column'] is not None else "NA"
         sort_order_info = "Desc." if state["sort_reverse"] else "Asc."
         sort_order_info = "▼" if state["sort_reverse"][state['sort_column']] else "▲"
-        sort_disp_str = f" Sort: ({sort_column_info}, {sort_method_info}, {sort_order_info}) "
+        sort_stack_info = "".join(f"({col}, {state['SORT_METHODS'][method]}, {'▼' if reverse else '▲'}) > " for col, method, reverse in state.get("sort_columns", []))
+        sort_disp_str = f" Sort: {sort_stack_info}({sort_column_info}, {sort_method_info}, {sort_order_info}) "
         max_chars = min(len(sort_disp_str)+2, w)
         self.stdscr.addstr(self.sort_info_y, w-max_chars, f"{sort_disp_str:>{max_chars-1}}", curses.color_pair(self.colours_start+20))
 
@@ -297,7 +317,8 @@ class CompactFooter(Footer):
         sort_method_info = f"{state['SORT_METHODS'][state['columns_sort_method'][state['sort_column']]]}" if state['sort_column'] is not None else "NA"
         sort_order_info = "Desc." if state["sort_reverse"][state['sort_column']] else "Asc."
         sort_order_info = "▼" if state["sort_reverse"][state['sort_column']] else "▲"
-        sort_disp_str = f" ({sort_column_info}, {sort_method_info}, {sort_order_info}) "
+        sort_stack_info = "".join(f"({col}, {state['SORT_METHODS'][method]}, {'▼' if reverse else '▲'}) > " for col, method, reverse in state.get("sort_columns", []))
+        sort_disp_str = f" {sort_stack_info}({sort_column_info}, {sort_method_info}, {sort_order_info}) "
         # self.stdscr.addstr(h - 2, w-right_width, f"{sort_disp_str:>{right_width-1}}", curses.color_pair(self.colours_start+20))
 
         if state["footer_string"]:
@@ -307,19 +328,19 @@ class CompactFooter(Footer):
             disp_string = f" {disp_string:>{footer_string_width-2}} "
             self.stdscr.addstr(h - 1, w-footer_string_width-1, " "*footer_string_width, curses.color_pair(self.colours_start+24))
             self.stdscr.addstr(h - 1, w-footer_string_width-1, f"{disp_string}", curses.color_pair(self.colours_start+24))
-            selected_count = sum(state["selections"].values())
+            selected_count = get_selection_count(state["selections"])
             if state["paginate"]:
                 cursor_disp_str = f" {state['cursor_pos']+1}/{len(state['indexed_items'])}  Page {state['cursor_pos']//state['items_per_page']}/{len(state['indexed_items'])}  Selected {selected_count}"
             else:
-                cursor_disp_str = f"{sort_disp_str} [{selected_count}] {state['cursor_pos']+1}/{len(state['indexed_items'])}"
+                cursor_disp_str = f"{sort_disp_str}{load_progress_string(state)} [{selected_count}] {state['cursor_pos']+1}/{len(state['indexed_items'])}"
             self.stdscr.addstr(h-2, w-right_width, f"{cursor_disp_str:>{right_width-2}}"[:right_width-1], curses.color_pair(self.colours_start+20))
         else:
             # Cursor & selection info
-            selected_count = sum(state["selections"].values())
+            selected_count = get_selection_count(state["selections"])
             if state["paginate"]:
                 cursor_disp_str = f" {state['cursor_pos']+1}/{len(state['indexed_items'])}  Page {state['cursor_pos']//state['items_per_page']}/{len(state['indexed_items'])}  Selected {selected_count}"
             else:
-                cursor_disp_str = f"{sort_disp_str} [{selected_count}] {state['cursor_pos']+1}/{len(state['indexed_items'])}"
+                cursor_disp_str = f"{sort_disp_str}{load_progress_string(state)} [{selected_count}] {state['cursor_pos']+1}/{len(state['indexed_items'])}"
             self.stdscr.addstr(h - 1, w-right_width, f"{cursor_disp_str:>{right_width-2}}"[:right_width-1], curses.color_pair(self.colours_start+20))
 
         self.stdscr.refresh()
@@ -0,0 +1,142 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+frame_buffer.py
+Damage-tracked drawing for curses windows.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import curses
+import logging
+
+from listpick.utils.utils import display_width
+
+logger = logging.getLogger('picker_log')
+
+# Window methods which do not change the contents of the window
+READ_ONLY_METHODS = {
+    "getmaxyx", "getbegyx", "getyx", "getparyx", "getch", "getkey", "get_wch", "keypad", "timeout",
+    "nodelay", "notimeout", "refresh", "noutrefresh", "leaveok", "scrollok", "idlok", "is_wintouched",
+}
+
+
+class FrameBuffer:
+    """
+    Wraps a curses window and only redraws the lines which have changed since the previous frame.
+
+    Between begin_frame() and end_frame() the addstr(y, x, str[, attr]) calls are recorded rather than drawn. When
+        the frame ends, each line whose calls differ from the previous frame is cleared and its calls are replayed;
+        the other lines are left as they are.
+
+    Outside of a frame all calls are passed to the window. An addstr outside of a frame marks its line as damaged so
+        that it is redrawn in the next frame and any other call which may change the window (erase, clear, bkgd, ...)
+        causes the next frame to be drawn in full. A frame is also drawn in full when it cannot be split into
+        lines; e.g., if a string wraps onto the next line.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.previous = None    # {y: [addstr args, ...]} for the last frame drawn
+        self.previous_shape = None
+        self.damaged = set()
+        self.depth = 0
+        self.lines = {}
+        self.calls = []
+        self.diffable = True
+        self.shape = (0, 0)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.window, name)
+        if name in READ_ONLY_METHODS or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.previous = None
+            if self.depth:
+                self.diffable = False
+            return attr(*args, **kwargs)
+        return call
+
+    def invalidate(self) -> None:
+        """ Draw the next frame in full. """
+        self.previous = None
+
+    def begin_frame(self) -> None:
+        """ Start recording a frame. Nested calls are part of the outer frame. """
+        self.depth += 1
+        if self.depth > 1:
+            return None
+        self.shape = self.window.getmaxyx()
+        self.lines = {}
+        self.calls = []
+        self.diffable = True
+
+    def addstr(self, *args) -> None:
+        if not self.depth:
+            if len(args) >= 3 and isinstance(args[0], int):
+                self.damaged.add(args[0])
+            else:
+                self.previous = None
+            return self.window.addstr(*args)
+
+        self.calls.append(args)
+        if len(args) < 3 or not isinstance(args[0], int) or not isinstance(args[2], str):
+            # Drawn at the cursor position so we can't tell which line it is on.
+            self.diffable = False
+            return None
+
+        y, x, text = args[0], args[1], args[2]
+        h, w = self.shape
+        if not (0 <= y < h and 0 <= x < w):
+            self.calls.pop()
+            raise curses.error("addwstr() returned ERR")
+        self.lines.setdefault(y, []).append(args)
+
+        width = display_width(text)
+        if width < 0 or x + width > w:
+            # Control characters or a string which wraps onto the next line
+            self.diffable = False
+            width = max(width, len(text))
+        # Writing past the bottom-right corner of the window is an error, as it is for the window.
+        if y + (x + width) // w >= h:
+            raise curses.error("addwstr() returned ERR")
+
+    def replay(self, calls: list) -> None:
+        for args in calls:
+            try:
+                self.window.addstr(*args)
+            except curses.error:
+                pass
+
+    def end_frame(self) -> None:
+        """ Draw the lines of the recorded frame which have changed since the previous frame. """
+        if self.depth == 0:
+            return None
+        self.depth -= 1
+        if self.depth:
+            return None
+
+        if self.previous is None or not self.diffable or self.shape != self.previous_shape:
+            self.window.erase()
+            self.replay(self.calls)
+        else:
+            for y in sorted(set(self.lines) | set(self.previous) | self.damaged):
+                line = self.lines.get(y, [])
+                if y not in self.damaged and line == self.previous.get(y, []):
+                    continue
+                try:
+                    self.window.move(y, 0)
+                    self.window.clrtoeol()
+                except curses.error:
+                    pass
+                self.replay(line)
+            # Other windows may have been drawn over this one so make sure that the whole window is compared on refresh.
+            self.window.touchwin()
+
+        self.previous = self.lines if self.diffable else None
+        self.previous_shape = self.shape
+        self.damaged = set()
+        self.lines = {}
+        self.calls = []
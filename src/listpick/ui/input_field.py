@@ -16,7 +16,7 @@ from datetime import datetime
 import logging
 
 logger = logging.getLogger('picker_log')
-from listpick.utils.user_input import get_char, open_tty
+from listpick.utils.user_input import get_char, input_pending, open_tty
 from listpick.utils import keycodes
 
 def input_field(
@@ -40,6 +40,7 @@ def input_field(
     auto_complete_words: list[str] = [],
     history: list[str] = [],
     clear_screen: bool = True,
+    live_function: Optional[Callable[[str], None]] = None,
         
 ) -> Tuple[str, bool]:
     """
@@ -63,6 +64,7 @@ def input_field(
         path_auto_complete (bool): whether tab (or shift+tab) should trigger path autocomplete
         history (list[str]): list of history to by cycled through with ctrl+n/ctrl+p
         clear_screen (bool): whether to clear the screen each time a key is pressed or getch timeout is reached.
+        live_function (Callable): called with the text whenever it changes and the keys which have been typed have been handled; e.g., to preview a filter as it is typed.
 
 
     ---Returns
@@ -80,6 +82,7 @@ def input_field(
     kill_ring_index = 0
     prev_usrtxt = ""
     history_index = len(history)
+    live_usrtxt = usrtxt
     show_completions = True
     completions = []
 
@@ -115,7 +118,13 @@ def input_field(
 
         h, w = stdscr.getmaxyx()
 
-        if refresh_screen_function != None:
+        # The text is only passed to live_function once the keys which have been typed (or pasted) have been handled
+        if live_function != None and usrtxt != live_usrtxt and not input_pending(tty_fd):
+            live_usrtxt = usrtxt
+            live_function(usrtxt)
+
+        # The screen is only redrawn once the keys which have been typed (or pasted) have been handled
+        if refresh_screen_function != None and not input_pending(tty_fd):
             refresh_screen_function()
 
         # If the beggining of the input field starts offscreen (i.e., x>=w or y>=h) then set x=0 or y=0
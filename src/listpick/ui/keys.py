@@ -31,6 +31,7 @@ picker_keys = {
     "toggle_select":                    [ord(' ')],
     "select_all":                       [ord('m'), 1], # Ctrl-a
     "select_none":                      [ord('M'), 18],   # Ctrl-r
+    "invert_selection":                 [keycodes.META_m],
     "visual_selection_toggle":          [ord('v')],
     "visual_deselection_toggle":        [ord('V')],
     "enter":                            [ord('\n'), curses.KEY_ENTER, 13],
@@ -38,6 +39,8 @@ picker_keys = {
     "cycle_sort_method":                [ord('s')],
     "cycle_sort_method_reverse":        [ord('S')],
     "cycle_sort_order":                 [ord('t')],
+    "sort_push":                        [keycodes.META_s],
+    "sort_pop":                         [keycodes.META_S],
     "delete":                           [curses.KEY_DC],
     "delete_column":                    [383], # Shift+Delete
     "decrease_lines_per_page":          [ord('-')],
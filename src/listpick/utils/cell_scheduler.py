@@ -0,0 +1,262 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+cell_scheduler.py
+Decide the order in which the cells of a generated table are filled.
+
+The scheduler holds one entry for each cell which is waiting to be generated. Cells are ordered by
+    1. their row: visible rows, then rows near the viewport, then the rest
+    2. their column's rank (visible columns before hidden columns)
+    3. their position on the screen (or their row index if they are not near the screen)
+Priorities are changed in place as the viewport moves and the cells of rows which are filtered out are set aside
+    until they are shown again.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import heapq
+import itertools
+import threading
+from typing import Iterable, Optional, Tuple
+
+# Row tiers
+VISIBLE = 0
+NEAR = 1
+REST = 2
+
+Cell = Tuple[int, int]      # (row, col)
+
+
+class CellScheduler:
+    """
+    A priority queue of cells with one entry per cell and O(log n) updates.
+
+    Entries are updated by marking the old heap entry as removed and pushing a new one; the heap is rebuilt when
+        removed entries make up most of it. Workers block in get() until a cell is ready.
+
+    Each call to start() begins a new generation; workers of an earlier generation get None from get().
+
+    If only the cells of filtered-out rows are left then the workers wait in get() for them to be shown again and
+        the generation's idle event is set so that the picker stops waiting for data; it is cleared again when
+        set_active_rows() brings cells back.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.heap: list[list] = []                  # [priority, sequence, cell, valid]
+        self.entries: dict[Cell, list] = {}         # The heap entry of each pending cell
+        self.parked: set[Cell] = set()              # Pending cells whose rows are filtered out
+        self.active_rows: Optional[set[int]] = None # The rows which are not filtered out (None for all)
+        self.row_tiers: dict[int, Tuple[int, int]] = {}      # row -> (tier, position) for rows near the viewport
+        self.column_ranks: dict[int, int] = {}
+        self.columns: list[int] = []                # The columns which have cells in this generation
+        self.viewport: Tuple[tuple, tuple] = ((), ())
+        self.sequence = itertools.count()
+        self.idle: Optional[threading.Event] = None # Set while only parked cells are left, e.g., getting_data
+
+    def __len__(self) -> int:
+        """ The number of cells waiting to be generated. """
+        return len(self.entries) + len(self.parked)
+
+    def active(self) -> int:
+        """ The number of cells waiting to be generated whose rows are not filtered out. """
+        return len(self.entries)
+
+    def start(
+        self,
+        cells: Iterable[Cell],
+        column_ranks: Optional[dict[int, int]] = None,
+        idle: Optional[threading.Event] = None,
+    ) -> int:
+        """
+        Discard any cells from the previous generation, schedule cells and return the new generation.
+
+        idle is set while the only cells left are those of filtered-out rows. It is cleared here so that workers of
+            the previous generation can't set it once the new generation has started.
+        """
+        with self.condition:
+            self.generation += 1
+            if idle is not None:
+                idle.clear()
+            self.heap, self.entries, self.parked = [], {}, set()
+            self.column_ranks = column_ranks or {}
+            self.idle = idle
+            columns = set()
+            for cell in cells:
+                columns.add(cell[1])
+                if self.active_rows is not None and cell[0] not in self.active_rows:
+                    self.parked.add(cell)
+                else:
+                    entry = [self.priority(cell), next(self.sequence), cell, True]
+                    self.entries[cell] = entry
+                    self.heap.append(entry)
+            heapq.heapify(self.heap)
+            self.columns = sorted(columns)
+            self.condition.notify_all()
+            return self.generation
+
+    def clear(self) -> None:
+        """ Discard every cell and release the waiting workers. """
+        with self.condition:
+            self.generation += 1
+            self.heap, self.entries, self.parked, self.columns = [], {}, set(), []
+            self.idle = None
+            self.condition.notify_all()
+
+    def finish(self, generation: int, event: threading.Event) -> None:
+        """ Set event (e.g., getting_data) when a worker of generation stops, unless a later generation has started. """
+        with self.condition:
+            if generation == self.generation:
+                event.set()
+
+    def priority(self, cell: Cell) -> tuple:
+        row, col = cell
+        tier, position = self.row_tiers.get(row, (REST, row))
+        return (tier, self.column_ranks.get(col, col), position)
+
+    def push(self, cell: Cell) -> None:
+        """ Add or reprioritise a pending cell. Must be called with the condition held. """
+        entry = self.entries.get(cell)
+        priority = self.priority(cell)
+        if entry is not None:
+            if entry[0] == priority:
+                return
+            entry[3] = False
+        entry = [priority, next(self.sequence), cell, True]
+        self.entries[cell] = entry
+        heapq.heappush(self.heap, entry)
+
+    def requeue(self, generation: int, cells: Iterable[Cell]) -> None:
+        """ Schedule cells which a worker of generation has taken but not filled, unless a later generation has started. """
+        with self.condition:
+            if generation != self.generation:
+                return
+            for cell in cells:
+                if self.active_rows is not None and cell[0] not in self.active_rows:
+                    self.parked.add(cell)
+                else:
+                    self.push(cell)
+            self.condition.notify_all()
+
+    def discard(self, cell: Cell) -> None:
+        """ Remove a cell from the heap. Must be called with the condition held. """
+        entry = self.entries.pop(cell, None)
+        if entry is not None:
+            entry[3] = False
+
+    def compact(self) -> None:
+        """ Rebuild the heap without its removed entries if they make up most of it. """
+        if len(self.heap) > 2*len(self.entries) + 64:
+            self.heap = [entry for entry in self.heap if entry[3]]
+            heapq.heapify(self.heap)
+
+    def get(self, generation: int) -> Optional[Tuple[tuple, Cell]]:
+        """
+        Wait for the next cell and return (priority, cell). The cell is removed from the scheduler.
+
+        Returns None once there are no cells left or if generation has been superseded. If the only cells left are
+            those of filtered-out rows then the idle event is set while waiting for them to be shown again.
+        """
+        with self.condition:
+            while generation == self.generation:
+                while self.heap and not self.heap[0][3]:
+                    heapq.heappop(self.heap)
+                if self.heap:
+                    priority, _, cell, _ = heapq.heappop(self.heap)
+                    del self.entries[cell]
+                    return priority, cell
+                if not self.parked:
+                    return None
+                if self.idle is not None:
+                    self.idle.set()
+                self.condition.wait()
+            return None
+
+    def get_many(self, generation: int, size: int) -> list[Tuple[tuple, Cell]]:
+        """
+        Wait for the next cell and return it along with up to size-1 of the cells which follow it, as a list of
+            (priority, cell). Returns an empty list once get() would return None.
+        """
+        task = self.get(generation)
+        if task is None:
+            return []
+        tasks = [task]
+        with self.condition:
+            while len(tasks) < size and self.heap and generation == self.generation:
+                priority, _, cell, valid = heapq.heappop(self.heap)
+                if valid:
+                    del self.entries[cell]
+                    tasks.append((priority, cell))
+        return tasks
+
+    def take_batch(self, priority: tuple, cell: Cell, size: int) -> list[Cell]:
+        """
+        Return cell along with up to size-1 other pending cells from the same column and row tier, which are removed
+            from the scheduler. Used to fill the cells of a batched command.
+        """
+        row, col = cell
+        tier = priority[0]
+        with self.condition:
+            if tier == REST:
+                candidates = range(row + 1, row + 4*size)
+            else:
+                candidates = sorted((position, r) for r, (t, position) in self.row_tiers.items() if t == tier)
+                candidates = [r for _, r in candidates]
+            batch = [cell]
+            for r in candidates:
+                if len(batch) >= size:
+                    break
+                other = (r, col)
+                entry = self.entries.get(other)
+                if entry is not None and entry[0][0] == tier:
+                    self.discard(other)
+                    batch.append(other)
+            self.compact()
+            return batch
+
+    def set_viewport(self, visible_rows: Iterable[int], near_rows: Iterable[int]) -> None:
+        """ Raise the priority of the cells in the visible rows and, after them, the rows near the viewport. """
+        viewport = (tuple(visible_rows), tuple(near_rows))
+        with self.condition:
+            if viewport == self.viewport:
+                return
+            self.viewport = viewport
+            changed_rows = set(self.row_tiers)
+            self.row_tiers = {}
+            for tier, rows in ((NEAR, viewport[1]), (VISIBLE, viewport[0])):
+                for position, row in enumerate(rows):
+                    self.row_tiers[row] = (tier, position)
+            changed_rows.update(self.row_tiers)
+            if not self.entries:
+                return
+            for row in changed_rows:
+                for col in self.columns:
+                    if (row, col) in self.entries:
+                        self.push((row, col))
+            self.compact()
+
+    def set_active_rows(self, rows: Optional[Iterable[int]]) -> None:
+        """
+        Set aside the cells of the rows which are not in rows (e.g., because they have been filtered out) and
+            reschedule the cells of the rows which are. If rows is None then every row is active.
+        """
+        with self.condition:
+            self.active_rows = None if rows is None else set(rows)
+            if self.active_rows is None:
+                restored = self.parked
+                self.parked = set()
+            else:
+                restored = {cell for cell in self.parked if cell[0] in self.active_rows}
+                self.parked -= restored
+                for cell in [cell for cell in self.entries if cell[0] not in self.active_rows]:
+                    self.discard(cell)
+                    self.parked.add(cell)
+            for cell in restored:
+                self.push(cell)
+            self.compact()
+            if restored and self.idle is not None:
+                # The workers may have gone idle; the picker has to wait for these cells again
+                self.idle.clear()
+            self.condition.notify_all()
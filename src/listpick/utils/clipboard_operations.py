@@ -10,7 +10,7 @@ License: MIT
 
 import pyperclip
 from typing import Tuple
-from listpick.utils.utils import get_selected_cells_by_row
+from listpick.utils.utils import get_selected_cells_by_row, get_selected_indices
 import logging
 
 logger = logging.getLogger('picker_log')
@@ -63,8 +63,7 @@ def copy_to_clipboard(
 
                 formatted_items.append(row)
     else:
-        selected_indices = [i for i, selected in selections.items() if selected]
-        rows_to_copy = [item for i, item in enumerate(items) if i in selected_indices]
+        rows_to_copy = [items[i] for i in get_selected_indices(selections)]
         formatted_items = [[cell for i, cell in enumerate(item) if i not in hidden_columns or copy_hidden_cols] for item in rows_to_copy]
 
     if representation == "python":
@@ -0,0 +1,251 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+column_store.py
+A compact, column-oriented alternative to list[list[str]] for large tables.
+
+Each column is dictionary-encoded: the distinct strings are stored once and every row holds an
+integer code in an array. Rows are accessed through RowView objects which support row[col] so
+that code which expects a list[list[str]] continues to work.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+from array import array
+from typing import Callable, Iterable, Iterator, Optional
+import logging
+
+from wcwidth import wcswidth
+
+logger = logging.getLogger('picker_log')
+
+
+class RowView:
+    """
+    A view of a single row of a ColumnStore (or of any store with get, set, add_column and column_count, such as a LazyTable).
+    Supports indexing, slicing, assignment, iteration and comparison with lists.
+    """
+
+    __slots__ = ("store", "row_index")
+
+    def __init__(self, store: "ColumnStore", row_index: int):
+        self.store = store
+        self.row_index = row_index
+
+    def __len__(self) -> int:
+        return self.store.column_count
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [self.store.get(self.row_index, j) for j in range(self.store.column_count)[col]]
+        if col < 0:
+            col += self.store.column_count
+        if not 0 <= col < self.store.column_count:
+            raise IndexError("column index out of range")
+        return self.store.get(self.row_index, col)
+
+    def __setitem__(self, col: int, value: str) -> None:
+        if col < 0:
+            col += self.store.column_count
+        if not 0 <= col < self.store.column_count:
+            raise IndexError("column index out of range")
+        self.store.set(self.row_index, col, value)
+
+    def __iter__(self) -> Iterator[str]:
+        for j in range(self.store.column_count):
+            yield self.store.get(self.row_index, j)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, RowView)):
+            return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __add__(self, other: list) -> list[str]:
+        return list(self) + list(other)
+
+    def __radd__(self, other: list) -> list[str]:
+        return list(other) + list(self)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def append(self, value: str) -> None:
+        """ Rows of a store all have the same length so a single row can't be extended; use store.add_column(). """
+        raise TypeError("rows of a ColumnStore have a fixed length; use add_column() to add a column to every row")
+
+    def index(self, value: str) -> int:
+        return list(self).index(value)
+
+
+class ColumnStore:
+    """
+    Column-oriented, dictionary-encoded table of strings.
+
+    Behaves like a list of rows: len(store), store[i][j], store[i][j] = value, iteration and enumerate() all work.
+    Each column holds:
+        values:     the distinct strings in the column (a value's position is its code)
+        lookup:     {value: code}
+        codes:      array of codes, one per row
+    """
+
+    def __init__(self, rows: Iterable[Iterable] = (), column_count: int = 0):
+        self.column_count = column_count
+        self._values: list[list[str]] = [[] for _ in range(column_count)]
+        self._lookup: list[dict[str, int]] = [{} for _ in range(column_count)]
+        self._codes: list[array] = [array('I') for _ in range(column_count)]
+        self._row_count = 0
+        self._key_cache: dict[tuple, list] = {}
+        self._width_cache: dict[int, list[int]] = {}
+        # The width of the widest value in use in each column whose width has been asked for; see column_width()
+        self._max_widths: dict[int, int] = {}
+        for row in rows:
+            self.append(row)
+
+    @classmethod
+    def from_rows(cls, rows: list[list]) -> "ColumnStore":
+        """ Build a ColumnStore from a list of lists. Cells are converted to strings and short rows are padded. """
+        logger.info("function: ColumnStore.from_rows (column_store.py)")
+        column_count = max((len(row) for row in rows), default=0)
+        return cls(rows, column_count=column_count)
+
+    def _encode(self, col: int, value) -> int:
+        value = str(value) if value is not None else ""
+        lookup = self._lookup[col]
+        code = lookup.get(value)
+        if code is None:
+            code = len(self._values[col])
+            lookup[value] = code
+            self._values[col].append(value)
+        return code
+
+    def __len__(self) -> int:
+        return self._row_count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [RowView(self, j) for j in range(self._row_count)[i]]
+        if i < 0:
+            i += self._row_count
+        if not 0 <= i < self._row_count:
+            raise IndexError("row index out of range")
+        return RowView(self, i)
+
+    def __iter__(self) -> Iterator[RowView]:
+        for i in range(self._row_count):
+            yield RowView(self, i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, ColumnStore)):
+            return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ColumnStore(rows={self._row_count}, columns={self.column_count})"
+
+    def get(self, i: int, col: int) -> str:
+        return self._values[col][self._codes[col][i]]
+
+    def set(self, i: int, col: int, value: str) -> None:
+        old_code, code = self._codes[col][i], self._encode(col, value)
+        self._codes[col][i] = code
+        if col in self._max_widths:
+            width = self._value_width(col, code)
+            if width >= self._max_widths[col]:
+                self._max_widths[col] = width
+            elif self._value_width(col, old_code) == self._max_widths[col]:
+                # The widest value may no longer be in use so the width is found again when it is next needed
+                del self._max_widths[col]
+
+    def append(self, row: Iterable) -> None:
+        """ Append a row. Rows longer than the store add columns; shorter rows are padded with empty strings. """
+        row = list(row)
+        while len(row) > self.column_count:
+            self.add_column()
+        for col in range(self.column_count):
+            code = self._encode(col, row[col] if col < len(row) else "")
+            self._codes[col].append(code)
+            if col in self._max_widths:
+                self._max_widths[col] = max(self._max_widths[col], self._value_width(col, code))
+        self._row_count += 1
+
+    def clear(self) -> None:
+        """ Remove every row. The columns are kept. """
+        self._values = [[] for _ in range(self.column_count)]
+        self._lookup = [{} for _ in range(self.column_count)]
+        self._codes = [array('I') for _ in range(self.column_count)]
+        self._row_count = 0
+        self._key_cache = {}
+        self._width_cache = {}
+        self._max_widths = {}
+
+    def extend(self, rows: Iterable[Iterable]) -> None:
+        """ Append each of rows. """
+        for row in rows:
+            self.append(row)
+
+    def add_column(self, default: str = "") -> None:
+        """ Add a column to the end of every row. """
+        self.column_count += 1
+        self._values.append([])
+        self._lookup.append({})
+        code = self._encode(self.column_count-1, default)
+        self._codes.append(array('I', [code])*self._row_count)
+
+    def column(self, col: int) -> list[str]:
+        """ Return the values of col for every row. """
+        values = self._values[col]
+        return [values[code] for code in self._codes[col]]
+
+    def codes(self, col: int) -> array:
+        """ Return the code of col for every row. """
+        return self._codes[col]
+
+    def values(self, col: int) -> list[str]:
+        """ Return the distinct values that have been stored in col. The position of a value is its code. """
+        return self._values[col]
+
+    def column_keys(self, col: int, name: str, key_function: Callable) -> list:
+        """
+        Return key_function applied to each distinct value in col; i.e., keys[code].
+        Values are never removed from a column so the keys are cached by (col, name) and only extended when new values are added.
+        """
+        cache_key = (col, name)
+        keys = self._key_cache.get(cache_key)
+        if keys is None:
+            keys = self._key_cache[cache_key] = []
+        values = self._values[col]
+        if len(keys) < len(values):
+            keys.extend(key_function(value) for value in values[len(keys):])
+        return keys
+
+    def _value_width(self, col: int, code: int) -> int:
+        """ Return the display width of the value with code in col. """
+        widths = self._width_cache.setdefault(col, [])
+        values = self._values[col]
+        if len(widths) <= code:
+            widths.extend(wcswidth(value) for value in values[len(widths):])
+        return widths[code]
+
+    def column_width(self, col: int) -> int:
+        """
+        Return the display width of the widest value in col.
+        The width is only found from every row once; after that it is kept up to date as rows are appended and set.
+        """
+        if col not in self._max_widths:
+            widths = self._width_cache.setdefault(col, [])
+            widths.extend(wcswidth(value) for value in self._values[col][len(widths):])
+            self._max_widths[col] = max((widths[code] for code in set(self._codes[col])), default=0)
+        return self._max_widths[col]
+
+    def to_lists(self) -> list[list[str]]:
+        """ Return the table as a list of lists. """
+        columns = [self.column(col) for col in range(self.column_count)]
+        return [list(row) for row in zip(*columns)] if columns else [[] for _ in range(self._row_count)]
+
+
+def column_store_of(indexed_items: list) -> Optional[ColumnStore]:
+    """ Return the ColumnStore that the rows of indexed_items belong to, or None if they are not RowViews. """
+    if indexed_items and isinstance(indexed_items[0][1], RowView) and isinstance(indexed_items[0][1].store, ColumnStore):
+        return indexed_items[0][1].store
+    return None
@@ -10,6 +10,8 @@ License: MIT
 
 import os
 import logging
+from listpick.utils.column_store import ColumnStore
+from listpick.utils.lazy_table import LazyTable
 
 logger = logging.getLogger('picker_log')
 
@@ -49,6 +51,8 @@ def dump_data(function_data:dict, file_path:str, format="pickle") -> str:
     else:
         include_keys = ["items", "header"]
     function_data = {key: val for key, val in function_data.items() if key in include_keys }
+    if isinstance(function_data.get("items"), (ColumnStore, LazyTable)):
+        function_data["items"] = function_data["items"].to_lists()
 
     try:
         if format == "pickle":
@@ -0,0 +1,156 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+event_loop.py
+Wake the Picker's main loop when there is something to do rather than polling.
+
+The main loop sleeps in Wakeup.wait() until
+    - the tty is readable
+    - notify() is called, e.g., by a background thread which has fetched or generated data
+    - the terminal is resized (SIGWINCH)
+    - the next timer (auto-refresh, footer refresh, pane refresh) is due
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import logging
+import os
+import select
+import signal
+import threading
+import weakref
+from typing import Optional
+
+logger = logging.getLogger('picker_log')
+
+# Interval (in seconds) at which the main loop wakes to check on data which is loaded by a thread that doesn't notify
+#   it, or to check the terminal size if SIGWINCH can't be watched
+POLL_INTERVAL = 0.2
+# The least time (in seconds) between the passes of the main loop which are woken by background threads
+DATA_WAKEUP_INTERVAL = 0.05
+# Timers are waited on for slightly longer than they need so that they are due when the loop wakes
+TIMER_MARGIN = 0.001
+
+# The Wakeups which are notified when the terminal is resized
+_resize_wakeups: "weakref.WeakSet[Wakeup]" = weakref.WeakSet()
+_resize_handler_installed = False
+# The SIGWINCH handler which watch_resize() replaced; it is restored by unwatch_resize()
+_previous_resize_handler = None
+
+
+class Wakeup:
+    """
+    A self-pipe which wakes a select() from another thread or from a signal handler.
+
+    Only the first notify() after each drain() writes to the pipe so that a thread which notifies for every cell that
+        it generates doesn't fill the pipe.
+    """
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+        self.pending = False
+        self.resized = False
+
+    def __del__(self):
+        self.close()
+
+    def fileno(self) -> int:
+        return self.read_fd
+
+    def notify(self) -> None:
+        if self.pending or self.write_fd < 0:
+            return
+        self.pending = True
+        try:
+            os.write(self.write_fd, b"\0")
+        except OSError:
+            pass
+
+    def drain(self) -> None:
+        """ Clear the notifications. Must be called before the state that they signal is read. """
+        # The pipe is emptied before pending is cleared: a notify() in between is skipped, but its state was set before
+        #   it so it is read after drain() returns. Clearing pending first would let its byte be read here while
+        #   pending stayed set, and every later notify() would be skipped.
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except OSError:
+            pass
+        self.pending = False
+
+    def wait(self, fds: list[int], timeout: Optional[float] = None) -> list[int]:
+        """
+        Wait until one of fds is readable, notify() is called or timeout (in seconds; None to wait indefinitely)
+            expires. Returns the readable fds, which include self.read_fd if notify() was called.
+        """
+        try:
+            readable, _, _ = select.select(fds + [self.read_fd], [], [], timeout)
+        except (OSError, ValueError):
+            return []
+        return readable
+
+    def close(self) -> None:
+        _resize_wakeups.discard(self)
+        for fd in (self.read_fd, self.write_fd):
+            if fd >= 0:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.read_fd = self.write_fd = -1
+
+
+class NotifyingEvent(threading.Event):
+    """ A threading.Event which also notifies a Wakeup when it is set. """
+
+    def __init__(self, wakeup: Optional[Wakeup] = None):
+        super().__init__()
+        self.wakeup = wakeup
+
+    def set(self) -> None:
+        super().set()
+        if self.wakeup is not None:
+            self.wakeup.notify()
+
+
+def _on_resize(signum, frame) -> None:
+    for wakeup in list(_resize_wakeups):
+        wakeup.resized = True
+        wakeup.notify()
+
+def watch_resize(wakeup: Wakeup) -> bool:
+    """
+    Notify wakeup, and set wakeup.resized, when the terminal is resized.
+
+    The SIGWINCH handler can only be installed from the main thread; returns False if it can't be installed, in which
+        case the terminal size has to be polled. The handler replaces the one installed by curses so curses has to
+        be told the new size with curses.resizeterm(). The previous handler is restored by unwatch_resize().
+    """
+    global _resize_handler_installed, _previous_resize_handler
+    if not _resize_handler_installed:
+        try:
+            _previous_resize_handler = signal.signal(signal.SIGWINCH, _on_resize)
+        except (AttributeError, ValueError, OSError) as e:
+            logger.info(f"watch_resize: can't watch SIGWINCH: {e}")
+            return False
+        _resize_handler_installed = True
+    _resize_wakeups.add(wakeup)
+    return True
+
+def unwatch_resize(wakeup: Wakeup) -> None:
+    """ Stop notifying wakeup when the terminal is resized. The handler which watch_resize() replaced is restored once no Wakeup is watched. """
+    global _resize_handler_installed, _previous_resize_handler
+    _resize_wakeups.discard(wakeup)
+    if not _resize_handler_installed or len(_resize_wakeups):
+        return
+    # A handler which wasn't installed from Python (e.g., the one installed by curses) is returned as None
+    previous = _previous_resize_handler if _previous_resize_handler is not None else signal.SIG_DFL
+    try:
+        signal.signal(signal.SIGWINCH, previous)
+    except (AttributeError, ValueError, OSError) as e:
+        logger.info(f"unwatch_resize: can't restore the SIGWINCH handler: {e}")
+        return
+    _resize_handler_installed, _previous_resize_handler = False, None
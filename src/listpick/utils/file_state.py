@@ -78,7 +78,7 @@ class FileState:
     def compute_hash(items: list, header: list) -> str:
         """Compute a hash of items and header for change detection."""
         # Convert to JSON for stable hashing
-        data_str = json.dumps({"items": items, "header": header}, sort_keys=True)
+        data_str = json.dumps({"items": items, "header": header}, sort_keys=True, default=list)
         return hashlib.sha256(data_str.encode()).hexdigest()
 
     def update_hash(self, items: list, header: list) -> None:
@@ -9,14 +9,82 @@ License: MIT
 """
 
 import re
-from typing import Tuple
-from listpick.utils.search_and_filter_utils import apply_filter, tokenise
+from typing import Callable, Tuple, Optional
+from dataclasses import dataclass, field
+from listpick.utils.search_and_filter_utils import compile_query, CompiledQuery
+from listpick.utils.column_store import ColumnStore
+from listpick.utils.lazy_table import LazyTable
+from listpick.utils.parallel_filter import ParallelMatcher, cancellable
 import os
 import logging
 
 logger = logging.getLogger('picker_log')
 
-def filter_items(items: list[list[str]], indexed_items: list[Tuple[int, list[str]]], query: str) -> list[Tuple[int, list[str]]]:
+
+@dataclass
+class FilterState:
+    """
+    The result of the previous call to filter_items.
+
+    If the next query narrows the previous one then only the previously matched rows need to be checked.
+    """
+
+    items_id: int = 0                                   # id() of the items list that was filtered
+    row_count: int = 0                                  # len(items) when it was filtered
+    compiled_query: Optional[CompiledQuery] = None      # The previous query
+    matched_indices: list[int] = field(default_factory=list)
+
+    def invalidate(self) -> None:
+        """ Forget the previous result so that the next filter scans every row. """
+        self.compiled_query = None
+        self.matched_indices = []
+
+    def can_narrow(self, items: list[list[str]], compiled_query: CompiledQuery) -> bool:
+        """ Return True if compiled_query can be applied to the previous matches rather than to all items. """
+        return (
+            self.compiled_query is not None
+            and self.items_id == id(items)
+            and self.row_count == len(items)
+            and compiled_query.narrows(self.compiled_query)
+        )
+
+    def can_extend(self, items: list[list[str]], compiled_query: CompiledQuery, row_count: int) -> bool:
+        """ Return True if compiled_query was previously applied to the first row_count rows of items. """
+        return (
+            self.compiled_query is not None
+            and self.items_id == id(items)
+            and self.row_count == row_count
+            and compiled_query.query == self.compiled_query.query
+        )
+
+    def update(self, items: list[list[str]], compiled_query: CompiledQuery, matched_indices: list[int]) -> None:
+        self.items_id = id(items)
+        self.row_count = len(items)
+        self.compiled_query = compiled_query
+        self.matched_indices = matched_indices
+
+def column_store_matcher(store: ColumnStore, compiled_query: CompiledQuery) -> Callable[[int], bool]:
+    """
+    Return a function which checks whether row i of store matches compiled_query.
+
+    Each pattern is tested once against every distinct value of a column rather than once per cell.
+    """
+    pattern_hits = []
+    for col, pattern in compiled_query.patterns:
+        if col == -1:
+            cols = range(store.column_count)
+        elif 0 <= col < store.column_count:
+            cols = [col]
+        else:
+            return lambda i: compiled_query.invert_filter
+        pattern_hits.append([(store.codes(c), [bool(pattern.search(value)) for value in store.values(c)]) for c in cols])
+
+    invert_filter = compiled_query.invert_filter
+    def matches(i: int) -> bool:
+        return all(any(hits[codes[i]] for codes, hits in column_hits) for column_hits in pattern_hits) != invert_filter
+    return matches
+
+def filter_items(items: list[list[str]], indexed_items: list[Tuple[int, list[str]]], query: str, filter_state: Optional[FilterState] = None, appended_from: int = 0, matcher: Optional[ParallelMatcher] = None, cancel: Optional[Callable[[], bool]] = None) -> list[Tuple[int, list[str]]]:
     """ 
     Filter items based on the query.
 
@@ -30,17 +98,52 @@ def filter_items(items: list[list[str]], indexed_items: list[Tuple[int, list[str
 
         --1 query       matches query in the 1 column
 
+    If a filter_state is passed then the result is stored in it, and a query which narrows the previous query will only check the rows which matched previously. The filter_state must be invalidated if items is modified in place.
+
+    If appended_from is given then only the rows from that index onward are checked and only their matches are returned; this is used when rows have been appended to items since the query was last applied.
+
+    If a matcher is passed and there are enough rows to check then they are checked in its worker processes. cancel is polled while the rows are checked and FilterCancelled is raised if it returns True; filter_state is then left as it was.
 
     Returns indexed_items, which is a list of tuples; each tuple consists of the index and the data of the matching row in the original items list. 
     """
     logger.info("function: filter_items (filtering.py)")
-    if items in [[], [[]]]: return []
+    if items in [[], [[]]]:
+        if filter_state is not None: filter_state.invalidate()
+        return []
+
+    compiled_query = compile_query(query)
 
+    previous_matches = None
+    if appended_from:
+        candidates = range(appended_from, len(items))
+        if filter_state is not None and filter_state.can_extend(items, compiled_query, appended_from):
+            previous_matches = filter_state.matched_indices
+    elif filter_state is not None and filter_state.can_narrow(items, compiled_query):
+        candidates = filter_state.matched_indices
+    else:
+        candidates = range(len(items))
 
-    invert_filter = False
-    case_sensitive = False
+    matched = None
+    if matcher is not None and isinstance(candidates, range) and matcher.enabled(len(candidates)):
+        matched = matcher.matching_rows(items, query, start=candidates.start, cancel=cancel)
 
-    filters = tokenise(query)
+    if matched is not None:
+        indexed_items = items.indexed_rows(matched) if isinstance(items, LazyTable) else [(i, items[i]) for i in matched]
+    elif isinstance(items, ColumnStore):
+        row_matches = column_store_matcher(items, compiled_query)
+        indexed_items = [(i, items[i]) for i in cancellable(candidates, cancel) if row_matches(i)]
+    elif isinstance(items, LazyTable):
+        # Rows are parsed as they are checked; only the indices of the matching rows are kept.
+        matches = compiled_query.matches
+        indexed_items = items.indexed_rows(i for i, row in cancellable(items.iter_rows(candidates), cancel) if matches(row))
+    else:
+        matches = compiled_query.matches
+        indexed_items = [(i, items[i]) for i in cancellable(candidates, cancel) if matches(items[i])]
 
-    indexed_items = [(i, item) for i, item in enumerate(items) if apply_filter(item, filters)]
+    if filter_state is not None:
+        if appended_from and previous_matches is None:
+            # The matches among the earlier rows are unknown
+            filter_state.invalidate()
+        else:
+            filter_state.update(items, compiled_query, (previous_matches or []) + [i for i, _ in indexed_items])
     return indexed_items
@@ -0,0 +1,196 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+generate_cache.py
+A persistent cache of the cells generated by the commands in a --generate toml file.
+
+A cell is stored with the command, the resolved path of the file and the mtime, size and inode of the file when
+    the command was run. It is only used while the file's stat matches, so cells are recomputed for files that have
+    changed. The least recently used cells are evicted when the cache holds more than max_entries cells.
+
+The command which a cell is stored under includes the [environment] of the toml file (see cache_key) so that cells
+    aren't used after the environment has changed.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger('picker_log')
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "listpick")
+CACHE_PATH = os.path.join(CACHE_DIR, "generate_cache.sqlite3")
+# The most cells kept in the cache
+CACHE_MAX_ENTRIES = 1000000
+# Cells are written to the database in batches of this size
+CACHE_WRITE_BATCH = 256
+
+
+class ResultCache:
+    """
+    A sqlite cache of generated cells, shared by the worker threads which generate the cells.
+
+    Errors from sqlite are logged and disable the cache; they never stop the data from being generated.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.pending: list[tuple] = []
+        self.stats: dict[str, tuple[str, int, int, int]] = {}      # file -> (resolved path, mtime_ns, size, inode)
+        self.connection: Optional[sqlite3.Connection] = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cells ("
+                "command TEXT, path TEXT, mtime_ns INTEGER, size INTEGER, inode INTEGER, value TEXT, last_used REAL, "
+                "PRIMARY KEY (command, path))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS cells_last_used ON cells (last_used)")
+            self.connection.commit()
+        except (sqlite3.Error, OSError) as e:
+            self.disable(e)
+
+    def disable(self, error: Exception) -> None:
+        logger.warning(f"ResultCache: the cache at {self.path} is disabled: {error}")
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = None
+
+    def stat(self, file: str) -> Optional[tuple[str, int, int, int]]:
+        """ Return (resolved path, mtime_ns, size, inode) for file, or None if it isn't a file. """
+        if file not in self.stats:
+            try:
+                st = os.stat(file)
+            except (OSError, ValueError):
+                return None
+            self.stats[file] = (os.path.realpath(file), st.st_mtime_ns, st.st_size, st.st_ino)
+        return self.stats[file]
+
+    def lookup(self, command: str, files: list[str]) -> dict[int, str]:
+        """ Return the cached cells of command for files, as a dict of {index in files: value}. Stale cells are skipped. """
+        if self.connection is None:
+            return {}
+        try:
+            with self.lock:
+                rows = self.connection.execute("SELECT path, mtime_ns, size, inode, value FROM cells WHERE command = ?", (command,)).fetchall()
+        except sqlite3.Error as e:
+            self.disable(e)
+            return {}
+        cached = {path: (mtime_ns, size, inode, value) for path, mtime_ns, size, inode, value in rows}
+
+        # Every file is stat'ed now, before its cells are generated, so that a file which changes while its command
+        #   is running is stored with its old stat and is recomputed next time. The stats of an earlier lookup are
+        #   forgotten since the cache is shared by every refresh and the files may have changed since then.
+        self.stats = {}
+        hits, used = {}, []
+        for i, file in enumerate(files):
+            stat = self.stat(file)
+            if stat is None or stat[0] not in cached:
+                continue
+            mtime_ns, size, inode, value = cached[stat[0]]
+            if (mtime_ns, size, inode) == stat[1:]:
+                hits[i] = value
+                used.append(stat[0])
+
+        if not used:
+            return hits
+        now = time.time()
+        try:
+            with self.lock:
+                self.connection.executemany("UPDATE cells SET last_used = ? WHERE command = ? AND path = ?", ((now, command, path) for path in used))
+                self.connection.commit()
+        except sqlite3.Error as e:
+            self.disable(e)
+        return hits
+
+    def put(self, command: str, file: str, value: str) -> None:
+        """ Store a generated cell. It is written with the next batch; see flush(). """
+        stat = self.stat(file)
+        if self.connection is None or stat is None:
+            return
+        with self.lock:
+            self.pending.append((command, *stat, value, time.time()))
+            write = len(self.pending) >= CACHE_WRITE_BATCH
+        if write:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Write the pending cells to the database. """
+        with self.lock:
+            if self.connection is None or not self.pending:
+                return
+            pending, self.pending = self.pending, []
+            try:
+                self.connection.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?, ?)", pending)
+                self.connection.commit()
+            except sqlite3.Error as e:
+                self.disable(e)
+
+    def evict(self) -> None:
+        """ Remove the least recently used cells so that at most max_entries are kept. """
+        if self.connection is None:
+            return
+        try:
+            with self.lock:
+                count = self.connection.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+                if count > self.max_entries:
+                    self.connection.execute(
+                        "DELETE FROM cells WHERE rowid IN (SELECT rowid FROM cells ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                    self.connection.commit()
+        except sqlite3.Error as e:
+            self.disable(e)
+
+    def clear(self) -> None:
+        """ Remove every cell from the cache. """
+        if self.connection is None:
+            return
+        try:
+            with self.lock:
+                self.pending = []
+                self.connection.execute("DELETE FROM cells")
+                self.connection.commit()
+                self.connection.execute("VACUUM")
+        except sqlite3.Error as e:
+            self.disable(e)
+
+    def close(self) -> None:
+        self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+# The caches which are shared by every refresh in this process; see shared_cache()
+shared_caches: dict[str, ResultCache] = {}
+shared_caches_lock = threading.Lock()
+
+
+def shared_cache(path: str = CACHE_PATH) -> ResultCache:
+    """
+    Return the ResultCache for path which is shared by every refresh in this process so that each refresh doesn't
+        open (and leave open) a connection of its own. A cache which has been disabled is opened again.
+    """
+    with shared_caches_lock:
+        cache = shared_caches.get(path)
+        if cache is None or cache.connection is None:
+            cache = shared_caches[path] = ResultCache(path)
+        return cache
+
+
+def cache_key(command: str, environment: Optional[dict] = None) -> str:
+    """ Return the key under which the cells of command are cached when it is run with the [environment] of a toml file. """
+    if not environment:
+        return command
+    return f"{command}\n{json.dumps(environment, sort_keys=True, default=str)}"
@@ -0,0 +1,253 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+generate_data_asyncio.py
+Generate data for listpick Picker by running the commands as asyncio subprocesses.
+
+This engine is chosen with engine = "asyncio" in the data section of the toml file. It runs an event loop in a
+    background thread which takes cells from the same CellScheduler as the threaded engine, so visible cells are
+    still filled first, but it can have many more commands in flight at once (data.concurrency, default 64). This
+    suits commands which spend their time waiting on I/O (e.g., stat or ffprobe on a network drive).
+
+Each command runs in its own process group which is killed if the command takes longer than data.timeout seconds
+    or if the Picker stops generating data.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+from typing import Optional
+
+from listpick.utils.cell_scheduler import CellScheduler, REST
+from listpick.utils.generate_cache import ResultCache
+from listpick.utils.generate_data_multithreaded import (
+    BatchedColumn,
+    is_batch_command,
+    is_python_function,
+    python_function,
+    replace_batch_braces,
+    replace_braces,
+    schedule_cells,
+    single_file_command,
+    split_batch_output,
+)
+
+logger = logging.getLogger('picker_log')
+
+# Interval (in seconds) at which the thread_stop_event is checked
+STOP_CHECK_INTERVAL = 0.1
+
+
+def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """ Kill a command's process group so that the processes it started are killed along with it. """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+async def run_command(command: str, timeout: Optional[float] = None) -> str:
+    """ Run command in a shell and return its output. Raises asyncio.TimeoutError if it takes longer than timeout. """
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        kill_process_group(process)
+        await process.wait()
+        raise
+    return stdout.decode("utf-8")
+
+class AsyncioGenerator:
+    """ Fills the cells of items by running the commands for each file with up to concurrency commands at once. """
+
+    def __init__(
+        self,
+        files: list[str],
+        commands: list[str],
+        items: list[list[str]],
+        scheduler: CellScheduler,
+        generation: int,
+        state: dict,
+        options: dict,
+        cache: Optional[ResultCache] = None,
+        cache_keys: Optional[list[str]] = None,
+    ):
+        self.files = files
+        self.commands = commands
+        self.items = items
+        self.scheduler = scheduler
+        self.generation = generation
+        self.state = state
+        self.concurrency = max(1, options["concurrency"])
+        self.timeout = options["timeout"]
+        self.delimiter = options["delimiter"]
+        self.lines_per_file = options["lines_per_file"]
+        self.batched_columns = {
+            j: BatchedColumn(None, max_size=options["max_size"])
+            for j, command in enumerate(commands) if is_batch_command(command)
+        }
+        # The commands run for a single file; batched and unbatched forms of a command share their cached cells
+        self.file_commands = [single_file_command(command) for command in commands]
+        self.cache = cache
+        self.cache_keys = cache_keys or self.file_commands
+        # py:module.function columns are called in threads since they aren't subprocesses
+        self.python_functions = {j: python_function(command) for j, command in enumerate(commands) if is_python_function(command)}
+
+    def set_cell(self, row: int, j: int, result: str) -> None:
+        if self.state["thread_stop_event"].is_set():
+            return
+        self.items[row][j+1] = result.strip()
+        if self.cache is not None:
+            self.cache.put(self.cache_keys[j], self.files[row], result.strip())
+        # Let the Picker know that it needs to reapply the filter, sort, etc.
+        if "items_modified" in self.state:
+            self.state["items_modified"].set()
+
+    async def fill_cell(self, row: int, j: int) -> None:
+        try:
+            if j in self.python_functions:
+                result = await asyncio.wait_for(asyncio.to_thread(self.python_functions[j], self.files[row]), self.timeout)
+            else:
+                result = await run_command(replace_braces(self.file_commands[j], self.files[row]), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"AsyncioGenerator: the command for ({row}, {j+1}) timed out after {self.timeout}s")
+            return
+        except Exception as e:
+            logger.error(f"AsyncioGenerator: error at ({row}, {j+1}): {e}")
+            return
+        self.set_cell(row, j, result)
+
+    async def fill_batch(self, priority: tuple, row: int, j: int) -> None:
+        """ Fill a chunk of cells in column j with a batched command; see generate_cells in generate_data_multithreaded. """
+        batch = self.batched_columns[j]
+        cells = self.scheduler.take_batch(priority, (row, j+1), batch.chunk_size if priority[0] == REST else batch.max_size)
+        await self.run_batch([r for r, _ in cells], j)
+
+    async def run_batch(self, rows: list[int], j: int) -> None:
+        """
+        Run the batched command of column j for the files in rows and fill their cells.
+
+        A chunk which times out is retried in two halves, and later chunks are kept smaller than it. If the output
+            can't be split into one cell per file, or the command fails, the rest of the column is filled one file at a
+            time; the cells of this chunk are given back to the scheduler so that each command takes a concurrency slot.
+        """
+        batch = self.batched_columns[j]
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            output = await run_command(replace_batch_braces(self.commands[j], [self.files[r] for r in rows]), self.timeout)
+            results = split_batch_output(output, len(rows), delimiter=self.delimiter, lines_per_file=self.lines_per_file)
+        except asyncio.TimeoutError:
+            if len(rows) == 1:
+                logger.warning(f"AsyncioGenerator: the command for ({rows[0]}, {j+1}) timed out after {self.timeout}s")
+                return
+            logger.warning(f"AsyncioGenerator: a chunk of {len(rows)} files in column {j+1} timed out; retrying in smaller chunks")
+            half = len(rows) // 2
+            batch.max_size = min(batch.max_size, half)
+            batch.chunk_size = min(batch.chunk_size, half)
+            for chunk in (rows[:half], rows[half:]):
+                await self.run_batch(chunk, j)
+            return
+        except Exception as e:
+            logger.warning(f"AsyncioGenerator: column {j+1} can't be batched; running the command for each file: {e!r}")
+            # The remaining cells of the column are filled one at a time
+            batch.enabled = False
+            # Only one command is run in this slot; the other cells are given back to the scheduler so that they each
+            #   take a slot of their own
+            self.scheduler.requeue(self.generation, [(r, j+1) for r in rows[1:]])
+            await self.fill_cell(rows[0], j)
+            return
+        batch.update_chunk_size(len(rows), loop.time() - start)
+        for r, result in zip(rows, results):
+            self.set_cell(r, j, result)
+
+    async def fill(self, priority: tuple, row: int, j: int, slots: asyncio.Semaphore) -> None:
+        try:
+            if j in self.batched_columns and self.batched_columns[j].enabled:
+                await self.fill_batch(priority, row, j)
+            else:
+                await self.fill_cell(row, j)
+        finally:
+            slots.release()
+
+    async def cancel_on_stop(self, tasks: set) -> None:
+        """ Cancel the running commands (and so kill their processes) when the thread_stop_event is set. """
+        while not self.state["thread_stop_event"].is_set():
+            await asyncio.sleep(STOP_CHECK_INTERVAL)
+        for task in tasks:
+            task.cancel()
+
+    async def run(self) -> None:
+        """ Take cells from the scheduler whenever one of the concurrency slots is free. """
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        watcher = asyncio.create_task(self.cancel_on_stop(tasks))
+        while not self.state["thread_stop_event"].is_set():
+            await slots.acquire()
+            # The scheduler blocks until a cell is ready so it is waited on in a thread.
+            task = await asyncio.to_thread(self.scheduler.get, self.generation)
+            if task is None:
+                slots.release()
+                # A running batch may give its cells back to the scheduler (see run_batch) so it is checked again once
+                #   the running cells have been filled
+                if tasks:
+                    await asyncio.wait(set(tasks))
+                    continue
+                break
+            priority, (row, col) = task
+            fill_task = asyncio.create_task(self.fill(priority, row, col - 1, slots))
+            tasks.add(fill_task)
+            fill_task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        watcher.cancel()
+        if self.cache is not None:
+            self.cache.flush()
+
+def generate_picker_data_asyncio(
+    files: list[str],
+    commands: list[str],
+    data_header: list[str],
+    items: list[list[str]],
+    picker_header: list[str],
+    getting_data: threading.Event,
+    state: dict,
+    options: dict,
+    cache: Optional[ResultCache] = None,
+    cache_keys: Optional[list[str]] = None,
+) -> None:
+    """
+    Generate data from a list of files and a list of commands (one for each subsequent column) in an asyncio event
+        loop which runs in a background thread.
+
+    options is the dict returned by read_data_options.
+    """
+    logger.info(f"generate_picker_data_asyncio: {len(files)} files, {len(commands)} commands")
+
+    items.clear()
+    items.extend([[file] + ["..." for _ in commands] for file in files])
+    picker_header[:] = data_header
+
+    cache_keys = cache_keys or [single_file_command(command) for command in commands]
+    scheduler, generation = schedule_cells(files, len(commands), items, state, cache, cache_keys, getting_data)
+    generator = AsyncioGenerator(files, commands, items, scheduler, generation, state, options, cache=cache, cache_keys=cache_keys)
+
+    def run_event_loop():
+        try:
+            asyncio.run(generator.run())
+        except Exception as e:
+            logger.error(f"generate_picker_data_asyncio: {e!r}")
+        scheduler.finish(generation, getting_data)
+
+    loop_thread = threading.Thread(target=run_event_loop)
+    state["threads"].append(loop_thread)
+    loop_thread.daemon = True
+    loop_thread.start()
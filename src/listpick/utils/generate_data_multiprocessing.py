@@ -1,10 +1,179 @@
 #!/bin/python
 # -*- coding: utf-8 -*-
 """
-generate_data_utils.py
+generate_data_multiprocessing.py
+Generate data for listpick Picker in a pool of worker processes.
+
+This engine is chosen with engine = "processes" in the data section of the toml file or with
+    generate_picker_data(..., engine="processes"). It suits column functions which are CPU-bound Python functions
+    (hashing, parsing, image statistics) and so don't run in parallel in threads.
+
+The cells are still scheduled by the CellScheduler in the Picker's process so visible cells are filled first. Each
+    worker process is fed by a thread in the Picker's process which takes a chunk of cells from the scheduler,
+    sends the chunk through a pipe and sets the cells from the results which the worker sends back for the whole
+    chunk. Chunks are sized so that each takes about BATCH_TARGET_SECONDS, so the cells which scroll onto the screen
+    don't wait long for a free worker.
+
+The workers are started with the "spawn" method so the column functions must be picklable (i.e., defined at the
+    top level of a module) and, as with any use of multiprocessing, a script which runs a Picker must guard its entry
+    point with `if __name__ == "__main__":`. If the workers can't be started then the cells are generated in threads.
 
 Author: GrimAndGreedy
 License: MIT
 """
 
-from listpick.utils.generate_data_utils import ProcessSafePriorityQueue
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Callable, Optional, Union
+
+from listpick.utils.cell_scheduler import CellScheduler
+from listpick.utils.generate_cache import ResultCache
+from listpick.utils.generate_data_multithreaded import (
+    BatchedColumn,
+    column_function,
+    generate_picker_data,
+    schedule_cells,
+)
+
+logger = logging.getLogger('picker_log')
+
+# The most cells sent to a worker process at once
+PROCESS_BATCH_SIZE = 64
+# Interval (in seconds) at which the thread_stop_event is checked while waiting for a worker
+STOP_CHECK_INTERVAL = 0.1
+
+
+def column_worker(connection: Connection, column_functions: list[Union[Callable, str]]) -> None:
+    """
+    Worker process: receive chunks of (row, j, file) and send back [(row, j, result, error), ...] for each chunk.
+
+    Commands (strings) are converted to functions here, so that they don't have to be pickled.
+    """
+    funcs = [column_function(func) if isinstance(func, str) else func for func in column_functions]
+    while True:
+        try:
+            tasks = connection.recv()
+        except (EOFError, OSError):
+            break
+        if tasks is None:
+            break
+        results = []
+        for row, j, file in tasks:
+            try:
+                results.append((row, j, funcs[j](file).strip(), None))
+            except Exception as e:
+                results.append((row, j, None, repr(e)))
+        connection.send(results)
+
+def feed_worker(
+    process: multiprocessing.Process,
+    connection: Connection,
+    files: list[str],
+    items: list[list[str]],
+    getting_data: threading.Event,
+    scheduler: CellScheduler,
+    generation: int,
+    state: dict,
+    cache: Optional[ResultCache] = None,
+    cache_keys: Optional[list[str]] = None,
+) -> None:
+    """ Send chunks of cells from the scheduler to a worker process and set the cells from its results. """
+    chunks = BatchedColumn(None, max_size=PROCESS_BATCH_SIZE)
+    try:
+        while not state["thread_stop_event"].is_set():
+            tasks = scheduler.get_many(generation, chunks.chunk_size)
+            if not tasks:
+                break
+            start = time.time()
+            # The scheduler's cells are (row, col) in items; column 0 holds the files
+            connection.send([(row, col-1, files[row]) for _, (row, col) in tasks])
+            while not connection.poll(STOP_CHECK_INTERVAL):
+                if state["thread_stop_event"].is_set():
+                    return
+                if not process.is_alive():
+                    raise EOFError(f"worker exited with code {process.exitcode}")
+            results = connection.recv()
+            chunks.update_chunk_size(len(tasks), time.time() - start)
+            if state["thread_stop_event"].is_set():
+                return
+            for row, j, result, error in results:
+                if error is not None:
+                    logger.error(f"generate_picker_data_processes error at ({row}, {j+1}): {error}")
+                    continue
+                items[row][j+1] = result
+                if cache is not None:
+                    cache.put(cache_keys[j], files[row], result)
+            # Let the Picker know that it needs to reapply the filter, sort, etc.
+            if "items_modified" in state:
+                state["items_modified"].set()
+    except (EOFError, OSError) as e:
+        logger.error(f"feed_worker: lost worker process {process.pid}: {e!r}")
+    finally:
+        try:
+            connection.send(None)
+        except (OSError, ValueError):
+            pass
+        process.join(timeout=STOP_CHECK_INTERVAL)
+        if process.is_alive():
+            process.terminate()
+        connection.close()
+        if cache is not None:
+            cache.flush()
+        scheduler.finish(generation, getting_data)
+
+def generate_picker_data_processes(
+    files: list[str],
+    column_functions: list[Union[Callable, str]],
+    data_header: list[str],
+    items: list[list[str]],
+    picker_header: list[str],
+    getting_data: threading.Event,
+    state: dict,
+    cache: Optional[ResultCache] = None,
+    cache_keys: Optional[list[str]] = None,
+) -> None:
+    """
+    Generate data from a list of files and a list of column functions in os.cpu_count() worker processes.
+
+    column_functions may hold picklable functions of the file or commands (shell commands or py:module.function).
+    """
+    logger.info(f"generate_picker_data_processes: {len(files)} files, {len(column_functions)} column_functions")
+
+    num_workers = os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    try:
+        for _ in range(num_workers):
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(target=column_worker, args=(child_connection, column_functions), daemon=True)
+            process.start()
+            child_connection.close()
+            workers.append((process, parent_connection))
+    except Exception as e:
+        logger.warning(f"generate_picker_data_processes: can't start worker processes; using threads: {e!r}")
+        for process, connection in workers:
+            process.terminate()
+            connection.close()
+        funcs = [column_function(func) if isinstance(func, str) else func for func in column_functions]
+        generate_picker_data(files, funcs, data_header, items, picker_header, [], getting_data, state, cache=cache, cache_keys=cache_keys)
+        return
+
+    items.clear()
+    items.extend([[file] + ["..." for _ in column_functions] for file in files])
+    picker_header[:] = data_header
+    scheduler, generation = schedule_cells(files, len(column_functions), items, state, cache, cache_keys, getting_data)
+
+    for process, connection in workers:
+        if "processes" in state:
+            state["processes"].append(process)
+        feeder = threading.Thread(
+            target=feed_worker,
+            args=(process, connection, files, items, getting_data, scheduler, generation, state, cache, cache_keys),
+        )
+        state["threads"].append(feeder)
+        feeder.daemon = True
+        feeder.start()
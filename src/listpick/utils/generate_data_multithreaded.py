@@ -9,9 +9,20 @@ Generate data for listpick Picker.
 2. Set environment variables.
 3. Get files from first command.
 4. Create items with "..." for cells to be filled.
-5. Create a priority queue which determines which cells are to be filled first.
-6. Create a queue updater which increases the priorty of cells which are on screen which does so each second.
-7. Create threads to start generating data for cells.
+5. Schedule the cells in a CellScheduler which determines which cells are to be filled first. The Picker raises the
+    priority of the cells which are on screen (and near the screen) as it is scrolled.
+6. Create threads to start generating data for cells.
+
+Cells are stored in a persistent ResultCache (see generate_cache.py). Cells whose file hasn't changed since they were
+    generated are filled from the cache rather than being queued.
+
+A command which contains {...} rather than {} is run for a chunk of files at once, with {...} replaced by the files.
+    Its output is split back into one cell per file: by data.batch_delimiter if it is set, otherwise by taking
+    data.batch_lines lines (default 1) for each file.
+
+A command of the form py:module.function is a Python function rather than a shell command. It is called with the
+    file and returns the cell, and suits columns which are CPU-bound (e.g., hashing or parsing the file) when run
+    with engine = "processes"; see generate_data_multiprocessing.py.
 
 Author: GrimAndGreedy
 License: MIT
@@ -19,40 +30,90 @@ License: MIT
 
 import subprocess
 import os
-from typing import Tuple, Callable
+from typing import Tuple, Callable, Optional
 import toml
 import logging
 import threading
-from queue import PriorityQueue
 import time
 import re
 import shlex
+import importlib
+from listpick.utils.generate_cache import ResultCache, cache_key, shared_cache
+from listpick.utils.cell_scheduler import CellScheduler, REST
 
 logger = logging.getLogger('picker_log')
 
+# Commands which start with this prefix name a Python function (py:module.function)
+PYTHON_FUNCTION_PREFIX = "py:"
+# The most commands run at once by the asyncio engine
+ASYNCIO_CONCURRENCY = 64
+# The most files passed to a batched command at once
+BATCH_MAX_SIZE = 256
+# The number of files in the first chunk of a batched command
+BATCH_INITIAL_SIZE = 8
+# Chunks are sized so that a batched command takes about this long (in seconds). Shorter chunks mean that the cells
+#   which scroll onto the screen are filled sooner.
+BATCH_TARGET_SECONDS = 0.5
+
+
+class BatchedColumn:
+    """ A column whose command is run for a chunk of files at once. """
+
+    def __init__(self, func: Callable[[list[str]], list[str]], max_size: int = BATCH_MAX_SIZE):
+        self.func = func
+        self.max_size = max_size
+        self.chunk_size = min(BATCH_INITIAL_SIZE, max_size)
+        self.enabled = True         # Set to False if the output of the command can't be split into cells
+
+    def update_chunk_size(self, file_count: int, duration: float) -> None:
+        """ Size the next chunk so that it takes about BATCH_TARGET_SECONDS. """
+        per_file = duration / max(1, file_count)
+        if per_file <= 0:
+            self.chunk_size = self.max_size
+        else:
+            self.chunk_size = max(1, min(self.max_size, int(BATCH_TARGET_SECONDS / per_file)))
+
 def generate_columns_worker(
     funcs: list,
     files: list,
     items: list[list[str]],
     getting_data: threading.Event,
-    task_queue: PriorityQueue,
-    completed_cells: set,
+    scheduler: CellScheduler,
+    generation: int,
     state: dict,
+    batched_columns: Optional[dict[int, BatchedColumn]] = None,
+    cache: Optional[ResultCache] = None,
+    cache_keys: Optional[list[str]] = None,
 ) -> None:
-    """ Get a task from the priorty queue and fill the data for that cell."""
+    """ Get the next cell from the scheduler and fill the data for that cell (or for a chunk of cells if its column is batched)."""
     logger.info("generate_columns_worker started")
-    while task_queue.qsize() > 0 and not state["thread_stop_event"].is_set():
-        _, (i, j) = task_queue.get()
-
-        if (i, j) in completed_cells:
-            task_queue.task_done()
+    while not state["thread_stop_event"].is_set():
+        task = scheduler.get(generation)
+        if task is None:
+            break
+        # The scheduler's cells are (row, col) in items; column 0 holds the files
+        priority, (i, col) = task
+        j = col - 1
+
+        if batched_columns and j in batched_columns and batched_columns[j].enabled:
+            # The chunk is taken from the same tier as the cell so that visible cells aren't held up by the rows below them.
+            batch = batched_columns[j]
+            cells = scheduler.take_batch(priority, (i, col), batch.chunk_size if priority[0] == REST else batch.max_size)
+            results = generate_cells(
+                batch=batch,
+                func=funcs[j],
+                files=files,
+                items=items,
+                rows=[row for row, _ in cells],
+                col=j+1,
+                state=state,
+            )
+            if cache is not None:
+                for row, result in results.items():
+                    cache.put(cache_keys[j], files[row], result)
             continue
-            
-        if state["thread_stop_event"].is_set():
-            with task_queue.mutex:
-                task_queue.queue.clear()
 
-        generate_cell(
+        result = generate_cell(
             func=funcs[j],
             file=files[i],
             items=items,
@@ -60,38 +121,57 @@ def generate_columns_worker(
             col=j+1,
             state=state,
         )
-        completed_cells.add((i, j))
-        task_queue.task_done()
-    getting_data.set()
+        if cache is not None and result is not None:
+            cache.put(cache_keys[j], files[i], result)
+    if cache is not None:
+        cache.flush()
+    scheduler.finish(generation, getting_data)
 
-def generate_cell(func: Callable, file: str, items: list[list[str]], row: int, col: int, state: dict) -> None:
+def generate_cells(batch: BatchedColumn, func: Callable, files: list[str], items: list[list[str]], rows: list[int], col: int, state: dict) -> dict[int, str]:
     """
-    Takes a function, file and a file and then sets items[row][col] to the result.
+    Run a batched command for the files in rows and set items[row][col] for each row. Returns {row: result} for the
+        cells which were set.
+
+    If the output can't be split into one cell per file then the command is run for each file separately.
+    """
+    if not rows or state["thread_stop_event"].is_set():
+        return {}
+    start = time.time()
+    try:
+        results = batch.func([files[row] for row in rows])
+    except Exception as e:
+        logger.warning(f"generate_cells: column {col} can't be batched; running the command for each file: {e}")
+        # The remaining cells of the column are filled one at a time
+        batch.enabled = False
+        results = {row: generate_cell(func=func, file=files[row], items=items, row=row, col=col, state=state) for row in rows}
+        return {row: result for row, result in results.items() if result is not None}
+    batch.update_chunk_size(len(rows), time.time() - start)
+    if state["thread_stop_event"].is_set():
+        return {}
+    results = {row: result.strip() for row, result in zip(rows, results)}
+    for row, result in results.items():
+        items[row][col] = result
+    if "items_modified" in state:
+        state["items_modified"].set()
+    return results
+
+def generate_cell(func: Callable, file: str, items: list[list[str]], row: int, col: int, state: dict) -> Optional[str]:
+    """
+    Takes a function, file and a file and then sets items[row][col] to the result. Returns the result, or None if the
+        cell wasn't set.
     """
     if not state["thread_stop_event"].is_set():
         try:
             result = func(file).strip()
             if not state["thread_stop_event"].is_set():
                 items[row][col] = result
+                # Let the Picker know that it needs to reapply the filter, sort, etc.
+                if "items_modified" in state:
+                    state["items_modified"].set()
+                return result
         except Exception as e:
             logger.error(f"generate_cell error at ({row}, {col}): {e}")
-
-def update_queue(task_queue: PriorityQueue, visible_rows_indices: list[int], rows: int, cols: int, state: dict):
-    """ Increase the priority of getting the data for the cells that are currently visible. """
-    while task_queue.qsize() > 0:
-        time.sleep(0.1)
-        if state["thread_stop_event"].is_set():
-            with task_queue.mutex:
-                task_queue.queue.clear()
-            break 
-        for row in visible_rows_indices:
-            for col in range(cols):
-                if state["generate_data_for_hidden_columns"] == False and col+1 in state["hidden_columns"]: continue
-                if 0 <= row < rows:
-                    task_queue.put((1, (row, col)))
-
-        # Delay
-        time.sleep(0.9)
+    return None
 
 def command_to_func(command: str) -> Callable:
     """
@@ -106,6 +186,63 @@ def command_to_func(command: str) -> Callable:
     func = lambda arg: subprocess.run(replace_braces(command, arg), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8").strip()
     return func
 
+def python_function(command: str) -> Callable[[str], str]:
+    """
+    Import the function named by a py:module.function command.
+
+    E.g.,
+        py:hashlib_columns.sha256
+    """
+    module_name, _, function_name = command[len(PYTHON_FUNCTION_PREFIX):].strip().rpartition(".")
+    func = getattr(importlib.import_module(module_name), function_name)
+    return lambda file: str(func(file))
+
+def column_function(command: str) -> Callable[[str], str]:
+    """ Convert a command, which is either a shell command or a py:module.function, to a function of the file. """
+    if is_python_function(command):
+        return python_function(command)
+    return command_to_func(command)
+
+def is_python_function(command: str) -> bool:
+    return command.startswith(PYTHON_FUNCTION_PREFIX)
+
+def command_to_batch_func(command: str, delimiter: str = "", lines_per_file: int = 1) -> Callable[[list[str]], list[str]]:
+    """
+    Convert a command string containing {...} to a function that will run the command for a list of files and return
+        the output for each file.
+
+    E.g.,
+        file -b {...}
+        stat -c '%s' {...}
+    """
+    logger.info("function: command_to_batch_func (generate_data.py)")
+
+    def func(args: list[str]) -> list[str]:
+        output = subprocess.run(replace_batch_braces(command, args), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode("utf-8")
+        return split_batch_output(output, len(args), delimiter=delimiter, lines_per_file=lines_per_file)
+    return func
+
+def split_batch_output(output: str, count: int, delimiter: str = "", lines_per_file: int = 1) -> list[str]:
+    """
+    Split the output of a batched command into the output for each of count files.
+
+    Raises ValueError if the output doesn't hold exactly count parts.
+    """
+    if delimiter:
+        parts = output.split(delimiter)
+        if len(parts) == count + 1 and not parts[-1].strip():
+            parts.pop()
+    else:
+        lines = output.split("\n")
+        if len(lines) == count*lines_per_file + 1 and lines[-1] == "":
+            lines.pop()
+        if len(lines) != count*lines_per_file:
+            raise ValueError(f"expected {count*lines_per_file} lines of output, got {len(lines)}")
+        parts = ["\n".join(lines[k:k+lines_per_file]) for k in range(0, len(lines), lines_per_file)]
+    if len(parts) != count:
+        raise ValueError(f"expected output for {count} files, got {len(parts)}")
+    return parts
+
 def load_environment(envs:dict):
     """
     Load environment variables from an envs dict.
@@ -121,6 +258,24 @@ def replace_braces(text, s):
     text = re.sub(r'@@(.*?)@@', r'{{\1}}', text)
     return text
 
+def replace_batch_braces(text: str, args: list[str]) -> str:
+    """ Replace {...} in text with the quoted args. """
+    text = re.sub(r'\{\{(.*?)\}\}', r'@@\1@@', text)
+    text = text.replace("{...}", " ".join(shlex.quote(arg) for arg in args))
+    text = re.sub(r'@@(.*?)@@', r'{{\1}}', text)
+    return text
+
+def single_file_command(command: str) -> str:
+    """ Replace {...} in a batched command with {} so that it can be run for a single file. """
+    text = re.sub(r'\{\{(.*?)\}\}', r'@@\1@@', command)
+    text = text.replace("{...}", "{}")
+    text = re.sub(r'@@(.*?)@@', r'{{\1}}', text)
+    return text
+
+def is_batch_command(command: str) -> bool:
+    """ Return True if command contains a {...} placeholder (outside of {{...}}). """
+    return not is_python_function(command) and "{...}" in re.sub(r'\{\{(.*?)\}\}', '', command)
+
 def read_toml(file_path) -> Tuple[dict, list, list]:
     """
     Read toml file and return the environment, commands and header sections.
@@ -134,8 +289,32 @@ def read_toml(file_path) -> Tuple[dict, list, list]:
     commands = [command.strip() for command in data['commands']] if 'commands' in data else []
     header = [header for header in data['header']]  if 'header' in data else []
     return environment, commands, header
-    
-    
+
+def read_data_options(file_path) -> dict:
+    """
+    Read the options for generating the data from the data section of the toml file:
+        engine:             "threads" (default) to run the commands in a pool of threads, "asyncio" to run them
+                                as asyncio subprocesses, which suits commands which wait on I/O rather than the CPU,
+                                or "processes" to run them in a pool of worker processes, which suits CPU-bound
+                                py:module.function columns
+        concurrency:        the most commands run at once by the asyncio engine
+        timeout:            the number of seconds after which a command is killed by the asyncio engine
+        batch_size:         the most files passed to a batched command at once
+        batch_delimiter:    the string which separates the output for each file
+        batch_lines:        the number of lines of output for each file (used if there is no batch_delimiter)
+    """
+    with open(file_path, 'r') as file:
+        data = toml.load(file).get('data', {})
+    return {
+        "engine": str(data.get('engine', "threads")),
+        "concurrency": int(data.get('concurrency', ASYNCIO_CONCURRENCY)),
+        "timeout": float(data['timeout']) if 'timeout' in data else None,
+        "max_size": int(data.get('batch_size', BATCH_MAX_SIZE)),
+        "delimiter": str(data.get('batch_delimiter', "")),
+        "lines_per_file": int(data.get('batch_lines', 1)),
+    }
+
+
 def generate_picker_data_from_file(
     file_path: str,
     items,
@@ -143,10 +322,12 @@ def generate_picker_data_from_file(
     visible_rows_indices,
     getting_data,
     state,
-
+    use_cache: bool = True,
 ) -> None:
     """
     Generate data for Picker based upon the toml file commands.
+
+    If use_cache is False then every cell is generated and the ResultCache is neither read nor written.
     """
     logger.info("function: generate_picker_data (generate_data.py)")
 
@@ -164,7 +345,57 @@ def generate_picker_data_from_file(
     files = [file.strip() for file in files if files]
     
     commands_list = [line.strip() for line in lines[1:]]
-    command_funcs = [command_to_func(command) for command in commands_list]
+    options = read_data_options(file_path)
+
+    cache = None
+    if use_cache:
+        cache = shared_cache()
+        cache.evict()
+    # Batched and unbatched forms of a command share their cached cells
+    cache_keys = [cache_key(single_file_command(command), environment) for command in commands_list]
+
+    if options["engine"] == "asyncio":
+        from listpick.utils.generate_data_asyncio import generate_picker_data_asyncio
+        generate_picker_data_asyncio(
+            files=files,
+            commands=commands_list,
+            data_header=hdr,
+            items=items,
+            picker_header=header,
+            getting_data=getting_data,
+            state=state,
+            options=options,
+            cache=cache,
+            cache_keys=cache_keys,
+        )
+        return
+    elif options["engine"] == "processes":
+        from listpick.utils.generate_data_multiprocessing import generate_picker_data_processes
+        # The commands are converted to functions in the worker processes. Batched commands are run for each file.
+        generate_picker_data_processes(
+            files=files,
+            column_functions=[single_file_command(command) for command in commands_list],
+            data_header=hdr,
+            items=items,
+            picker_header=header,
+            getting_data=getting_data,
+            state=state,
+            cache=cache,
+            cache_keys=cache_keys,
+        )
+        return
+    elif options["engine"] != "threads":
+        logger.warning(f"generate_picker_data_from_file: unknown engine {options['engine']!r}; using threads")
+
+    # A batched command run for a single file is used if its output can't be split
+    command_funcs = [column_function(single_file_command(command)) for command in commands_list]
+    batched_columns = {
+        j: BatchedColumn(
+            command_to_batch_func(command, delimiter=options["delimiter"], lines_per_file=options["lines_per_file"]),
+            max_size=options["max_size"],
+        )
+        for j, command in enumerate(commands_list) if is_batch_command(command)
+    }
 
     generate_picker_data(
         files = files,
@@ -175,8 +406,53 @@ def generate_picker_data_from_file(
         visible_rows_indices = visible_rows_indices,
         getting_data = getting_data,
         state=state,
+        batched_columns=batched_columns,
+        cache=cache,
+        cache_keys=cache_keys,
     )
 
+def schedule_cells(
+    files: list[str],
+    column_count: int,
+    items: list[list[str]],
+    state: dict,
+    cache: Optional[ResultCache] = None,
+    cache_keys: Optional[list[str]] = None,
+    getting_data: Optional[threading.Event] = None,
+) -> Tuple[CellScheduler, int]:
+    """
+    Fill the cells of items which are cached and schedule the rest in the scheduler from state["data_generation_queue"].
+
+    getting_data is set by the scheduler while the only cells left are those of filtered-out rows.
+
+    Returns the scheduler and the generation that the workers should take cells from.
+    """
+    # Fill the cells which are cached
+    cached_cells = set()
+    if cache is not None:
+        for j in range(column_count):
+            for i, value in cache.lookup(cache_keys[j], files).items():
+                items[i][j+1] = value
+                cached_cells.add((i, j))
+        logger.info(f"generate_picker_data: {len(cached_cells)} cells filled from the cache")
+
+    # Visible columns are generated before hidden columns
+    hidden = [j for j in range(column_count) if j+1 in state["hidden_columns"]]
+    columns = [j for j in range(column_count) if j not in hidden]
+    if state["generate_data_for_hidden_columns"] != False:
+        columns += hidden
+    column_ranks = {j+1: rank for rank, j in enumerate(columns)}
+
+    scheduler = state.get("data_generation_queue")
+    if not isinstance(scheduler, CellScheduler):
+        scheduler = CellScheduler()
+    generation = scheduler.start(
+        ((i, j+1) for i in range(len(files)) for j in columns if (i, j) not in cached_cells),
+        column_ranks=column_ranks,
+        idle=getting_data,
+    )
+    return scheduler, generation
+
 def generate_picker_data(
     files: list[str],
     column_functions: list[Callable],
@@ -186,11 +462,24 @@ def generate_picker_data(
     visible_rows_indices,
     getting_data,
     state,
+    batched_columns: Optional[dict[int, BatchedColumn]] = None,
+    cache: Optional[ResultCache] = None,
+    cache_keys: Optional[list[str]] = None,
+    engine: str = "threads",
 ) -> None:
     """
     Generate data from a list of files and a list of column functions which will be used to 
         generate subsequent columns.
 
+    If engine is "processes" then the column functions are run in a pool of worker processes (see
+        generate_picker_data_processes); they must then be picklable, i.e., defined at the top level of a module.
+
+    batched_columns maps the index of a column function to a BatchedColumn which fills the cells of that column for
+        a chunk of files at once; the column function is then only used if the batched output can't be split.
+
+    If a cache is passed then the cells of column j are looked up and stored under cache_keys[j], and only the cells
+        which aren't cached are generated.
+
     This function is performed asynchronously with os.cpu_count() threads.
 
     data_header: header list to be set for the picker
@@ -199,35 +488,25 @@ def generate_picker_data(
     """
     logger.info(f"generate_picker_data: {len(files)} files, {len(column_functions)} column_functions")
 
+    if engine == "processes":
+        from listpick.utils.generate_data_multiprocessing import generate_picker_data_processes
+        generate_picker_data_processes(files, column_functions, data_header, items, picker_header, getting_data, state, cache=cache, cache_keys=cache_keys)
+        return
+
     items.clear()
     items.extend([[file] + ["..." for _ in column_functions] for file in files])
     picker_header[:] = data_header
-
-
-    task_queue = state["data_generation_queue"]
-    for i in range(len(files)):
-        for j in range(len(column_functions)):
-            if state["generate_data_for_hidden_columns"] == False and j+1 in state["hidden_columns"]: continue
-            task_queue.put((10, (i, j)))
+    scheduler, generation = schedule_cells(files, len(column_functions), items, state, cache, cache_keys, getting_data)
 
     num_workers = os.cpu_count()
     if num_workers in [None, -1]: num_workers = 4
     if num_workers == None or num_workers < 1: num_workers = 1
-    completed_cells = set()
 
     for _ in range(num_workers):
         gen_items_thread = threading.Thread(
             target=generate_columns_worker,
-            args=(column_functions, files, items, getting_data, task_queue, completed_cells, state),
+            args=(column_functions, files, items, getting_data, scheduler, generation, state, batched_columns, cache, cache_keys),
         )
         state["threads"].append(gen_items_thread)
         gen_items_thread.daemon = True
         gen_items_thread.start()
-
-    update_queue_thread = threading.Thread(
-        target=update_queue,
-        args=(task_queue, visible_rows_indices, len(files), len(column_functions), state),
-    )
-    state["threads"].append(update_queue_thread)
-    update_queue_thread.daemon = True
-    update_queue_thread.start()
@@ -0,0 +1,395 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+lazy_table.py
+A memory-mapped table for csv and tsv files which are too large to load into memory.
+
+The file is indexed by the byte offset at which each row starts and rows are only parsed when they are
+accessed. The most recently parsed rows are kept in a bounded LRU cache. As with a ColumnStore, rows are
+accessed through RowView objects so that code which expects a list[list[str]] continues to work.
+
+Each row must be on a single line; i.e., quoted csv cells may not contain newlines.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import csv
+import logging
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Union
+
+from listpick.utils.column_store import RowView
+from listpick.utils.table_to_list_of_lists import split_columns
+
+logger = logging.getLogger('picker_log')
+
+# Number of parsed rows which are kept in memory
+ROW_CACHE_SIZE = 4096
+# Number of bytes of the file which are indexed at a time
+INDEX_CHUNK_BYTES = 1 << 24
+# Number of rows parsed to find the number of columns in the table
+COLUMN_COUNT_SAMPLE = 1000
+# The characters which bytes.strip() removes; lines which only contain these are blank
+ASCII_WHITESPACE = " \t\n\r\x0b\x0c"
+
+
+def read_lines(buffer, start: int, stop: int) -> Iterator[str]:
+    """ Decode buffer[start:stop] and yield its lines. Blank lines are not indexed so they are skipped here too. """
+    for line in buffer[start:stop].decode("utf-8", errors="replace").split("\n"):
+        if line.strip(ASCII_WHITESPACE):
+            yield line.rstrip("\r")
+
+def split_cells(lines: Iterable[str], file_type: str = 'csv') -> Iterator[list[str]]:
+    """ Split each of lines into a row of cells with whitespace stripped from each cell. """
+    if file_type == 'csv':
+        rows = csv.reader(lines, skipinitialspace=True)
+    else:
+        rows = (split_columns(line) for line in lines)
+    for cells in rows:
+        yield [cell.strip() for cell in cells]
+
+
+class LazyTable:
+    """
+    A csv or tsv file which is parsed a row at a time as rows are accessed.
+
+    Behaves like a list of rows: len(table), table[i][j], table[i][j] = value, iteration and enumerate() all work.
+        offsets:        array of the byte offset of the start of each row
+        cache:          {row: cells} for the most recently parsed rows
+        edits:          {row: cells} for rows which have been modified; these are never evicted
+
+    The rows are indexed by index_next_chunk(); until the whole file has been indexed len(table) is the number
+        of rows indexed so far. Blank lines are skipped.
+    """
+
+    def __init__(self, path: str, file_type: str = 'csv', cache_size: int = ROW_CACHE_SIZE):
+        self.path = path
+        self.file_type = file_type
+        self.cache_size = cache_size
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.offsets = array('Q')
+        self.indexed_bytes = 0
+        self.column_count = 0
+        self.cache: OrderedDict[int, list[str]] = OrderedDict()
+        self.edits: dict[int, list[str]] = {}
+
+    def __getstate__(self) -> dict:
+        """ The file and its memory map are reopened when unpickled. """
+        state = self.__dict__.copy()
+        for key in ["_file", "_mmap", "cache"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.cache = OrderedDict()
+
+    def reopen(self) -> "LazyTable":
+        """ Return a new, unindexed, LazyTable for the same file. """
+        return LazyTable(self.path, self.file_type, self.cache_size)
+
+    def close(self) -> None:
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    @property
+    def fully_indexed(self) -> bool:
+        return self.indexed_bytes >= self.size
+
+    def index_next_chunk(self, chunk_bytes: int = INDEX_CHUNK_BYTES) -> int:
+        """ Index the rows in the next chunk_bytes of the file. Returns the number of rows added. """
+        start = self.indexed_bytes
+        if start >= self.size:
+            return 0
+        end = min(start + chunk_bytes, self.size)
+        if end < self.size:
+            # Finish the chunk at the end of a line
+            newline = self._mmap.rfind(b"\n", start, end)
+            if newline == -1:
+                newline = self._mmap.find(b"\n", end)
+            end = self.size if newline == -1 else newline + 1
+
+        offsets = array('Q')
+        offset = start
+        for line in self._mmap[start:end].split(b"\n"):
+            if line.strip():
+                offsets.append(offset)
+            offset += len(line) + 1
+        self.offsets.extend(offsets)
+        self.indexed_bytes = end
+        return len(offsets)
+
+    def drop_first_row(self) -> list[str]:
+        """ Remove the first row from the table (e.g., because it is the header) and return it. """
+        row = self.parse(0)
+        self.offsets = self.offsets[1:]
+        self.cache.clear()
+        self.edits = {i-1: cells for i, cells in self.edits.items() if i > 0}
+        return row
+
+    def set_column_count(self, sample_size: int = COLUMN_COUNT_SAMPLE) -> None:
+        """ Set the column count to the width of the widest of the first sample_size rows. """
+        for i in range(min(sample_size, len(self.offsets))):
+            self.parse(i)
+
+    def line(self, i: int) -> str:
+        """ Return the text of row i. """
+        return self._mmap[self.offsets[i]:self.row_end(i)].decode("utf-8", errors="replace").rstrip("\r")
+
+    def lines(self, indices: Iterable[int], block_size: int = 10000) -> Iterator[str]:
+        """ Yield the text of each of indices. Consecutive rows are read and decoded a block at a time. """
+        if not (isinstance(indices, range) and indices.step == 1):
+            for i in indices:
+                yield self.line(i)
+            return
+        for block_start in range(indices.start, indices.stop, block_size):
+            block_stop = min(block_start + block_size, indices.stop)
+            yield from read_lines(self._mmap, self.offsets[block_start], self.row_end(block_stop-1))
+
+    def row_end(self, i: int) -> int:
+        """ Return the byte offset of the end of row i. """
+        end = self._mmap.find(b"\n", self.offsets[i])
+        return self.size if end == -1 else end
+
+    def split_lines(self, lines: Iterable[str]) -> Iterator[list[str]]:
+        """ Split each of lines into cells. Rows are padded to the column count. """
+        for row in split_cells(lines, self.file_type):
+            if len(row) > self.column_count:
+                self.column_count = len(row)
+            elif len(row) < self.column_count:
+                row.extend([""] * (self.column_count - len(row)))
+            yield row
+
+    def parse(self, i: int) -> list[str]:
+        """ Parse row i from the file. """
+        return next(self.split_lines([self.line(i)]))
+
+    def row(self, i: int) -> list[str]:
+        """ Return the cells of row i, parsing it if it is not in the cache. """
+        row = self.edits.get(i)
+        if row is not None:
+            return row
+        row = self.cache.get(i)
+        if row is not None:
+            self.cache.move_to_end(i)
+            return row
+        row = self.cache[i] = self.parse(i)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return row
+
+    def iter_rows(self, indices: Iterable[int]) -> Iterator[Tuple[int, list[str]]]:
+        """ Yield (i, cells) for each of indices. The rows are parsed together and are not added to the cache. """
+        if not isinstance(indices, (range, array, list)):
+            indices = list(indices)
+        edits = self.edits
+        for i, row in zip(indices, self.split_lines(self.lines(indices))):
+            yield i, edits.get(i, row)
+
+    def parsed_rows(self) -> list[list[str]]:
+        """ Return the rows which are in the cache or have been edited. """
+        return list(self.cache.values()) + list(self.edits.values())
+
+    def get(self, i: int, col: int) -> str:
+        row = self.row(i)
+        return row[col] if col < len(row) else ""
+
+    def set(self, i: int, col: int, value: str) -> None:
+        row = self.edits.get(i)
+        if row is None:
+            row = self.edits[i] = list(self.row(i))
+            self.cache.pop(i, None)
+        if col >= len(row):
+            row.extend([""] * (col + 1 - len(row)))
+        row[col] = value
+
+    def add_column(self, default: str = "") -> None:
+        """ Add a column to the end of every row. The default is only stored in rows which have been edited; other rows are padded with "". """
+        self.column_count += 1
+        self.cache.clear()
+        for row in self.edits.values():
+            row.extend([default] * (self.column_count - len(row)))
+
+    def indexed_rows(self, order: Optional[Iterable[int]] = None) -> "LazyIndexedRows":
+        """ Return (index, row) pairs for the rows in order, or for every row if order is None. """
+        return LazyIndexedRows(self, range(len(self)) if order is None else order)
+
+    def to_lists(self) -> list[list[str]]:
+        """ Return the table as a list of lists. """
+        return [self.row(i)[:] for i in range(len(self))]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [RowView(self, j) for j in range(len(self))[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("row index out of range")
+        return RowView(self, i)
+
+    def __iter__(self) -> Iterator[RowView]:
+        for i in range(len(self)):
+            yield RowView(self, i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, LazyTable)):
+            return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LazyTable(path={self.path!r}, rows={len(self)}, columns={self.column_count})"
+
+
+class LazyIndexedRows:
+    """
+    The indexed_items of a LazyTable; i.e., a sequence of (index, row) tuples.
+
+    Only the row indices are stored: a range when the rows are in their original order, otherwise an array.
+    The tuples are created when they are accessed.
+    """
+
+    def __init__(self, table: LazyTable, order: Iterable[int]):
+        self.table = table
+        self.order = order if isinstance(order, (range, array)) else array('Q', order)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [(i, RowView(self.table, i)) for i in self.order[k]]
+        i = self.order[k]
+        return (i, RowView(self.table, i))
+
+    def __setitem__(self, k, rows) -> None:
+        if not (isinstance(k, slice) and k == slice(None)):
+            raise TypeError("only the whole of a LazyIndexedRows can be assigned")
+        self.order = array('Q', (i for i, _ in rows))
+
+    def __iter__(self) -> Iterator[Tuple[int, RowView]]:
+        for i in self.order:
+            yield (i, RowView(self.table, i))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, LazyIndexedRows)):
+            return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def extend(self, rows: Iterable[Tuple[int, list[str]]]) -> None:
+        """ Append rows. Appending the rows which follow a range keeps the order as a range. """
+        order = rows.order if isinstance(rows, LazyIndexedRows) else array('Q', (i for i, _ in rows))
+        if isinstance(self.order, range) and isinstance(order, range) and self.order.step == order.step == 1 and self.order.stop == order.start:
+            self.order = range(self.order.start, order.stop)
+            return
+        if not isinstance(self.order, array):
+            self.order = array('Q', self.order)
+        self.order.extend(order)
+
+    def sort(self, key=None, reverse: bool = False) -> None:
+        """ Sort the rows in place as list.sort would. """
+        rows = list(self)
+        rows.sort(key=key, reverse=reverse)
+        self.order = array('Q', (i for i, _ in rows))
+
+    def column_keys(self, column: int, key_function: Callable, numeric: bool = False) -> Union[list, array]:
+        """
+        Return key_function(cell) for the cell in column of each row, in order. The rows are parsed together without
+            creating the (index, row) tuples. If numeric then the keys are floats and are kept in an array.
+        """
+        keys = array('d') if numeric else []
+        keys.extend(key_function(row[column]) for _, row in self.table.iter_rows(self.order))
+        return keys
+
+    def reorder(self, positions: Iterable[int]) -> None:
+        """ Put the rows in a new order, where positions[k] is the current position of the row which is to be k-th. """
+        order = self.order
+        self.order = array('Q', (order[k] for k in positions))
+
+    def sort_by_keys(self, keys: Union[list, array], reverse: bool = False) -> None:
+        """ Sort the rows by keys (one for each row, in order) as list.sort would, by sorting the positions of the rows. """
+        self.reorder(sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse))
+
+    def sort_by_index(self, reverse: bool = False) -> None:
+        """ Put the rows back into their original order without creating the tuples. """
+        if isinstance(self.order, range) and self.order.step in (1, -1):
+            ascending = self.order if self.order.step == 1 else self.order[::-1]
+            self.order = ascending[::-1] if reverse else ascending
+        else:
+            self.order = array('Q', sorted(self.order, reverse=reverse))
+
+
+def index_table_in_chunks(
+    items: LazyTable,
+    header: list[str],
+    getting_data: threading.Event,
+    state: dict,
+    first_row_is_header: bool = True,
+    chunk_bytes: int = INDEX_CHUNK_BYTES,
+) -> None:
+    """
+    Index a LazyTable in chunks. This can be used as the refresh_function of a Picker.
+
+    The first chunk is indexed before returning so that the Picker can be drawn straight away; the rest of the
+        file is indexed by a background thread and getting_data is set once the whole file has been indexed.
+
+    If they are in the state dict:
+        data_lock:          is held while each chunk is indexed
+        load_progress:      is updated with the rows and bytes indexed so far
+        thread_stop_event:  stops the indexing when it is set
+
+    An indexer which is still running from an earlier call with the same load_progress is stopped.
+    """
+    logger.info("function: index_table_in_chunks (lazy_table.py)")
+    data_lock = state.get("data_lock") or threading.Lock()
+    stop_event = state.get("thread_stop_event")
+    progress = state.get("load_progress", {})
+    # The indexer of an earlier call stops once it sees that the progress belongs to this one
+    loader = object()
+    progress.update({"rows": 0, "bytes": 0, "total_bytes": items.size, "done": False, "loader": loader})
+
+    def stopped() -> bool:
+        return progress.get("loader") is not loader or (stop_event is not None and stop_event.is_set())
+
+    def index_chunk() -> int:
+        # Checked under the lock as the Picker closes a table which a refresh has replaced while holding it
+        with data_lock:
+            if stopped():
+                return 0
+            count = items.index_next_chunk(chunk_bytes)
+        if progress.get("loader") is loader:
+            progress["rows"] = len(items)
+            progress["bytes"] = items.indexed_bytes
+        return count
+
+    def index_remaining_rows() -> None:
+        try:
+            while not stopped() and index_chunk():
+                pass
+        except Exception as e:
+            logger.error(f"index_table_in_chunks error reading {items.path}: {e}")
+        finally:
+            if progress.get("loader") is loader:
+                progress["done"] = True
+                getting_data.set()
+
+    while index_chunk() and len(items) < 2:
+        pass
+    # The first row is only a header if there is at least one other row.
+    if items.file_type == 'csv' and first_row_is_header and len(items) > 1:
+        header[:] = items.drop_first_row()
+    items.set_column_count()
+
+    threading.Thread(target=index_remaining_rows, daemon=True).start()
@@ -0,0 +1,248 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+parallel_filter.py
+Match the rows of large tables against a filter or search query in a pool of worker processes.
+
+The rows are split into shards, one task per shard. The workers do not receive the rows themselves:
+    - a list of rows is packed once into shared memory and each worker reads its shard from there
+    - a LazyTable is read by each worker from its own memory map of the file
+Any other table (e.g., a ColumnStore) is matched in the main process.
+Each worker returns the indices of the matching rows in its shard and the results are merged in their original order.
+
+The workers are started with the "spawn" method so, as with any use of multiprocessing, a script which runs a Picker
+    must guard its entry point with `if __name__ == "__main__":`. If the workers can't be started then the rows are
+    matched in the main process.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+import logging
+import mmap
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, Iterable, Iterator, Optional
+
+from listpick.utils.lazy_table import LazyTable, read_lines, split_cells
+from listpick.utils.search_and_filter_utils import compile_query
+
+logger = logging.getLogger('picker_log')
+
+# Tables with fewer rows than this are matched in the main process
+PARALLEL_FILTER_MIN_ROWS = 200000
+# Number of shards per worker. More shards than workers means that a cancelled filter stops sooner.
+SHARDS_PER_WORKER = 4
+# The most bytes of a file in one shard; large files are split into more shards
+MAX_SHARD_BYTES = 256 * 1024 * 1024
+# A worker decodes and matches its shard this many bytes at a time
+SHARD_BLOCK_BYTES = 4 * 1024 * 1024
+# Interval (in seconds) at which the cancel function is checked while waiting for the workers
+CANCEL_CHECK_INTERVAL = 0.05
+# Number of rows matched in the main process between checks of the cancel function
+CANCEL_CHECK_ROWS = 16384
+# Separators for packing rows into shared memory
+CELL_SEPARATOR = "\x1f"
+ROW_SEPARATOR = "\x1e"
+
+
+class FilterCancelled(Exception):
+    """ Raised when a parallel filter or search is cancelled before it has finished. """
+
+
+def cancellable(rows: Iterable, cancel: Optional[Callable[[], bool]]) -> Iterable:
+    """ Iterate over rows which are matched in the main process, raising FilterCancelled if cancel() returns True. """
+    if cancel is None:
+        return rows
+    def checked():
+        for k, row in enumerate(rows):
+            if k % CANCEL_CHECK_ROWS == CANCEL_CHECK_ROWS - 1 and cancel():
+                raise FilterCancelled()
+            yield row
+    return checked()
+
+
+def read_blocks(buffer, start: int, stop: int, separator: bytes) -> Iterator[bytes]:
+    """
+    Yield buffer[start:stop] in blocks of about SHARD_BLOCK_BYTES which are split at a separator (which is dropped),
+        so that a shard is never decoded all at once. Joining the blocks with the separator gives buffer[start:stop].
+    """
+    size = SHARD_BLOCK_BYTES
+    while True:
+        end = min(start + size, stop)
+        block = bytes(buffer[start:end])
+        if end < stop:
+            cut = block.rfind(separator)
+            if cut == -1:
+                # A row which is longer than the block
+                size *= 2
+                continue
+            yield block[:cut]
+            start += cut + len(separator)
+            size = SHARD_BLOCK_BYTES
+            continue
+        yield block
+        return
+
+def match_shard(source: tuple, query: str, row_start: int, byte_start: int, byte_stop: int, column_count: int) -> bytes:
+    """
+    Worker: return the indices of the rows in a shard which match query, as the bytes of an array('Q').
+
+    source is ("shared_memory", name) or ("file", path, file_type).
+    """
+    matches = compile_query(query).matches
+    matched = array('Q')
+    k = row_start
+    if source[0] == "shared_memory":
+        # The workers share the resource tracker of the main process so attaching doesn't register the memory again.
+        shm = shared_memory.SharedMemory(name=source[1])
+        try:
+            for block in read_blocks(shm.buf, byte_start, byte_stop, ROW_SEPARATOR.encode("utf-8")):
+                for line in block.decode("utf-8").split(ROW_SEPARATOR):
+                    if matches(line.split(CELL_SEPARATOR)):
+                        matched.append(k)
+                    k += 1
+        finally:
+            shm.close()
+    else:
+        _, path, file_type = source
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for block in read_blocks(buffer, byte_start, byte_stop, b"\n"):
+                for row in split_cells(read_lines(block, 0, len(block)), file_type):
+                    if matches(row + [""] * (column_count - len(row))):
+                        matched.append(k)
+                    k += 1
+    return matched.tobytes()
+
+
+class ParallelMatcher:
+    """
+    Matches the rows of a table against a query in a pool of worker processes.
+
+    The packed copy of a list of rows is kept between calls so that each new query only has to be sent to the
+        workers. It must be invalidated when the rows are modified.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_rows: int = PARALLEL_FILTER_MIN_ROWS):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.min_rows = min_rows
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.items = None           # The items which have been packed
+        self.row_count = 0          # len(items) when they were packed
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.shards: list[tuple[int, int, int, int]] = []    # (row_start, row_stop, byte_start, byte_stop)
+
+    def enabled(self, row_count: int) -> bool:
+        """ Return True if row_count rows are enough to be worth matching in parallel. """
+        return self.workers > 1 and row_count >= self.min_rows
+
+    def invalidate(self) -> None:
+        """ Discard the packed rows. """
+        if self.shm is not None:
+            self.shm.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.shm = None
+        self.items = None
+        self.row_count = 0
+        self.shards = []
+
+    def close(self) -> None:
+        """ Discard the packed rows and stop the workers. """
+        self.invalidate()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def pack(self, items: list[list[str]], shard_count: int) -> bool:
+        """ Pack items into shared memory. Returns False if a cell contains one of the separators. """
+        shard_size = -(-len(items) // shard_count)
+        parts, shards, byte_start = [], [], 0
+        for row_start in range(0, len(items), shard_size):
+            rows = items[row_start:row_start+shard_size]
+            text = ROW_SEPARATOR.join(CELL_SEPARATOR.join(row) for row in rows)
+            if text.count(ROW_SEPARATOR) != len(rows) - 1 or text.count(CELL_SEPARATOR) != sum(len(row) - 1 for row in rows):
+                return False
+            data = text.encode("utf-8")
+            parts.append(data)
+            shards.append((row_start, row_start + len(rows), byte_start, byte_start + len(data)))
+            byte_start += len(data)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, byte_start))
+        position = 0
+        for data in parts:
+            self.shm.buf[position:position+len(data)] = data
+            position += len(data)
+        self.items, self.row_count, self.shards = items, len(items), shards
+        return True
+
+    def tasks(self, items, start: int) -> Optional[list[tuple]]:
+        """ Return the arguments of match_shard for each shard of items[start:], or None if items can't be matched in parallel. """
+        shard_count = self.workers * SHARDS_PER_WORKER
+        if isinstance(items, LazyTable):
+            source = ("file", items.path, items.file_type)
+            # Shards of a large file are kept to about MAX_SHARD_BYTES
+            shard_count = max(shard_count, -(-(items.size - items.offsets[start]) // MAX_SHARD_BYTES) if start < len(items) else 1)
+            shard_size = -(-(len(items) - start) // shard_count)
+            return [
+                (source, row_start, items.offsets[row_start], items.row_end(min(row_start+shard_size, len(items))-1), items.column_count)
+                for row_start in range(start, len(items), shard_size)
+            ]
+        if not isinstance(items, list):
+            return None
+
+        if self.items is not items or self.row_count != len(items):
+            self.invalidate()
+            if not self.pack(items, shard_count):
+                self.invalidate()
+                return None
+        source = ("shared_memory", self.shm.name)
+        # Shards which end before start are skipped; the rows before start in the first shard are discarded after matching
+        return [(source, row_start, byte_start, byte_stop, 0) for row_start, row_stop, byte_start, byte_stop in self.shards if row_stop > start]
+
+    def matching_rows(self, items, query: str, start: int = 0, cancel: Optional[Callable[[], bool]] = None) -> Optional[list[int]]:
+        """
+        Return the indices of the rows in items[start:] which match query, in order.
+
+        Returns None if the rows can't be matched in parallel; the caller should then match them itself.
+        Raises FilterCancelled if cancel() returns True before the workers have finished.
+        """
+        tasks = self.tasks(items, start)
+        if tasks is None:
+            return None
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+        try:
+            futures = [self.pool.submit(match_shard, source, query, row_start, byte_start, byte_stop, column_count) for source, row_start, byte_start, byte_stop, column_count in tasks]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=CANCEL_CHECK_INTERVAL, return_when=FIRST_COMPLETED)
+                if pending and cancel is not None and cancel():
+                    for future in pending:
+                        future.cancel()
+                    raise FilterCancelled(query)
+
+            matched = []
+            for future in futures:
+                indices = array('Q')
+                indices.frombytes(future.result())
+                matched.extend(i for i in indices if i >= start)
+        except BrokenProcessPool:
+            logger.warning("ParallelMatcher: the worker processes could not be started; matching rows in the main process.")
+            self.close()
+            self.workers = 1
+            return None
+
+        if isinstance(items, LazyTable) and items.edits:
+            # The workers read the rows from the file so edited rows are matched again here.
+            matches = compile_query(query).matches
+            edited = {i for i in items.edits if i >= start}
+            matched = sorted({i for i in matched if i not in edited} | {i for i in edited if matches(items.edits[i])})
+        return matched
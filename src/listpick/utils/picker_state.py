@@ -0,0 +1,50 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+picker_state.py
+A live, read-only view of the state of a Picker.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional
+
+
+class PickerState(Mapping):
+    """
+    A read-only mapping with the same keys as Picker.get_function_data() whose values are read from the Picker's
+        attributes when they are looked up.
+
+    Nothing is copied so the view is cheap to pass to the footer, panes and refresh functions on every frame, and it
+        is always current. Picker.get_function_data() should still be used where a snapshot is kept (e.g., the state
+        of a file or sheet which is switched away from, or a dumped state).
+    """
+
+    def __init__(self, picker):
+        self.picker = picker
+        # The keys of get_function_data(), which are found when the state is first read as the picker may not have
+        #   all of its attributes yet
+        self.state_keys: Optional[dict[str, None]] = None
+
+    def keys_of_state(self) -> dict[str, None]:
+        if self.state_keys is None:
+            self.state_keys = dict.fromkeys(self.picker.get_function_data())
+        return self.state_keys
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "self":
+            return self.picker
+        if key not in self.keys_of_state():
+            raise KeyError(key)
+        return getattr(self.picker, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_of_state())
+
+    def __len__(self) -> int:
+        return len(self.keys_of_state())
+
+    def __repr__(self) -> str:
+        return f"PickerState({self.picker!r})"
@@ -0,0 +1,84 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+row_merge.py
+Merge refreshed rows into the current items by their id so that only the rows which have changed need to be
+    filtered, sorted and drawn again.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from typing import Optional, Tuple
+
+
+@dataclass
+class RowDelta:
+    """
+    The changes made by merge_rows.
+
+        changed:            indices (in the merged items) of the existing rows whose cells have changed
+        changed_columns:    the columns in which those cells have changed
+        inserted:           indices (in the merged items) of the rows with new ids
+        removed:            the number of rows whose ids are no longer present
+        reordered:          True if the rows which were kept have moved
+        shuffled:           True if the rows which were kept are no longer in the same order relative to each other
+        new_index:          the index in the merged items of each of the previous rows, or -1 if it was removed
+    """
+    changed: list[int] = field(default_factory=list)
+    changed_columns: set[int] = field(default_factory=set)
+    inserted: list[int] = field(default_factory=list)
+    removed: int = 0
+    reordered: bool = False
+    shuffled: bool = False
+    new_index: list[int] = field(default_factory=list)
+
+    @property
+    def in_place(self) -> bool:
+        """ True if every row has kept its index so the merged items are the current items, updated in place. """
+        return not self.inserted and not self.removed and not self.reordered
+
+
+def merge_rows(items: list[list[str]], new_items: list[list], id_column: int) -> Optional[Tuple[list[list[str]], RowDelta]]:
+    """
+    Merge new_items into items by the id in id_column and return (merged items, delta).
+
+    The merged items are in the order of new_items. Rows whose id is already in items keep their row object, which
+        is updated in place if its cells have changed, so that anything cached for an unchanged row (e.g., its sort
+        keys) is still valid. The cells of new_items are converted to strings.
+
+    Returns None, and leaves items unchanged, if the ids in items are not unique or a row has no id_column.
+    """
+    try:
+        index = {row[id_column]: i for i, row in enumerate(items)}
+        if len(index) != len(items):
+            return None
+        new_items = [[str(cell) if cell is not None else "" for cell in row] for row in new_items]
+        new_ids = [row[id_column] for row in new_items]
+    except (IndexError, TypeError):
+        return None
+
+    merged, delta = [], RowDelta(new_index=[-1]*len(items))
+    previous = -1
+    for k, (row_id, new_row) in enumerate(zip(new_ids, new_items)):
+        i = index.pop(row_id, None)
+        if i is None:
+            delta.inserted.append(k)
+            merged.append(new_row)
+            continue
+        delta.new_index[i] = k
+        if i != k:
+            delta.reordered = True
+        if i < previous:
+            delta.shuffled = True
+        previous = i
+        row = items[i]
+        if row != new_row:
+            delta.changed_columns.update(j for j, (old, new) in enumerate(zip_longest(row, new_row)) if old != new)
+            row[:] = new_row
+            delta.changed.append(k)
+        merged.append(row)
+    delta.removed = len(index)
+    return merged, delta
@@ -10,18 +10,20 @@ License: MIT
 
 import re
 import logging
+from functools import lru_cache
+from typing import NamedTuple, Optional, Union
 
 logger = logging.getLogger('picker_log')
 
+QUERY_CACHE_SIZE = 64
+REGEX_SPECIAL_CHARS = set(r".^$*+?{}[]\|()")
+
 def apply_filter(row: list[str], filters: dict, case_sensitive: bool = False, add_highlights:bool = False, highlights: list=[]) -> bool:
     """ Checks if row matches the filter. """
     logger.info("function: apply_filter (search_and_filter_utils.py)")
     for col, filter_list in filters.items():
         for filter in filter_list:
-            if case_sensitive or (filter != filter.lower()):
-                pattern = re.compile(filter)
-            else:
-                pattern = re.compile(filter, re.IGNORECASE)
+            pattern = compile_pattern(filter, case_sensitive)
             if col == -1:  # Apply filter to all columns
                 if not any(pattern.search(str(item)) for item in row):
                     return False
@@ -45,6 +47,8 @@ def apply_filter(row: list[str], filters: dict, case_sensitive: bool = False, ad
                     "type": "search",
                     "level": 1,
                 }
+                if not compile_pattern(filter, case_sensitive).flags & re.IGNORECASE:
+                    highlight["case_sensitive"] = True
                 if highlight not in highlights:
                     highlights.append(highlight)
     
@@ -95,3 +99,180 @@ def tokenise(query:str) -> dict:
         else:
             i += 1
     return filters
+
+
+def parse_query(query: str) -> tuple[dict, bool, bool]:
+    """
+    Split query into its filters and flags.
+
+    Returns a tuple consisting of (filters, invert_filter, case_sensitive) where filters is the dict returned by tokenise().
+    """
+    tokens = query.split()
+    invert_filter = "--v" in tokens
+    case_sensitive = "--i" in tokens
+    return tokenise(query), invert_filter, case_sensitive
+
+
+class CompiledQuery:
+    """
+    A query that has been tokenised and had its patterns compiled.
+
+    Build with compile_query() so that the same query string is only compiled once.
+
+        query:              the query string
+        filters:            {col: [pattern_str, ...]} as returned by tokenise()
+        patterns:           list of (col, compiled_pattern) tuples; col=-1 matches against any cell
+        invert_filter:      --v was passed along with at least one pattern; rows that do not match are returned
+        case_sensitive:     --i was passed; patterns are case-sensitive even if they are lowercase
+    """
+
+    __slots__ = ("query", "filters", "patterns", "invert_filter", "case_sensitive", "max_col")
+
+    def __init__(self, query: str):
+        self.query = query
+        self.filters, self.invert_filter, self.case_sensitive = parse_query(query)
+        self.patterns = []
+        for col, filter_list in self.filters.items():
+            for filter in filter_list:
+                self.patterns.append((col, compile_pattern(filter, self.case_sensitive)))
+        # A query with no patterns matches every row, so there is nothing to invert
+        self.invert_filter = self.invert_filter and bool(self.patterns)
+        cols = [col for col in self.filters if col != -1]
+        self.max_col = max(cols) if cols else -1
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def _match_all(self, row: list[str]) -> bool:
+        """ Return True if every pattern matches the row. """
+        if self.max_col >= len(row):
+            return False
+        for col, pattern in self.patterns:
+            if col == -1:
+                if not any(pattern.search(str(item)) for item in row):
+                    return False
+            elif col < 0:
+                return False
+            elif not pattern.search(str(row[col])):
+                return False
+        return True
+
+    def matches(self, row: list[str]) -> bool:
+        """ Checks if row matches the query. """
+        return self._match_all(row) != self.invert_filter
+
+    def narrows(self, previous: "CompiledQuery") -> bool:
+        """
+        Return True if every row matching this query must also match previous.
+
+        Only plain-text patterns are compared by substring; other regular expressions must be unchanged. Inverted queries only narrow themselves.
+        """
+        if self.query == previous.query:
+            return True
+        if self.invert_filter or previous.invert_filter:
+            return False
+        for col, pattern in previous.patterns:
+            if not any((col == -1 or new_col == col) and pattern_implies(new_pattern, pattern) for new_col, new_pattern in self.patterns):
+                return False
+        return True
+
+    def highlights(self) -> list[dict]:
+        """ Return the search highlights for this query. Inverted queries have nothing to highlight. """
+        if self.invert_filter:
+            return []
+        highlights = []
+        for col, pattern in self.patterns:
+            highlight = {
+                "match": pattern.pattern,
+                "field": "all" if col == -1 else col,
+                "color": 10,
+                "type": "search",
+                "level": 1,
+            }
+            # Highlights ignore case unless the pattern was matched case-sensitively
+            if not pattern.flags & re.IGNORECASE:
+                highlight["case_sensitive"] = True
+            highlights.append(highlight)
+        return highlights
+
+
+def is_literal(pattern: str) -> bool:
+    """ Return True if pattern contains no regex special characters. """
+    return not any(char in REGEX_SPECIAL_CHARS for char in pattern)
+
+
+def pattern_implies(new_pattern: re.Pattern, pattern: re.Pattern) -> bool:
+    """ Return True if a string matched by new_pattern is certain to be matched by pattern. """
+    ignore_case = bool(pattern.flags & re.IGNORECASE)
+    if not ignore_case and (new_pattern.flags & re.IGNORECASE):
+        return False
+    if new_pattern.pattern == pattern.pattern:
+        return True
+    if not (is_literal(new_pattern.pattern) and is_literal(pattern.pattern)):
+        return False
+    if ignore_case:
+        return pattern.pattern.lower() in new_pattern.pattern.lower()
+    return pattern.pattern in new_pattern.pattern
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str, case_sensitive: bool = False) -> re.Pattern:
+    """ Compile pattern. Patterns are case-insensitive unless case_sensitive is set or the pattern contains uppercase characters. """
+    if case_sensitive or (pattern != pattern.lower()):
+        return re.compile(pattern)
+    return re.compile(pattern, re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def compile_highlight(pattern: str, case_sensitive: bool = False) -> re.Pattern:
+    """ Compile a highlight pattern. Highlights are matched case-insensitively unless case_sensitive is set. """
+    if case_sensitive:
+        return re.compile(pattern)
+    return re.compile(pattern, re.IGNORECASE)
+
+
+class HighlightRule(NamedTuple):
+    """ A highlight whose pattern has been compiled. row is None if the highlight applies to every row. """
+    pattern: re.Pattern
+    field: Union[int, str]
+    color: int
+    row: Optional[int]
+
+
+class HighlightRules:
+    """
+    The highlights of a Picker compiled into HighlightRules and split by the level at which they are drawn (0, 1 or 2;
+        highlights without a valid level are drawn at level 0). A highlight with "case_sensitive": True is matched
+        case-sensitively.
+
+    update() only compiles the highlights again when they have changed, in which case version is increased so that
+        anything derived from the rules (e.g., the spans of each row) can be discarded.
+    """
+
+    def __init__(self):
+        self.key: Optional[list[tuple]] = None
+        self.version = 0
+        self.levels: tuple[list[HighlightRule], list[HighlightRule], list[HighlightRule]] = ([], [], [])
+
+    def update(self, highlights: list[dict]) -> int:
+        key = [(h.get("match"), h.get("field"), h.get("color"), h.get("row"), h.get("level", 0), bool(h.get("case_sensitive"))) for h in highlights]
+        if key != self.key:
+            levels = ([], [], [])
+            for match, field, color, row, level, case_sensitive in key:
+                if match is None or field is None or color is None:
+                    continue
+                try:
+                    pattern = compile_highlight(match, case_sensitive)
+                except (re.error, TypeError):
+                    continue
+                levels[level if level in (1, 2) else 0].append(HighlightRule(pattern, field, color, row))
+            self.key, self.levels = key, levels
+            self.version += 1
+        return self.version
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_query(query: str) -> CompiledQuery:
+    """ Return the CompiledQuery for query. The most recently used queries are cached. """
+    logger.info("function: compile_query (search_and_filter_utils.py)")
+    return CompiledQuery(query)
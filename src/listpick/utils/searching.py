@@ -8,13 +8,108 @@ Author: GrimAndGreedy
 License: MIT
 """
 
-from typing import Tuple
-from listpick.utils.search_and_filter_utils import apply_filter, tokenise
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional, Tuple
+from listpick.utils.search_and_filter_utils import CompiledQuery, compile_query
+from listpick.utils.parallel_filter import ParallelMatcher, cancellable
 import logging
 
 logger = logging.getLogger('picker_log')
 
-def search(query: str, indexed_items: list[Tuple[int, list[str]]], highlights: list[dict]=[], cursor_pos:int=0, unselectable_indices:list=[], reverse:bool=False, continue_search:bool=False) -> Tuple[bool, int, int, int, list[dict]]:
+@dataclass
+class SearchState:
+    """
+    The rows which match the search query, kept between searches so that each n/N doesn't check every row again.
+
+    Rows are checked once per query and version of the items (items_key); rows which change in place are checked again
+        on their own (see rows_changed()). The positions of the matches in indexed_items are found once per order of
+        indexed_items (order_key) and kept sorted so that the next or previous match is found by bisection.
+    """
+
+    query: str = ""
+    items_key: tuple = ()                                   # Identifies the items whose rows were checked
+    row_matches: dict[int, bool] = field(default_factory=dict)  # Index of the row in items -> whether it matches
+    order_key: tuple = ()                                   # Identifies the order of indexed_items of positions
+    positions: list[int] = field(default_factory=list)      # Sorted positions in indexed_items of the selectable matches
+    any_match: bool = False                                 # True if any row matches, even an unselectable one
+
+    def invalidate(self) -> None:
+        """ Forget the checked rows so that the next search checks every row. """
+        self.row_matches = {}
+        self.order_key = ()
+
+    def rows_changed(self, rows: Iterable[int]) -> None:
+        """ Check the rows (indices in items) again in the next search, e.g., after they have been merged in place. """
+        for i in rows:
+            self.row_matches.pop(i, None)
+        self.order_key = ()
+
+    def rows_moved(self, new_index: list[int]) -> None:
+        """ Move the checked rows to their new indices (new_index[i], or -1 if row i was removed) in items. """
+        self.row_matches = {new_index[i]: match for i, match in self.row_matches.items() if i < len(new_index) and new_index[i] >= 0}
+        self.order_key = ()
+
+    def update(self, query: str, compiled_query: CompiledQuery, indexed_items: list[Tuple[int, list[str]]], unselectable_indices: list = [], items_key: tuple = (), order_key: tuple = (), items: Optional[list[list[str]]] = None, matcher: Optional[ParallelMatcher] = None, cancel: Optional[Callable[[], bool]] = None) -> None:
+        """
+        Find the positions of the rows of indexed_items which match the query.
+
+        Without an items_key the rows are all checked again, and without an order_key the positions are found again.
+        """
+        if query != self.query or not items_key or items_key != self.items_key:
+            self.query, self.items_key = query, items_key
+            self.invalidate()
+        order_key = order_key + (len(indexed_items), tuple(unselectable_indices)) if order_key else ()
+        if order_key and order_key == self.order_key:
+            return None
+
+        row_matches = self.row_matches
+        unchecked = sum(1 for i, _ in indexed_items if i not in row_matches)
+        if unchecked:
+            matched_rows = None
+            if items is not None and matcher is not None and matcher.enabled(unchecked):
+                matched_rows = matcher.matching_rows(items, query, cancel=cancel)
+            if matched_rows is not None:
+                matched_rows = set(matched_rows)
+                for i, _ in indexed_items:
+                    if i not in row_matches:
+                        row_matches[i] = i in matched_rows
+            else:
+                matches = compiled_query.matches
+                for i, row in cancellable(indexed_items, cancel):
+                    if i not in row_matches:
+                        row_matches[i] = matches(row)
+
+        unselectable = set(unselectable_indices)
+        self.positions = []
+        self.any_match = False
+        for pos, (i, _) in enumerate(indexed_items):
+            if row_matches[i]:
+                self.any_match = True
+                if pos not in unselectable:
+                    self.positions.append(pos)
+        self.order_key = order_key
+
+    def find(self, cursor_pos: int, reverse: bool = False) -> Tuple[bool, int, int]:
+        """
+        Return (found, position of the next match after cursor_pos (before it if reverse), its 1-based index among the
+            matches). The search wraps around and reaches the cursor's own row last.
+        """
+        positions = self.positions
+        if not positions:
+            return False, cursor_pos, 0
+        if reverse:
+            k = bisect_left(positions, cursor_pos) - 1
+            if k < 0:
+                k = len(positions) - 1
+        else:
+            k = bisect_right(positions, cursor_pos)
+            if k == len(positions):
+                k = 0
+        return True, positions[k], k + 1
+
+
+def search(query: str, indexed_items: list[Tuple[int, list[str]]], highlights: list[dict]=[], cursor_pos:int=0, unselectable_indices:list=[], reverse:bool=False, continue_search:bool=False, items: Optional[list[list[str]]] = None, matcher: Optional[ParallelMatcher] = None, cancel: Optional[Callable[[], bool]] = None, search_state: Optional[SearchState] = None, items_key: tuple = (), order_key: tuple = ()) -> Tuple[bool, int, int, int, list[dict]]:
     """
     Search the indexed items and see which rows match the query.
 
@@ -24,6 +119,13 @@ def search(query: str, indexed_items: list[Tuple[int, list[str]]], highlights: l
         --i to specify case-sensitivity (it is case insensitive by default)
         --v to specify inverse match
 
+    If items (the list that indexed_items indexes into) and a matcher are passed and there are enough rows then the
+        rows are matched in the matcher's worker processes. cancel is polled while the rows are matched and
+        FilterCancelled is raised if it returns True first.
+
+    If a search_state is passed then the matches are kept in it and reused by the next search with the same query,
+        items_key (e.g., the id and version of items) and order_key (e.g., the version of the order of indexed_items).
+
     ---Returns: a tuple consisting of the following
         return_val:     True if search item found
         cursor_pos:     The position of the next search match
@@ -47,44 +149,17 @@ def search(query: str, indexed_items: list[Tuple[int, list[str]]], highlights: l
         return False, cursor_pos, 0, 0, highlights
     highlights = [highlight for highlight in highlights if "type" not in highlight or highlight["type"] != "search" ]
 
+    compiled_query = compile_query(query)
 
+    if not compiled_query: return False, cursor_pos, 0,0,highlights
 
+    if search_state is None:
+        search_state = SearchState()
+    search_state.update(query, compiled_query, indexed_items, unselectable_indices, items_key=items_key, order_key=order_key, items=items, matcher=matcher, cancel=cancel)
 
+    if search_state.any_match:
+        highlights += [highlight for highlight in compiled_query.highlights() if highlight not in highlights]
 
-    # Ensure we are searching from our current position forwards
-    searchables =  list(range(cursor_pos+1, len(indexed_items))) + list(range(cursor_pos+1))
-    if reverse:
-        searchables =  (list(range(cursor_pos, len(indexed_items))) + list(range(cursor_pos)))[::-1]
-
-    invert_filter = False
-    case_sensitive = False
-    filters = tokenise(query)
-
-    if not filters: return False, cursor_pos, 0,0,highlights
-    found = False
-    search_count = 0
-    search_list = []
-    
-    for i in searchables:
-        # if apply_filter(indexed_items[i][1]):
-        if apply_filter(indexed_items[i][1], filters, add_highlights=True, highlights=highlights):
-            new_pos = i
-            if new_pos in unselectable_indices: continue
-            search_count += 1
-            search_list.append(i)
-            
-            if not found:
-                cursor_pos = new_pos
-                found = True
-            # break
-            # return False
-            # for i in range(diff):
-            #     cursor_down()
-            # break
-    if search_list:
-        search_index = sorted(search_list).index(cursor_pos)+1
-    else:
-        search_index = 0
-
-    return bool(search_list), cursor_pos, search_index, search_count, highlights
+    found, cursor_pos, search_index = search_state.find(cursor_pos, reverse=reverse)
 
+    return found, cursor_pos, search_index, len(search_state.positions), highlights
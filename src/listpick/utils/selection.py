@@ -0,0 +1,226 @@
+#!/bin/python
+# -*- coding: utf-8 -*-
+"""
+selection.py
+Sparse row and cell selections.
+
+Selections behave like the {row: bool} and {(row, col): bool} dicts that the Picker has always
+used, but only the rows/cells whose state differs from the default are stored. Selecting all,
+deselecting all and inverting the selection only flip the default.
+
+Author: GrimAndGreedy
+License: MIT
+"""
+
+from collections.abc import MutableMapping
+from typing import Iterator, Tuple
+import logging
+
+logger = logging.getLogger('picker_log')
+
+
+class Selections(MutableMapping):
+    """
+    Row selections for rows 0..size-1.
+
+        marked:     rows whose selection state is the opposite of the default
+        inverted:   the default state; if True then every row that is not marked is selected
+    """
+
+    def __init__(self, size: int = 0, selected: list[int] = [], inverted: bool = False):
+        self.size = size
+        self.inverted = inverted
+        self.marked = set()
+        for i in selected:
+            self[i] = True
+
+    @classmethod
+    def from_dict(cls, selections: dict) -> "Selections":
+        """ Create Selections from a {row: bool} dict. """
+        if isinstance(selections, Selections):
+            return selections
+        size = max(selections.keys(), default=-1) + 1
+        return cls(size, [i for i, selected in selections.items() if selected])
+
+    def __getitem__(self, i: int) -> bool:
+        if not 0 <= i < self.size:
+            raise KeyError(i)
+        return (i in self.marked) != self.inverted
+
+    def __setitem__(self, i: int, selected: bool) -> None:
+        if i >= self.size:
+            self.resize(i+1)
+        if bool(selected) != self.inverted:
+            self.marked.add(i)
+        else:
+            self.marked.discard(i)
+
+    def __delitem__(self, i: int) -> None:
+        if not 0 <= i < self.size:
+            raise KeyError(i)
+        self[i] = False
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.size))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, i) -> bool:
+        return isinstance(i, int) and 0 <= i < self.size
+
+    def __repr__(self) -> str:
+        return f"Selections(size={self.size}, selected={self.count()})"
+
+    def resize(self, size: int) -> None:
+        """ Set the number of rows. Rows beyond the new size are forgotten and new rows are not selected. """
+        if size < self.size:
+            self.marked = {i for i in self.marked if i < size}
+        elif self.inverted:
+            self.marked.update(range(self.size, size))
+        self.size = size
+
+    def remap(self, new_index: list[int], size: int) -> None:
+        """
+        Move the selection of each row to its new index after the rows have been inserted, removed or reordered.
+
+        new_index[i] is the new index of row i, or -1 if it has been removed. Rows which have no previous row are new
+            and are not selected.
+        """
+        marked = {new_index[i] for i in self.marked if i < len(new_index) and new_index[i] >= 0}
+        if self.inverted:
+            kept = {k for k in new_index if k >= 0}
+            marked.update(k for k in range(size) if k not in kept)
+        self.marked, self.size = marked, size
+
+    def select_all(self) -> None:
+        self.marked = set()
+        self.inverted = True
+
+    def deselect_all(self) -> None:
+        self.marked = set()
+        self.inverted = False
+
+    def invert(self) -> None:
+        self.inverted = not self.inverted
+
+    def count(self) -> int:
+        """ Return the number of selected rows. """
+        return self.size - len(self.marked) if self.inverted else len(self.marked)
+
+    def selected_indices(self) -> list[int]:
+        """ Return the selected rows in ascending order. """
+        if self.inverted:
+            return [i for i in range(self.size) if i not in self.marked]
+        return sorted(self.marked)
+
+
+class CellSelections(MutableMapping):
+    """
+    Cell selections for a table with shape (rows, cols).
+
+        marked:     cells whose selection state is the opposite of the default
+        inverted:   the default state; if True then every cell that is not marked is selected
+    """
+
+    def __init__(self, rows: int = 0, cols: int = 0, selected: list[Tuple[int, int]] = [], inverted: bool = False):
+        self.rows = rows
+        self.cols = cols
+        self.inverted = inverted
+        self.marked = set()
+        for cell in selected:
+            self[cell] = True
+
+    @classmethod
+    def from_dict(cls, cell_selections: dict) -> "CellSelections":
+        """ Create CellSelections from a {(row, col): bool} dict. """
+        if isinstance(cell_selections, CellSelections):
+            return cell_selections
+        rows = max((i for i, _ in cell_selections.keys()), default=-1) + 1
+        cols = max((j for _, j in cell_selections.keys()), default=-1) + 1
+        return cls(rows, cols, [cell for cell, selected in cell_selections.items() if selected])
+
+    def __getitem__(self, cell: Tuple[int, int]) -> bool:
+        if cell not in self:
+            raise KeyError(cell)
+        return (cell in self.marked) != self.inverted
+
+    def __setitem__(self, cell: Tuple[int, int], selected: bool) -> None:
+        i, j = cell
+        if i >= self.rows or j >= self.cols:
+            self.resize(max(self.rows, i+1), max(self.cols, j+1))
+        if bool(selected) != self.inverted:
+            self.marked.add(cell)
+        else:
+            self.marked.discard(cell)
+
+    def __delitem__(self, cell: Tuple[int, int]) -> None:
+        if cell not in self:
+            raise KeyError(cell)
+        self[cell] = False
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return ((i, j) for i in range(self.rows) for j in range(self.cols))
+
+    def __len__(self) -> int:
+        return self.rows*self.cols
+
+    def __contains__(self, cell) -> bool:
+        try:
+            i, j = cell
+        except (TypeError, ValueError):
+            return False
+        return 0 <= i < self.rows and 0 <= j < self.cols
+
+    def __repr__(self) -> str:
+        return f"CellSelections(shape=({self.rows}, {self.cols}), selected={self.count()})"
+
+    def resize(self, rows: int, cols: int) -> None:
+        """ Set the shape of the table. Cells outside of the new shape are forgotten and new cells are not selected. """
+        if rows < self.rows or cols < self.cols:
+            self.marked = {(i, j) for i, j in self.marked if i < rows and j < cols}
+        if self.inverted:
+            kept_rows, kept_cols = min(rows, self.rows), min(cols, self.cols)
+            self.marked.update((i, j) for i in range(kept_rows) for j in range(kept_cols, cols))
+            self.marked.update((i, j) for i in range(kept_rows, rows) for j in range(cols))
+        self.rows, self.cols = rows, cols
+
+    def remap(self, new_index: list[int], rows: int) -> None:
+        """
+        Move the selected cells of each row to its new index after the rows have been inserted, removed or reordered.
+
+        new_index[i] is the new index of row i, or -1 if it has been removed. The cells of new rows are not selected.
+        """
+        marked = {(new_index[i], j) for i, j in self.marked if i < len(new_index) and new_index[i] >= 0}
+        if self.inverted:
+            kept = {k for k in new_index if k >= 0}
+            marked.update((k, j) for k in range(rows) if k not in kept for j in range(self.cols))
+        self.marked, self.rows = marked, rows
+
+    def select_all(self) -> None:
+        self.marked = set()
+        self.inverted = True
+
+    def deselect_all(self) -> None:
+        self.marked = set()
+        self.inverted = False
+
+    def invert(self) -> None:
+        self.inverted = not self.inverted
+
+    def count(self) -> int:
+        """ Return the number of selected cells. """
+        return len(self) - len(self.marked) if self.inverted else len(self.marked)
+
+    def selected_cells(self) -> list[Tuple[int, int]]:
+        """ Return the selected cells in row-major order. """
+        if self.inverted:
+            return [cell for cell in self if cell not in self.marked]
+        return sorted(self.marked)
+
+    def selected_cells_by_row(self) -> dict[int, list[int]]:
+        """ Return {row: [col, ...]} for each row which has selected cells. """
+        by_row = {}
+        for i, j in self.selected_cells():
+            by_row.setdefault(i, []).append(j)
+        return by_row
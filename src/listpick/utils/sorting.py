@@ -8,17 +8,36 @@ License: MIT
 """
 
 import re
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Tuple
+from typing import Callable, Tuple
 import logging
+from listpick.utils.column_store import column_store_of
+from listpick.utils.lazy_table import LazyIndexedRows
 
 logger = logging.getLogger('picker_log')
 
+NUMBER_PATTERN = re.compile(r'(\d+(\.\d+)?)')
+SIZE_PATTERN = re.compile(r'(\d+(\.\d+)?)(\s*([KMGTPEB][B]?)\s*)', re.IGNORECASE)
+
+TIME_FORMATS = [
+    "%Y-%m-%d %H:%M",     # "2021-03-16 15:30"
+    "%Y-%m-%d",           # "2021-03-16"
+    "%Y/%m/%d",           # "2021/03/16"
+    "%d/%m/%Y",           # "05/03/2024"
+    "%A %d %b %Y %H:%M:%S",  # "Saturday 01 Feb 2025 21:19:47"
+    "%a %d %b %Y %H:%M:%S",  # "Sat 01 Feb 2025 21:19:47"
+    "%d/%m/%Y",           # "10/12/2023"
+    "%d/%m/%y",            # "1/1/23"
+    "%H:%M",               # "04:30"
+    "%H:%M:%S",               # "04:30:23"
+]
+DEFAULT_TIME = datetime.strptime("00:00", "%H:%M")
+
 def parse_numerical(value: str) -> float:
     """ Match first number in string and return it as a float. If not number then return INF. """
-    logger.info("function: parse_numerical (sorting.py)")
     try:
-        match = re.search(r'(\d+(\.\d+)?)', value)
+        match = NUMBER_PATTERN.search(value)
         if match:
             return float(match.group(1))
         return float('inf')  # Default for non-numerical values
@@ -27,7 +46,6 @@ def parse_numerical(value: str) -> float:
 
 def parse_size(value: str) -> float:
     """ Match size in string and return it as a float. If no match then return INF."""
-    logger.info("function: parse_size (sorting.py)")
     size_units = {
         'B': 1,
         'KB': 1024,
@@ -42,7 +60,7 @@ def parse_size(value: str) -> float:
         'P': 1024**5
     }
     
-    match = re.search(r'(\d+(\.\d+)?)(\s*([KMGTPEB][B]?)\s*)', value, re.IGNORECASE)
+    match = SIZE_PATTERN.search(value)
     
     if match:
         number = float(match.group(1))
@@ -53,7 +71,6 @@ def parse_size(value: str) -> float:
 
 def time_to_seconds(time_str: str) -> float:
     """Convert a time string to total seconds."""
-    logger.info("function: time_to_seconds (sorting.py)")
     if time_str.strip().upper() == "INF":
         return float('inf')  # Assign infinity for "INF"
 
@@ -88,51 +105,234 @@ def time_to_seconds(time_str: str) -> float:
 
 def time_sort(time_str: str) -> datetime:
     """ If there is a date in the string then convert it to strptime. If no match then return 00:00 (as datetime)."""
-    logger.info("function: time_sort (sorting.py)")
-    formats = [
-        "%Y-%m-%d %H:%M",     # "2021-03-16 15:30"
-        "%Y-%m-%d",           # "2021-03-16"
-        "%Y/%m/%d",           # "2021/03/16"
-        "%d/%m/%Y",           # "05/03/2024"
-        "%A %d %b %Y %H:%M:%S",  # "Saturday 01 Feb 2025 21:19:47"
-        "%a %d %b %Y %H:%M:%S",  # "Sat 01 Feb 2025 21:19:47"
-        "%d/%m/%Y",           # "10/12/2023"
-        "%d/%m/%y",            # "1/1/23"
-        "%H:%M",               # "04:30"
-        "%H:%M:%S",               # "04:30:23"
-    ]
-    
-    for fmt in formats:
+    for fmt in TIME_FORMATS:
         try:
             return datetime.strptime(time_str, fmt)
         except ValueError:
             pass
     
-    return datetime.strptime("00:00", "%H:%M")
+    return DEFAULT_TIME
+
+class TimeSortKey:
+    """ Equivalent to time_sort but tries the format which matched most recently first. Use one instance per column. """
+
+    def __init__(self):
+        self.formats = list(TIME_FORMATS)
+
+    def __call__(self, time_str: str) -> datetime:
+        for i, fmt in enumerate(self.formats):
+            try:
+                result = datetime.strptime(time_str, fmt)
+            except ValueError:
+                continue
+            if i:
+                self.formats.insert(0, self.formats.pop(i))
+            return result
+        return DEFAULT_TIME
+
+def lex_key(value: str) -> Tuple[int, str]:
+    """ Case-insensitive key with empty strings sorted last. """
+    return (1 if value.strip() == "" else 0, value.lower())
+
+def LEX_key(value: str) -> Tuple[int, str]:
+    """ Case-sensitive key with empty strings sorted last. """
+    return (1 if value.strip() == "" else 0, value)
+
+def alnum_key(value: str) -> Tuple[int, str]:
+    """ Case-insensitive key which sorts non-alphanumeric characters after alphanumeric characters. """
+    return (1 if value.strip() == "" else 0, "".join([chr(ord('z')+ord(c)) if not c.isalnum() else c.lower() for c in value]))
+
+def ALNUM_key(value: str) -> Tuple[int, str]:
+    """ Case-sensitive key which sorts non-alphanumeric characters after alphanumeric characters. """
+    return (1 if value.strip() == "" else 0, "".join([chr(ord('z')+ord(c)) if not c.isalnum() else c for c in value]))
+
+SORT_METHODS = ['Orig', 'lex', 'LEX', 'alnum', 'ALNUM', 'time', 'num', 'size']
+
+# The key function applied to the cell value for each sort method. 'Orig' sorts by the row index.
+SORT_KEY_FUNCTIONS = {
+    'lex': lex_key,
+    'LEX': LEX_key,
+    'alnum': alnum_key,
+    'ALNUM': ALNUM_key,
+    'time': time_sort,
+    'num': parse_numerical,
+    'size': parse_size,
+}
+
+# Sort methods which are always ascending
+UNREVERSED_SORT_METHODS = ['alnum', 'ALNUM', 'time']
+
+# Sort methods whose keys are floats
+NUMERIC_SORT_METHODS = ['num', 'size']
+
+def get_key_function(method: str) -> Callable:
+    """ Return the key function for a sort method. Time keys are stateful so a new one is returned for each call. """
+    if method == 'time':
+        return TimeSortKey()
+    return SORT_KEY_FUNCTIONS[method]
+
+@dataclass
+class ColumnSortKeys:
+    """
+    Sort keys for one (column, sort method).
+
+        values:     the cell value that keys[i] was calculated from, indexed by the original row index
+        keys:       the sort key of each row, indexed by the original row index
+        memo:       {value: key} so that repeated values only have their key calculated once
+    """
+    key_function: Callable
+    values: list = field(default_factory=list)
+    keys: list = field(default_factory=list)
+    memo: dict = field(default_factory=dict)
 
-def sort_items(indexed_items: list[Tuple[int,list[str]]], sort_method:int=0, sort_column:int=0, sort_reverse:bool=False):
-    """ Sort indexed_items based on the sort_method on sort_column. """
+    def update(self, indexed_items: list[Tuple[int, list[str]]], column: int) -> list:
+        """ Calculate the keys for rows whose value in column has changed and return keys. """
+        values, keys, memo = self.values, self.keys, self.memo
+        key_function = self.key_function
+        if len(memo) > 2*len(values) + 1024:
+            memo.clear()
+        for i, row in indexed_items:
+            value = row[column]
+            if i >= len(values):
+                missing = i + 1 - len(values)
+                values.extend([None]*missing)
+                keys.extend([None]*missing)
+            elif values[i] is value:
+                continue
+            key = memo.get(value)
+            if key is None:
+                key = memo[value] = key_function(value)
+            values[i] = value
+            keys[i] = key
+        return keys
+
+@dataclass
+class SortKeyCache:
+    """
+    Cache of sort keys for each (column, sort method).
+
+    A key is only recalculated when the cell it was calculated from has been replaced, so re-sorting,
+    toggling the sort direction or re-sorting after some cells have changed reuses the existing keys.
+    """
+    columns: dict = field(default_factory=dict)
+
+    def invalidate(self, column: int = None) -> None:
+        """ Forget the keys for column, or for every column if column is None. """
+        if column is None:
+            self.columns.clear()
+        else:
+            for cache_key in [cache_key for cache_key in self.columns if cache_key[0] == column]:
+                del self.columns[cache_key]
+
+    def swap_columns(self, a: int, b: int) -> None:
+        """ Swap the keys of columns a and b after the columns have been swapped in the items. """
+        self.columns = {((b if col == a else a if col == b else col), method): column_keys for (col, method), column_keys in self.columns.items()}
+
+    def rows_moved(self, new_index: list[int]) -> None:
+        """ Move the keys to the new indices of their rows (new_index[i], or -1 if row i was removed). """
+        for column_keys in self.columns.values():
+            size = max(new_index, default=-1) + 1
+            values, keys = [None]*size, [None]*size
+            for i, k in enumerate(new_index[:len(column_keys.values)]):
+                if k >= 0:
+                    values[k], keys[k] = column_keys.values[i], column_keys.keys[i]
+            column_keys.values, column_keys.keys = values, keys
+
+    def keys(self, indexed_items: list[Tuple[int, list[str]]], column: int, method: str) -> list:
+        """ Return the sort keys for column indexed by the original row index. """
+        column_keys = self.columns.get((column, method))
+        if column_keys is None:
+            column_keys = self.columns[(column, method)] = ColumnSortKeys(get_key_function(method))
+        return column_keys.update(indexed_items, column)
+
+def sort_items(indexed_items: list[Tuple[int,list[str]]], sort_method:int=0, sort_column:int=0, sort_reverse:bool=False, key_cache: SortKeyCache = None):
+    """
+    Sort indexed_items based on the sort_method on sort_column.
+
+    If a key_cache is passed then the sort keys are reused between calls.
+    """
     logger.info("function: sort_items (sorting.py)")
 
-    SORT_METHODS = ['Orig', 'lex', 'LEX', 'alnum', 'ALNUM', 'time', 'num', 'size']
-    if sort_column is not None:
+    if sort_column is None:
+        return
+    method = SORT_METHODS[sort_method]
+    if method == 'Orig':
+        if isinstance(indexed_items, LazyIndexedRows):
+            indexed_items.sort_by_index(reverse=sort_reverse)
+        else:
+            indexed_items.sort(key=lambda x: x[0], reverse=sort_reverse)
+        return
+
+    reverse = sort_reverse and method not in UNREVERSED_SORT_METHODS
+    try:
+        store = None if isinstance(indexed_items, LazyIndexedRows) else column_store_of(indexed_items)
+        if isinstance(indexed_items, LazyIndexedRows):
+            # Only the keys and the order of the row indices are held in memory
+            keys = indexed_items.column_keys(sort_column, get_key_function(method), numeric=method in NUMERIC_SORT_METHODS)
+            indexed_items.sort_by_keys(keys, reverse=reverse)
+        elif store is not None:
+            # Calculate the key once for each distinct value in the column
+            keys = store.column_keys(sort_column, method, get_key_function(method))
+            codes = store.codes(sort_column)
+            indexed_items.sort(key=lambda x: keys[codes[x[1].row_index]], reverse=reverse)
+        elif key_cache is not None:
+            keys = key_cache.keys(indexed_items, sort_column, method)
+            indexed_items.sort(key=lambda x: keys[x[0]], reverse=reverse)
+        else:
+            key_function = get_key_function(method)
+            indexed_items.sort(key=lambda x: key_function(x[1][sort_column]), reverse=reverse)
+    except IndexError:
+        pass  # Handle cases where sort_column is out of range
+
+def get_sort_keys(indexed_items: list[Tuple[int,list[str]]], sort_method:int=0, sort_column:int=0, key_cache: SortKeyCache = None) -> list:
+    """ Return the sort key of each row in indexed_items, in the same order as indexed_items. """
+    method = SORT_METHODS[sort_method]
+    if isinstance(indexed_items, LazyIndexedRows):
+        if method == 'Orig':
+            return indexed_items.order
+        return indexed_items.column_keys(sort_column, get_key_function(method), numeric=method in NUMERIC_SORT_METHODS)
+    if method == 'Orig':
+        return [i for i, _ in indexed_items]
+    store = column_store_of(indexed_items)
+    if store is not None:
+        keys = store.column_keys(sort_column, method, get_key_function(method))
+        codes = store.codes(sort_column)
+        return [keys[codes[row.row_index]] for _, row in indexed_items]
+    if key_cache is not None:
+        keys = key_cache.keys(indexed_items, sort_column, method)
+        return [keys[i] for i, _ in indexed_items]
+    key_function = get_key_function(method)
+    return [key_function(row[sort_column]) for _, row in indexed_items]
+
+def sort_items_by_levels(indexed_items: list[Tuple[int,list[str]]], sort_levels: list[Tuple[int, int, bool]], key_cache: SortKeyCache = None):
+    """
+    Sort indexed_items by several levels in a single stable sort.
+
+    sort_levels is a list of (sort_column, sort_method, sort_reverse); the first level has the highest priority and
+        each following level breaks ties in the levels before it.
+
+    The keys of each level are replaced by their rank among the distinct keys of that level so that descending levels
+        can be combined with ascending levels by negating the rank.
+    """
+    logger.info("function: sort_items_by_levels (sorting.py)")
+
+    rank_columns = []
+    for sort_column, sort_method, sort_reverse in sort_levels:
+        if sort_column is None:
+            continue
         try:
-            if SORT_METHODS[sort_method] == 'num':
-                indexed_items.sort(key=lambda x: parse_numerical(x[1][sort_column]), reverse=sort_reverse)
-            elif SORT_METHODS[sort_method] == 'Orig':
-                indexed_items.sort(key=lambda x: x[0], reverse=sort_reverse)
-            elif SORT_METHODS[sort_method] == 'lex':
-                # indexed_items.sort(key=lambda x: x[1][sort_column].lower(), reverse=sort_reverse)
-                indexed_items.sort(key=lambda x: (1 if x[1][sort_column].strip() == "" else 0, x[1][sort_column].lower()), reverse=sort_reverse)
-            elif SORT_METHODS[sort_method] == 'LEX':
-                indexed_items.sort(key=lambda x: (1 if x[1][sort_column].strip() == "" else 0, x[1][sort_column]), reverse=sort_reverse)
-            elif SORT_METHODS[sort_method] == 'alnum':
-                indexed_items.sort(key=lambda x: (1 if x[1][sort_column].strip() == "" else 0, "".join([chr(ord('z')+ord(c)) if not c.isalnum() else c.lower() for c in x[1][sort_column]])))
-            elif SORT_METHODS[sort_method] == 'time':
-                indexed_items.sort(key=lambda x:time_sort(x[1][sort_column]))
-            elif SORT_METHODS[sort_method] == 'ALNUM':
-                indexed_items.sort(key=lambda x: (1 if x[1][sort_column].strip() == "" else 0, "".join([chr(ord('z')+ord(c)) if not c.isalnum() else c for c in x[1][sort_column]])))
-            elif SORT_METHODS[sort_method] == 'size':
-                indexed_items.sort(key=lambda x: parse_size(x[1][sort_column]), reverse=sort_reverse)
+            keys = get_sort_keys(indexed_items, sort_method=sort_method, sort_column=sort_column, key_cache=key_cache)
         except IndexError:
-            pass  # Handle cases where sort_column is out of range
+            continue  # Handle cases where sort_column is out of range
+        ranks = {key: rank for rank, key in enumerate(sorted(set(keys)))}
+        sign = -1 if sort_reverse and SORT_METHODS[sort_method] not in UNREVERSED_SORT_METHODS else 1
+        rank_columns.append([sign*ranks[key] for key in keys])
+
+    if not rank_columns:
+        return
+    composite_keys = list(zip(*rank_columns))
+    order = sorted(range(len(indexed_items)), key=composite_keys.__getitem__)
+    if isinstance(indexed_items, LazyIndexedRows):
+        indexed_items.reorder(order)
+    else:
+        indexed_items[:] = [indexed_items[i] for i in order]
@@ -10,15 +10,25 @@ License: MIT
 import sys
 import csv
 import json
+import re
+import threading
 from io import StringIO
+from itertools import islice
 import argparse
-from typing import Tuple, Iterable, Optional
+from typing import Tuple, Iterable, Iterator, Optional, TextIO, Union
 import dill as pickle
 import os
 import logging
 
+from listpick.utils.column_store import ColumnStore
+
 logger = logging.getLogger('picker_log')
 
+# Number of rows read before the Picker is first drawn when loading in chunks
+STREAM_FIRST_CHUNK_SIZE = 1000
+# Number of rows appended to the items at a time when loading in chunks
+STREAM_CHUNK_SIZE = 20000
+
 def read_file_content(file_path: str) -> str:
     """ Read lines from file. """
     logger.info("function: read_file_content (table_to_list_of_lists.py)")
@@ -36,6 +46,147 @@ def strip_whitespace(item: Iterable) -> Iterable:
         return item
 
 
+def split_columns(line: str) -> list[str]:
+    """ Split a line by whitespace. Quoted strings are kept together. """
+    pattern = r"(?:\"[^\"]*\"|'[^']*'|[^'\s]+)"
+    return re.findall(pattern, line)
+
+def read_table_rows(file: TextIO, file_type: str = 'csv') -> Iterator[list[str]]:
+    """
+    Yield the rows of an open csv or tsv file one at a time, with whitespace stripped from each cell.
+
+    The rows are the same as those returned by table_to_list for the same file, but the file is never
+        held in memory as a whole.
+    """
+    if file_type == 'csv':
+        for row in csv.reader(file, skipinitialspace=True):
+            yield [cell.strip() for cell in row]
+        return
+
+    # table_to_list strips the whole of the data before splitting it into lines so blank lines at
+    # the start and end of the file are dropped.
+    blank_lines = 0
+    started = False
+    for line in file:
+        if not line.strip():
+            if started:
+                blank_lines += 1
+            continue
+        for _ in range(blank_lines):
+            yield []
+        blank_lines = 0
+        started = True
+        yield [cell.strip() for cell in split_columns(line)]
+
+def load_table_in_chunks(
+    input_arg: str,
+    items: Union[list[list[str]], ColumnStore],
+    header: list[str],
+    getting_data: threading.Event,
+    state: dict,
+    file_type: str = 'csv',
+    first_row_is_header: bool = True,
+    first_chunk_size: int = STREAM_FIRST_CHUNK_SIZE,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> None:
+    """
+    Load a csv or tsv file into items in chunks. This can be used as the refresh_function of a Picker.
+
+    The first chunk is loaded before returning so that the Picker can be drawn straight away. The rest
+        of the rows are appended to items by a background thread and getting_data is set once the
+        whole file has been loaded. The rows replace any which are already in items, which can be a list or a ColumnStore.
+
+    If they are in the state dict:
+        data_lock:          is held while each chunk is appended to items
+        load_progress:      is updated with the rows and bytes loaded so far
+        thread_stop_event:  stops the loading when it is set
+
+    A loader which is still running from an earlier call with the same load_progress (e.g., when the Picker is
+        refreshed before the file has been loaded) is stopped so that it doesn't set getting_data early.
+    """
+    logger.info("function: load_table_in_chunks (table_to_list_of_lists.py)")
+    file_path = os.path.expandvars(os.path.expanduser(input_arg))
+    file = open(file_path, 'r')
+    rows = read_table_rows(file, file_type)
+
+    data_lock = state.get("data_lock") or threading.Lock()
+    stop_event = state.get("thread_stop_event")
+    progress = state.get("load_progress", {})
+    # The loader of an earlier call stops once it sees that the progress belongs to this one
+    loader = object()
+    progress.update({"rows": 0, "bytes": 0, "total_bytes": os.path.getsize(file_path), "done": False, "loader": loader})
+
+    def stopped() -> bool:
+        return progress.get("loader") is not loader or (stop_event is not None and stop_event.is_set())
+
+    def append_chunk(chunk: list[list[str]], first: bool = False) -> bool:
+        """ Append chunk to items unless this loader has been stopped. Returns False if it has been. """
+        # The check is made under the lock so that a stopped loader can't append to items after a new call has cleared them
+        with data_lock:
+            if not first and stopped():
+                return False
+            # The rows replace any that are already in items (e.g., the [[]] of an empty Picker).
+            if first and isinstance(items, (list, ColumnStore)):
+                items.clear()
+            items.extend(chunk)
+        if progress.get("loader") is loader:
+            progress["rows"] += len(chunk)
+            progress["bytes"] = file.buffer.tell()
+        return True
+
+    def load_remaining_rows() -> None:
+        try:
+            while not stopped():
+                chunk = list(islice(rows, chunk_size))
+                if not chunk or not append_chunk(chunk):
+                    break
+        except Exception as e:
+            logger.error(f"load_table_in_chunks error reading {file_path}: {e}")
+        finally:
+            file.close()
+            if progress.get("loader") is loader:
+                progress["done"] = True
+                getting_data.set()
+
+    # The first row is only a header if there is at least one other row.
+    first_chunk = list(islice(rows, first_chunk_size+1))
+    if file_type == 'csv' and first_row_is_header and len(first_chunk) > 1:
+        header[:] = first_chunk[0]
+        first_chunk = first_chunk[1:]
+    append_chunk(first_chunk, first=True)
+
+    threading.Thread(target=load_remaining_rows, daemon=True).start()
+
+
+def table_to_column_store(
+    input_arg: str,
+    file_type: str = 'csv',
+    first_row_is_header: bool = True,
+) -> Tuple[ColumnStore, list[str], list[str]]:
+    """
+    Read a csv or tsv file into a ColumnStore.
+
+    The rows are the same as those returned by table_to_list for the same file, but each row is encoded as it is
+        read so the table is never held as a list of lists.
+
+    returns:
+        items: ColumnStore
+        header: list[str]
+        sheets: list[str]
+    """
+    logger.info("function: table_to_column_store (table_to_list_of_lists.py)")
+    items, header = ColumnStore(), []
+    with open(os.path.expandvars(os.path.expanduser(input_arg)), 'r') as file:
+        rows = read_table_rows(file, file_type)
+        # The first row is only a header if there is at least one other row.
+        first_rows = list(islice(rows, 2))
+        if file_type == 'csv' and first_row_is_header and len(first_rows) > 1:
+            header = first_rows.pop(0)
+        items.extend(first_rows)
+        items.extend(rows)
+    return items, header, []
+
+
 def xlsx_to_list(file_name: str, sheet_number:int = 0, extract_formulae: bool = False, first_row_is_header: bool = True):
     import pandas as pd
     from openpyxl import load_workbook
@@ -178,17 +329,6 @@ def table_to_list(
             print(f"Error reading CSV-like input: {e}")
             return []
     def parse_csv_like(data:str, delimiter: str=" "):
-        import re
-        def split_columns(line):
-            # Define the regex pattern to match quoted strings and split by whitespace
-            # pattern = r"(?:'[^']*'|[^'\s]+)"
-            pattern = r"(?:\"[^\"]*\"|'[^']*'|[^'\s]+)"
-            
-            # Find all matches using the defined pattern
-            columns = re.findall(pattern, line)
-    
-            return columns
-
         lines = data.strip().split('\n')
         result = []
         
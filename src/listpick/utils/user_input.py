@@ -13,6 +13,11 @@ def restore_terminal_settings(tty_fd, old_settings):
     """ Restore the terminal to its previous state """
     termios.tcsetattr(tty_fd, termios.TCSADRAIN, old_settings)
 
+def input_pending(tty_fd) -> bool:
+    """ Return True if there is input waiting to be read from tty_fd. """
+    rlist, _, _ = select.select([tty_fd], [], [], 0)
+    return bool(rlist)
+
 def get_char(tty_fd, timeout: float = 0.2, secondary: bool = False) -> int:
     """ Get character from a tty_fd with a timeout. """
     rlist, _, _ = select.select([tty_fd], [], [], timeout)
@@ -12,16 +12,40 @@ from math import log10
 import subprocess
 import tempfile
 import os
-from typing import Tuple, Dict
+from typing import Optional, Tuple, Dict
 import logging
 import shlex
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from functools import lru_cache
 import time
+from listpick.utils.column_store import ColumnStore
+from listpick.utils.selection import Selections, CellSelections
 
 logger = logging.getLogger('picker_log')
 
 TEMP_DIR = "/tmp"
 
+# Maximum number of strings whose display width is cached
+DISPLAY_WIDTH_CACHE_SIZE = 65536
+# Maximum number of rows whose formatted strings are cached
+ROW_STRING_CACHE_SIZE = 1024
+
+
+def is_plain_ascii(text: str) -> bool:
+    """ Return True if every character in text is printable ASCII, in which case its display width is len(text). """
+    return text.isascii() and text.isprintable()
+
+@lru_cache(maxsize=DISPLAY_WIDTH_CACHE_SIZE)
+def wide_display_width(text: str) -> int:
+    """ Cached wcswidth for strings which are not plain ASCII. """
+    return wcswidth(text)
+
+def display_width(text: str) -> int:
+    """ Return wcswidth(text). Printable ASCII strings skip wcwidth and other strings are cached. """
+    if is_plain_ascii(text):
+        return len(text)
+    return wide_display_width(text)
+
 
 def clip_left(text, n):
     """
@@ -34,6 +58,8 @@ def clip_left(text, n):
     Returns:
     - str: The remaining part of the string after clipping.
     """
+    if is_plain_ascii(text):
+        return text[max(n, 0):]
     width = 0
     for i, char in enumerate(text):
         char_width = wcwidth(char)
@@ -52,6 +78,22 @@ def truncate_to_display_width(text: str, max_column_width: int, centre=False, un
 
     """
     # logger.debug("function: truncate_to_display_width (utils.py)")
+    if is_plain_ascii(text):
+        result = text[:max(max_column_width, 0)]
+        padding = max_column_width - len(result)
+    else:
+        result = truncate_wide_text(text, max_column_width)
+        padding = max_column_width - display_width(result)
+    # return result + ' ' * padding
+    if centre:
+        result = ' '*(padding//2) + result + ' '*(padding//2 + padding%2)
+    else:
+        result = result + ' ' * padding 
+    return result
+
+@lru_cache(maxsize=DISPLAY_WIDTH_CACHE_SIZE)
+def truncate_wide_text(text: str, max_column_width: int) -> str:
+    """ Return the longest prefix of text with a display width no greater than max_column_width. Zero-width characters are dropped. """
     result = ''
     width = 0
     for char in text:
@@ -62,13 +104,6 @@ def truncate_to_display_width(text: str, max_column_width: int, centre=False, un
             break
         result += char
         width += w
-    # Pad if it's shorter
-    padding = max_column_width - wcswidth(result)
-    # return result + ' ' * padding
-    if centre:
-        result = ' '*(padding//2) + result + ' '*(padding//2 + padding%2)
-    else:
-        result = result + ' ' * padding 
     return result
 
 def is_formula_cell(cell: str) -> bool:
@@ -102,19 +137,66 @@ def format_row(row: list[str], hidden_columns: list, column_widths: list[int], s
     return row_str
     # return row_str.strip()
 
+class RowStringCache:
+    """
+    Cache of the formatted strings of each displayed row, keyed by the row's index in items.
+
+    An entry is discarded when the cells of its row change. The whole cache is cleared when the layout
+        (column widths, hidden columns, separator, leftmost_char, etc.) changes. When the cache is full
+        the least recently used row is discarded.
+    """
+
+    def __init__(self, max_size: int = ROW_STRING_CACHE_SIZE):
+        self.max_size = max_size
+        self.layout = None
+        self.rows = OrderedDict()
+
+    def set_layout(self, layout: tuple) -> None:
+        if layout != self.layout:
+            self.layout = layout
+            self.rows.clear()
+
+    def get(self, index: int, row: list[str]) -> Optional[tuple]:
+        entry = self.rows.get(index)
+        if entry is None:
+            return None
+        cells, strings = entry
+        if cells != tuple(row):
+            del self.rows[index]
+            return None
+        self.rows.move_to_end(index)
+        return strings
+
+    def set(self, index: int, row: list[str], strings: tuple) -> None:
+        self.rows[index] = (tuple(row), strings)
+        self.rows.move_to_end(index)
+        if len(self.rows) > self.max_size:
+            self.rows.popitem(last=False)
+
+class HighlightSpanCache(RowStringCache):
+    """
+    Cache of the highlighted spans of each displayed row, keyed by the row's index in items.
+
+    Each entry holds the (start, end, colour) spans, in the full formatted row, for each highlight level. The layout
+        includes the version of the highlight rules so the whole cache is cleared when the highlights change.
+    """
+
 def get_column_widths(items: list[list[str]], header: list[str]=[], max_column_width:int=70, number_columns:bool=True, max_total_width=-1, separator = "    ", unicode_char_width: bool = True) -> list[int]:
     """ Calculate maximum width of each column with clipping. """
     if len(items) == 0 and len(header) == 0: return [0]
     elif len(items) == 0:
-        header_widths = [wcswidth(f"{i}. {str(h)}") if number_columns else wcswidth(str(h)) for i, h in enumerate(header)]
+        header_widths = [display_width(f"{i}. {str(h)}") if number_columns else display_width(str(h)) for i, h in enumerate(header)]
         col_widths =  [min(max_column_width, header_widths[i]) for i in range(len(header))]
         return col_widths
 
     assert len(items) > 0
-    widths = [max(wcswidth(str(row[i])) for row in items) for i in range(len(items[0]))]
+    if isinstance(items, ColumnStore):
+        widths = [items.column_width(i) for i in range(items.column_count)]
+    else:
+        widths = [max(display_width(str(row[i])) for row in items) for i in range(len(items[0]))]
     # widths = [max(len(str(row[i])) for row in items) for i in range(len(items[0]))]
     if header:
-        header_widths = [wcswidth(f"{i}. {str(h)}") if number_columns else wcswidth(str(h)) for i, h in enumerate(header)]
+        header_widths = [display_width(f"{i}. {str(h)}") if number_columns else display_width(str(h)) for i, h in enumerate(header)]
         col_widths =  [min(max_column_width, max(widths[i], header_widths[i])) for i in range(len(header))]
         # actual_max_widths = [max(header_widths[i], widths[i]) for i in range(len(widths))]
         #
@@ -203,18 +285,30 @@ def convert_percentage_to_ascii_bar(p:int, chars:int=8) -> str:
 def get_selected_indices(selections: dict[int, bool]) -> list[int]:
     """ Return a list of indices which are True in the selections dictionary. """
 
+    if isinstance(selections, Selections):
+        return selections.selected_indices()
     # selected_indices = [items[i] for i, selected in selections.values() if selected]
     selected_indices = [i for i, selected in selections.items() if selected]
     return selected_indices
 
+def get_selection_count(selections: dict) -> int:
+    """ Return the number of rows (or cells) which are selected. """
+    if isinstance(selections, (Selections, CellSelections)):
+        return selections.count()
+    return sum(selections.values())
+
 def get_selected_cells(cell_selections: Dict[Tuple[int, int], bool]) -> list[Tuple[int, int]]:
     """ {(0,1): True, (9,1): True} """
+    if isinstance(cell_selections, CellSelections):
+        return cell_selections.selected_cells()
     selected_cells = [i for i, selected in cell_selections.items() if selected]
     return selected_cells
 
 def get_selected_cells_by_row(cell_selections: dict[tuple[int, int], bool]) -> dict[int, list[int]]:
     """ {0: [1,2], 9: [1] }"""
     
+    if isinstance(cell_selections, CellSelections):
+        return cell_selections.selected_cells_by_row()
     d = defaultdict(list)
     for (row, col), selected in cell_selections.items():
         if selected:
@@ -223,7 +317,7 @@ def get_selected_cells_by_row(cell_selections: dict[tuple[int, int], bool]) -> d
 
 def get_selected_values(items: list[list[str]], selections: dict[int, bool]) -> list[list[str]]:
     """ Return a list of rows based on wich are True in the selections dictionary. """
-    selected_values = [items[i] for i, selected in selections.items() if selected]
+    selected_values = [items[i] for i in get_selected_indices(selections)]
     return selected_values
 
 def format_size(n:int) -> str:
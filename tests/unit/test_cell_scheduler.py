@@ -0,0 +1,139 @@
+"""
+Unit tests for cell_scheduler.py module.
+
+Tests the order in which cells are scheduled and that priorities are updated in place.
+"""
+import threading
+from listpick.utils.cell_scheduler import CellScheduler
+
+
+def cells(rows, cols=(1, 2)):
+    return [(row, col) for row in range(rows) for col in cols]
+
+
+def drain(scheduler, generation):
+    """ Return the cells in the order they are scheduled. """
+    order = []
+    while (task := scheduler.get(generation)) is not None:
+        order.append(task[1])
+    return order
+
+
+class TestCellScheduler:
+    """Test the CellScheduler class."""
+
+    def test_order(self):
+        """Test that visible rows come first, then near rows, then the rest by column rank and row."""
+        scheduler = CellScheduler()
+        scheduler.set_viewport([5, 4], [6])
+        generation = scheduler.start(cells(8), column_ranks={1: 1, 2: 0})
+        assert drain(scheduler, generation)[:8] == [(5, 2), (4, 2), (5, 1), (4, 1), (6, 2), (6, 1), (0, 2), (1, 2)]
+
+    def test_reprioritise_in_place(self):
+        """Test that moving the viewport repeatedly keeps one live entry per cell and a bounded heap."""
+        scheduler = CellScheduler()
+        generation = scheduler.start(cells(100))
+        for k in range(500):
+            scheduler.set_viewport(range(k % 90, k % 90 + 10), [])
+        assert len(scheduler) == 200
+        assert len(scheduler.heap) <= 2*len(scheduler.entries) + 64
+        scheduler.set_viewport([50], [])
+        assert scheduler.get(generation)[1] == (50, 1)
+        assert sorted(drain(scheduler, generation)) == sorted(set(cells(100)) - {(50, 1)})
+
+    def test_filtered_rows_are_set_aside(self):
+        """Test that the cells of inactive rows wait until their rows are active again."""
+        scheduler = CellScheduler()
+        generation = scheduler.start(cells(4))
+        scheduler.set_active_rows([1])
+        assert [scheduler.get(generation)[1] for _ in range(2)] == [(1, 1), (1, 2)]
+        assert len(scheduler) == 6
+
+        result = []
+        worker = threading.Thread(target=lambda: result.extend(drain(scheduler, generation)))
+        worker.start()
+        worker.join(0.1)
+        assert worker.is_alive() and result == []
+        scheduler.set_active_rows(None)
+        worker.join(1)
+        assert sorted(result) == sorted(set(cells(4)) - {(1, 1), (1, 2)})
+
+    def test_idle_while_only_filtered_rows_are_left(self):
+        """Test that the idle event is set while only inactive rows are left and cleared when they are shown."""
+        scheduler, idle = CellScheduler(), threading.Event()
+        generation = scheduler.start(cells(3), idle=idle)
+        scheduler.set_active_rows([0])
+        assert scheduler.active() == 2 and len(scheduler) == 6
+
+        result = []
+        worker = threading.Thread(target=lambda: result.extend(drain(scheduler, generation)))
+        worker.start()
+        assert idle.wait(1)
+        assert result == [] and scheduler.active() == 0
+
+        with scheduler.condition:
+            # The worker can't take the restored cells until the condition is released
+            scheduler.set_active_rows([0, 2])
+            assert not idle.is_set() and scheduler.active() == 2
+        assert idle.wait(1)
+        scheduler.set_active_rows(None)
+        worker.join(1)
+        assert not worker.is_alive()
+        assert sorted(result) == cells(3)
+
+    def test_new_generation(self):
+        """Test that workers of an earlier generation stop when a new one starts."""
+        scheduler = CellScheduler()
+        old = scheduler.start(cells(2))
+        new = scheduler.start(cells(3))
+        assert scheduler.get(old) is None
+        assert len(drain(scheduler, new)) == 6
+
+    def test_finish_ignores_earlier_generations(self):
+        """Test that workers of an earlier generation can't set the event of the generation which replaced it."""
+        scheduler, getting_data = CellScheduler(), threading.Event()
+        old = scheduler.start(cells(2), idle=getting_data)
+        getting_data.set()
+        new = scheduler.start(cells(3), idle=getting_data)
+        assert not getting_data.is_set()
+        assert scheduler.get(old) is None
+        scheduler.finish(old, getting_data)
+        assert not getting_data.is_set()
+        drain(scheduler, new)
+        scheduler.finish(new, getting_data)
+        assert getting_data.is_set()
+
+    def test_requeue(self):
+        """Test that cells which were taken are scheduled again, unless a later generation has started."""
+        scheduler = CellScheduler()
+        old = scheduler.start(cells(2, cols=(1,)))
+        taken = [scheduler.get(old)[1] for _ in range(2)]
+        scheduler.set_active_rows([1])
+        scheduler.requeue(old, taken)
+        assert scheduler.active() == 1 and len(scheduler) == 2
+        scheduler.set_active_rows(None)
+        new = scheduler.start(cells(1, cols=(1,)))
+        scheduler.requeue(old, taken)
+        assert drain(scheduler, new) == [(0, 1)]
+
+    def test_take_batch(self):
+        """Test that a batch is taken from the same column and tier."""
+        scheduler = CellScheduler()
+        scheduler.set_viewport([7, 3], [])
+        generation = scheduler.start(cells(10))
+        priority, cell = scheduler.get(generation)
+        assert scheduler.take_batch(priority, cell, 5) == [(7, 1), (3, 1)]
+        priority, cell = scheduler.get(generation)
+        assert cell == (7, 2)
+        scheduler.take_batch(priority, cell, 2)
+        priority, cell = scheduler.get(generation)
+        assert scheduler.take_batch(priority, cell, 3) == [(0, 1), (1, 1), (2, 1)]
+
+    def test_get_many(self):
+        """Test that get_many returns the next cells in order."""
+        scheduler = CellScheduler()
+        scheduler.set_viewport([2], [])
+        generation = scheduler.start(cells(3))
+        assert [cell for _, cell in scheduler.get_many(generation, 3)] == [(2, 1), (2, 2), (0, 1)]
+        assert len(scheduler.get_many(generation, 10)) == 3
+        assert scheduler.get_many(generation, 10) == []
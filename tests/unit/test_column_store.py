@@ -0,0 +1,138 @@
+"""
+Unit tests for column_store.py module.
+
+Tests for ColumnStore, RowView and their use by filtering, sorting and column widths.
+"""
+import pytest
+from listpick.utils import column_store
+from listpick.utils.column_store import ColumnStore, RowView
+from listpick.utils.filtering import filter_items, FilterState
+from listpick.utils.sorting import sort_items
+from listpick.utils.utils import get_column_widths
+
+
+@pytest.fixture
+def sample_rows():
+    """Sample rows for column store tests."""
+    return [
+        ["Alice", "30", "Engineer"],
+        ["Bob", "25", "Designer"],
+        ["Charlie", "35", "Engineer"],
+        ["Diana", "28", "Developer"],
+    ]
+
+
+@pytest.fixture
+def store(sample_rows):
+    """A ColumnStore built from the sample rows."""
+    return ColumnStore.from_rows(sample_rows)
+
+
+class TestColumnStore:
+    """Test the ColumnStore and RowView classes."""
+
+    def test_behaves_like_list_of_lists(self, store, sample_rows):
+        """Test indexing, length and iteration."""
+        assert len(store) == 4
+        assert store[1][0] == "Bob"
+        assert store[-1][-1] == "Developer"
+        assert [list(row) for row in store] == sample_rows
+        assert store == sample_rows
+        assert store[0] == ["Alice", "30", "Engineer"]
+
+    def test_values_are_dictionary_encoded(self, store):
+        """Test that repeated values are only stored once."""
+        assert store.values(2) == ["Engineer", "Designer", "Developer"]
+        assert list(store.codes(2)) == [0, 1, 0, 2]
+
+    def test_cells_are_converted_to_strings(self):
+        """Test that non-string cells are stored as strings."""
+        store = ColumnStore.from_rows([[1, None], [2.5]])
+        assert store.to_lists() == [["1", ""], ["2.5", ""]]
+
+    def test_set_cell(self, store):
+        """Test assigning to a cell through a RowView."""
+        store[0][2] = "Manager"
+        assert store[0][2] == "Manager"
+        assert store.column(2) == ["Manager", "Designer", "Engineer", "Developer"]
+
+    def test_row_view_slicing(self, store):
+        """Test that slicing a row returns a list."""
+        row = store[0]
+        assert isinstance(row, RowView)
+        assert row[:2] == ["Alice", "30"]
+        assert row[:1] + [""] + row[1:] == ["Alice", "", "30", "Engineer"]
+
+    def test_index_out_of_range(self, store):
+        """Test that out of range indices raise IndexError."""
+        with pytest.raises(IndexError):
+            store[4]
+        with pytest.raises(IndexError):
+            store[0][3]
+
+    def test_append_pads_rows(self, store):
+        """Test appending short and long rows."""
+        store.append(["Eve"])
+        assert store[4] == ["Eve", "", ""]
+        store.append(["Frank", "40", "Chef", "extra"])
+        assert store.column_count == 4
+        assert store[0] == ["Alice", "30", "Engineer", ""]
+
+    def test_row_append_raises(self, store):
+        """Test that appending to a single row raises rather than adding a column to every row."""
+        with pytest.raises(TypeError):
+            store[0].append("x")
+        assert store.column_count == 3 and store[1] == ["Bob", "25", "Designer"]
+
+    def test_column_width(self, store):
+        """Test the width of the widest value in use."""
+        assert store.column_width(0) == len("Charlie")
+        store[2][0] = "Cy"
+        assert store.column_width(0) == len("Diana")
+
+    def test_column_width_is_cached(self, store, monkeypatch):
+        """Test that the width is kept up to date as rows are appended and set rather than found from every row again."""
+        assert store.column_width(0) == len("Charlie")
+        monkeypatch.setattr(column_store, "set", lambda codes: pytest.fail("the codes were scanned"), raising=False)
+        store.append(["Elizabeth", "40", "Manager"])
+        assert store.column_width(0) == len("Elizabeth")
+        store[1][0] = "Bartholomew"
+        assert store.column_width(0) == len("Bartholomew")
+        store[2][0] = "Cy"
+        assert store.column_width(0) == len("Bartholomew")
+        monkeypatch.undo()
+        store[1][0] = "Bob"
+        assert store.column_width(0) == len("Elizabeth")
+
+
+class TestColumnStoreOperations:
+    """Test filtering, sorting and width calculation on a ColumnStore."""
+
+    def test_filter_matches_list_of_lists(self, store, sample_rows):
+        """Test that filtering a ColumnStore gives the same rows as filtering a list."""
+        for query in ["eng", "--2 eng", "--1 3 a", "--v eng", "--5 x", ""]:
+            expected = [i for i, _ in filter_items(sample_rows, [], query)]
+            assert [i for i, _ in filter_items(store, [], query)] == expected
+
+    def test_incremental_filter(self, store):
+        """Test incremental filtering on a ColumnStore."""
+        filter_state = FilterState()
+        filter_items(store, [], "e", filter_state=filter_state)
+        result = filter_items(store, [], "eng", filter_state=filter_state)
+        assert [i for i, _ in result] == [0, 2]
+
+    def test_sort_matches_list_of_lists(self, store, sample_rows):
+        """Test that sorting a ColumnStore gives the same order as sorting a list."""
+        for sort_method in range(8):
+            for sort_column in range(3):
+                for sort_reverse in [False, True]:
+                    expected = list(enumerate(sample_rows))
+                    sort_items(expected, sort_method=sort_method, sort_column=sort_column, sort_reverse=sort_reverse)
+                    result = list(enumerate(store))
+                    sort_items(result, sort_method=sort_method, sort_column=sort_column, sort_reverse=sort_reverse)
+                    assert [i for i, _ in result] == [i for i, _ in expected]
+
+    def test_get_column_widths(self, store, sample_rows):
+        """Test that column widths are the same for a ColumnStore and a list."""
+        header = ["name", "age", "job"]
+        assert get_column_widths(store, header=header) == get_column_widths(sample_rows, header=header)
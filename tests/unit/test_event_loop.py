@@ -0,0 +1,103 @@
+"""
+Unit tests for event_loop.py module.
+
+Tests that a Wakeup wakes a waiting select() from another thread and that it can be drained.
+"""
+import os
+import signal
+import threading
+import time
+import pytest
+from listpick.utils.event_loop import Wakeup, NotifyingEvent, watch_resize, unwatch_resize
+
+
+class TestWakeup:
+    """Test the Wakeup and NotifyingEvent classes."""
+
+    def test_notify_from_thread(self):
+        """Test that wait() returns as soon as another thread notifies."""
+        wakeup = Wakeup()
+        threading.Timer(0.05, wakeup.notify).start()
+        start = time.time()
+        assert wakeup.wait([], timeout=5) == [wakeup.fileno()]
+        assert time.time() - start < 1
+        wakeup.drain()
+        assert wakeup.wait([], timeout=0) == []
+
+    def test_fd_readable(self):
+        """Test that wait() returns the fds which are readable."""
+        wakeup = Wakeup()
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b"x")
+        assert wakeup.wait([read_fd], timeout=1) == [read_fd]
+        os.close(read_fd)
+        os.close(write_fd)
+
+    def test_repeated_notify_writes_once(self):
+        """Test that notifications are coalesced until the wakeup is drained."""
+        wakeup = Wakeup()
+        for _ in range(100000):
+            wakeup.notify()
+        assert os.read(wakeup.fileno(), 4096) == b"\0"
+        wakeup.drain()
+        wakeup.notify()
+        assert wakeup.wait([], timeout=0) == [wakeup.fileno()]
+
+    def test_notify_during_drain_is_not_lost(self, monkeypatch):
+        """Test that a notify() from another thread while drain() is reading the pipe doesn't stop later wakeups."""
+        from listpick.utils import event_loop
+        wakeup = Wakeup()
+        wakeup.notify()
+        read = os.read
+        calls = []
+
+        def read_and_notify(fd, n):
+            if not calls:
+                calls.append(fd)
+                wakeup.notify()
+            return read(fd, n)
+
+        monkeypatch.setattr(event_loop.os, "read", read_and_notify)
+        wakeup.drain()
+        monkeypatch.setattr(event_loop.os, "read", read)
+        assert not wakeup.pending or wakeup.wait([], timeout=0) == [wakeup.fileno()]
+        wakeup.drain()
+        wakeup.notify()
+        assert wakeup.wait([], timeout=0) == [wakeup.fileno()]
+
+    def test_notifying_event(self):
+        """Test that setting a NotifyingEvent notifies its wakeup."""
+        wakeup = Wakeup()
+        event = NotifyingEvent(wakeup)
+        assert wakeup.wait([], timeout=0) == []
+        event.set()
+        assert event.is_set()
+        assert wakeup.wait([], timeout=0) == [wakeup.fileno()]
+
+    def test_close(self):
+        """Test that a closed wakeup ignores notifications."""
+        wakeup = Wakeup()
+        wakeup.close()
+        wakeup.notify()
+        assert wakeup.wait([], timeout=0) == []
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGWINCH"), reason="needs SIGWINCH")
+class TestWatchResize:
+    """Test the SIGWINCH handler installed by watch_resize."""
+
+    def test_previous_handler_is_restored(self):
+        """Test that the handler which was replaced is restored once the last Wakeup stops watching."""
+        previous = lambda signum, frame: None
+        original = signal.signal(signal.SIGWINCH, previous)
+        try:
+            outer, inner = Wakeup(), Wakeup()
+            assert watch_resize(outer) and watch_resize(inner)
+            os.kill(os.getpid(), signal.SIGWINCH)
+            assert inner.wait([], timeout=1) == [inner.fileno()] and inner.resized
+            unwatch_resize(inner)
+            assert signal.getsignal(signal.SIGWINCH) is not previous
+            unwatch_resize(outer)
+            assert signal.getsignal(signal.SIGWINCH) is previous
+        finally:
+            signal.signal(signal.SIGWINCH, original)
@@ -4,7 +4,8 @@ Unit tests for filtering.py module.
 Tests for filtering indexed items based on query strings with column selectors and flags.
 """
 import pytest
-from listpick.utils.filtering import filter_items
+from listpick.utils.filtering import filter_items, FilterState
+from listpick.utils.column_store import ColumnStore
 
 
 class TestFilterItems:
@@ -147,3 +148,94 @@ class TestFilterItems:
         # Should match only exact word "Eve"
         assert len(result) == 1
         assert result[0][1][0] == "Eve"
+
+    def test_filter_invert(self, sample_items, sample_indexed_items):
+        """Test that --v returns the rows which do not match."""
+        result = filter_items(sample_items, sample_indexed_items, "--v alice")
+        assert len(result) == 4
+        assert all(row[0] != "Alice" for _, row in result)
+
+    def test_filter_invert_without_patterns(self, sample_items, sample_indexed_items):
+        """Test that --v on its own keeps every row, including in a ColumnStore."""
+        assert filter_items(sample_items, sample_indexed_items, "--v") == sample_indexed_items
+        store = ColumnStore(sample_items)
+        assert [i for i, _ in filter_items(store, list(enumerate(store)), "--v")] == list(range(len(sample_items)))
+
+    def test_filter_case_sensitive_flag(self, sample_items, sample_indexed_items):
+        """Test that --i makes the filter case-sensitive."""
+        assert filter_items(sample_items, sample_indexed_items, "--i alice") == [(0, sample_items[0])]
+        assert filter_items(sample_items, sample_indexed_items, "--i --2 engineer") == []
+
+
+class TestIncrementalFilter:
+    """Test filter_items with a FilterState."""
+
+    @pytest.fixture
+    def sample_items(self):
+        """Sample data for incremental filtering tests."""
+        return [
+            ["Alice", "30", "Engineer"],
+            ["Bob", "25", "Designer"],
+            ["Charlie", "35", "Manager"],
+            ["Diana", "28", "Developer"],
+            ["Alicia", "32", "Analyst"],
+        ]
+
+    def test_extended_query_only_checks_previous_matches(self, sample_items):
+        """Test that an extended query is applied to the previous matches."""
+        filter_state = FilterState()
+        filter_items(sample_items, [], "ali", filter_state=filter_state)
+        assert filter_state.matched_indices == [0, 4]
+        # Changing a row that did not match shows that it is not rechecked
+        sample_items[1][0] = "Alice"
+        result = filter_items(sample_items, [], "alic", filter_state=filter_state)
+        assert [i for i, _ in result] == [0, 4]
+
+    def test_extra_token_narrows(self, sample_items):
+        """Test that adding a token narrows the previous query."""
+        filter_state = FilterState()
+        filter_items(sample_items, [], "ali", filter_state=filter_state)
+        result = filter_items(sample_items, [], "ali --2 eng", filter_state=filter_state)
+        assert [i for i, _ in result] == [0]
+
+    def test_widened_query_scans_all_rows(self, sample_items):
+        """Test that a widened query falls back to a full scan."""
+        filter_state = FilterState()
+        filter_items(sample_items, [], "alic", filter_state=filter_state)
+        result = filter_items(sample_items, [], "a", filter_state=filter_state)
+        assert [i for i, _ in result] == [0, 2, 3, 4]
+
+    def test_regex_extension_scans_all_rows(self, sample_items):
+        """Test that extending a regex does not assume it narrows."""
+        filter_state = FilterState()
+        filter_items(sample_items, [], "bob", filter_state=filter_state)
+        result = filter_items(sample_items, [], "bob|", filter_state=filter_state)
+        assert len(result) == 5
+
+    def test_invalidate_forces_full_scan(self, sample_items):
+        """Test that invalidating the state rechecks every row."""
+        filter_state = FilterState()
+        filter_items(sample_items, [], "ali", filter_state=filter_state)
+        sample_items[1][0] = "Alice"
+        filter_state.invalidate()
+        result = filter_items(sample_items, [], "alic", filter_state=filter_state)
+        assert [i for i, _ in result] == [0, 1, 4]
+
+    def test_new_items_list_scans_all_rows(self, sample_items):
+        """Test that the previous result is not used for a different items list."""
+        filter_state = FilterState()
+        filter_items(sample_items, [], "ali", filter_state=filter_state)
+        new_items = [row[:] for row in sample_items] + [["Alina", "40", "Chef"]]
+        result = filter_items(new_items, [], "alin", filter_state=filter_state)
+        assert [i for i, _ in result] == [5]
+
+    def test_appended_rows_extend_previous_matches(self, sample_items):
+        """Test that only appended rows are checked and that they are added to the previous matches."""
+        filter_state = FilterState()
+        filter_items(sample_items, [], "ali", filter_state=filter_state)
+        sample_items.extend([["Alina", "40", "Chef"], ["Zed", "41", "Pilot"]])
+        result = filter_items(sample_items, [], "ali", filter_state=filter_state, appended_from=5)
+        assert [i for i, _ in result] == [5]
+        assert filter_state.matched_indices == [0, 4, 5]
+        result = filter_items(sample_items, [], "alin", filter_state=filter_state)
+        assert [i for i, _ in result] == [5]
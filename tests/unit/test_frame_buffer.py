@@ -0,0 +1,119 @@
+"""
+Unit tests for frame_buffer.py module.
+
+Tests that FrameBuffer only redraws the lines which change between frames.
+"""
+import curses
+import pytest
+from listpick.ui.frame_buffer import FrameBuffer
+
+
+class FakeWindow:
+    """A minimal stand-in for a curses window which records the calls made to it."""
+
+    def __init__(self, h=10, w=20):
+        self.h, self.w = h, w
+        self.calls = []
+
+    def getmaxyx(self):
+        return self.h, self.w
+
+    def addstr(self, *args):
+        self.calls.append(("addstr",) + args)
+
+    def erase(self):
+        self.calls.append(("erase",))
+
+    def clear(self):
+        self.calls.append(("clear",))
+
+    def move(self, y, x):
+        self.calls.append(("move", y, x))
+
+    def clrtoeol(self):
+        self.calls.append(("clrtoeol",))
+
+    def touchwin(self):
+        pass
+
+
+@pytest.fixture
+def window():
+    return FakeWindow()
+
+
+@pytest.fixture
+def frame_buffer(window):
+    return FrameBuffer(window)
+
+
+def draw(frame_buffer, lines):
+    frame_buffer.begin_frame()
+    for y, text in lines.items():
+        frame_buffer.addstr(y, 0, text, 0)
+    frame_buffer.end_frame()
+
+
+class TestFrameBuffer:
+    """Test the FrameBuffer class."""
+
+    def test_first_frame_is_drawn_in_full(self, frame_buffer, window):
+        """Test that the first frame erases the window and draws every line."""
+        draw(frame_buffer, {0: "a", 1: "b"})
+        assert window.calls == [("erase",), ("addstr", 0, 0, "a", 0), ("addstr", 1, 0, "b", 0)]
+
+    def test_only_changed_lines_are_redrawn(self, frame_buffer, window):
+        """Test that moving the cursor only redraws the lines which changed."""
+        draw(frame_buffer, {0: "> a", 1: "  b", 2: "  c"})
+        window.calls = []
+        draw(frame_buffer, {0: "  a", 1: "> b", 2: "  c"})
+        assert window.calls == [
+            ("move", 0, 0), ("clrtoeol",), ("addstr", 0, 0, "  a", 0),
+            ("move", 1, 0), ("clrtoeol",), ("addstr", 1, 0, "> b", 0),
+        ]
+
+    def test_unchanged_frame_draws_nothing(self, frame_buffer, window):
+        """Test that drawing the same frame twice makes no changes."""
+        draw(frame_buffer, {0: "a", 1: "b"})
+        window.calls = []
+        draw(frame_buffer, {0: "a", 1: "b"})
+        assert window.calls == []
+
+    def test_removed_lines_are_cleared(self, frame_buffer, window):
+        """Test that lines which are no longer drawn are cleared."""
+        draw(frame_buffer, {0: "a", 1: "b"})
+        window.calls = []
+        draw(frame_buffer, {0: "a"})
+        assert window.calls == [("move", 1, 0), ("clrtoeol",)]
+
+    def test_writes_outside_of_a_frame_damage_the_line(self, frame_buffer, window):
+        """Test that a line drawn over between frames is redrawn."""
+        draw(frame_buffer, {0: "a", 1: "b"})
+        frame_buffer.addstr(1, 0, "input")
+        window.calls = []
+        draw(frame_buffer, {0: "a", 1: "b"})
+        assert window.calls == [("move", 1, 0), ("clrtoeol",), ("addstr", 1, 0, "b", 0)]
+
+    def test_clear_causes_full_redraw(self, frame_buffer, window):
+        """Test that clearing the window outside of a frame redraws the next frame in full."""
+        draw(frame_buffer, {0: "a"})
+        frame_buffer.clear()
+        window.calls = []
+        draw(frame_buffer, {0: "a"})
+        assert window.calls == [("erase",), ("addstr", 0, 0, "a", 0)]
+
+    def test_wrapping_string_causes_full_redraw(self, frame_buffer, window):
+        """Test that a string which wraps onto the next line is drawn in full."""
+        draw(frame_buffer, {0: "a"})
+        window.calls = []
+        draw(frame_buffer, {0: "x"*25})
+        assert window.calls[0] == ("erase",)
+
+    def test_out_of_bounds_raises(self, frame_buffer):
+        """Test that writing outside of the window raises curses.error as the window would."""
+        frame_buffer.begin_frame()
+        with pytest.raises(curses.error):
+            frame_buffer.addstr(10, 0, "a")
+        with pytest.raises(curses.error):
+            frame_buffer.addstr(9, 0, "x"*20)
+        frame_buffer.end_frame()
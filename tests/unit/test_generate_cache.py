@@ -0,0 +1,114 @@
+"""
+Unit tests for generate_cache.py module.
+
+Tests that cached cells are only used while their file is unchanged and that the cache is bounded.
+"""
+import os
+import pytest
+from listpick.utils.generate_cache import ResultCache, cache_key, shared_cache
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"file{i}.txt"
+        path.write_text(str(i))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "cells.sqlite3")
+
+
+def store(cache_path, files, command="wc -c {}"):
+    """ Store a cell for each of files in a new cache. """
+    cache = ResultCache(cache_path)
+    for i, file in enumerate(files):
+        cache.put(command, file, f"value{i}")
+    cache.close()
+
+
+class TestResultCache:
+    """Test the ResultCache class."""
+
+    def test_lookup(self, cache_path, files):
+        """Test that stored cells are found by a new cache for the same command."""
+        store(cache_path, files)
+        cache = ResultCache(cache_path)
+        assert cache.lookup("wc -c {}", files) == {0: "value0", 1: "value1", 2: "value2"}
+        assert cache.lookup("du {}", files) == {}
+
+    def test_changed_file_is_stale(self, cache_path, files):
+        """Test that the cell of a file whose mtime or size has changed is not used."""
+        store(cache_path, files)
+        with open(files[1], "a") as f:
+            f.write("more")
+        os.utime(files[2], ns=(0, 0))
+        assert ResultCache(cache_path).lookup("wc -c {}", files) == {0: "value0"}
+
+    def test_missing_file_is_not_cached(self, cache_path, files):
+        """Test that a cell is not stored if its file doesn't exist."""
+        store(cache_path, [files[0] + ".missing"])
+        assert ResultCache(cache_path).lookup("wc -c {}", [files[0] + ".missing"]) == {}
+
+    def test_evict(self, cache_path, files):
+        """Test that the least recently used cells are evicted."""
+        store(cache_path, files)
+        cache = ResultCache(cache_path, max_entries=2)
+        cache.lookup("wc -c {}", files[1:])
+        cache.evict()
+        assert cache.lookup("wc -c {}", files) == {1: "value1", 2: "value2"}
+
+    def test_clear(self, cache_path, files):
+        """Test that clear removes every cell."""
+        store(cache_path, files)
+        cache = ResultCache(cache_path)
+        cache.clear()
+        assert cache.lookup("wc -c {}", files) == {}
+
+    def test_unusable_path(self, tmp_path, files):
+        """Test that a cache which can't be opened is disabled rather than raising."""
+        (tmp_path / "not_a_dir").write_text("")
+        cache = ResultCache(str(tmp_path / "not_a_dir" / "cells.sqlite3"))
+        cache.put("wc -c {}", files[0], "1")
+        assert cache.lookup("wc -c {}", files) == {}
+
+
+class TestSharedCache:
+    """Test the shared_cache and cache_key functions."""
+
+    def test_one_connection_per_path(self, cache_path, files):
+        """Test that every refresh gets the same cache and that a disabled cache is opened again."""
+        cache = shared_cache(cache_path)
+        assert shared_cache(cache_path) is cache
+        cache.close()
+        reopened = shared_cache(cache_path)
+        assert reopened is not cache and reopened.connection is not None
+        reopened.close()
+
+    def test_environment_is_part_of_the_key(self, cache_path, files):
+        """Test that cells cached with one environment aren't used with another."""
+        assert cache_key("wc -c {}") == cache_key("wc -c {}", {}) == "wc -c {}"
+        store(cache_path, files, command=cache_key("wc -c {}", {"cwd": "/a"}))
+        cache = ResultCache(cache_path)
+        assert len(cache.lookup(cache_key("wc -c {}", {"cwd": "/a"}), files)) == 3
+        assert cache.lookup(cache_key("wc -c {}", {"cwd": "/b"}), files) == {}
+        assert cache.lookup("wc -c {}", files) == {}
+
+    def test_file_changed_between_refreshes(self, cache_path, files):
+        """Test that a file which changes between two refreshes with the shared cache is stat'ed again."""
+        cache = shared_cache(cache_path)
+        assert cache.lookup("wc -c {}", files[:1]) == {}
+        cache.put("wc -c {}", files[0], "1")
+        cache.flush()
+        assert cache.lookup("wc -c {}", files[:1]) == {0: "1"}
+        with open(files[0], "a") as f:
+            f.write("more")
+        assert shared_cache(cache_path).lookup("wc -c {}", files[:1]) == {}
+        cache.put("wc -c {}", files[0], "5")
+        cache.flush()
+        assert shared_cache(cache_path).lookup("wc -c {}", files[:1]) == {0: "5"}
+        cache.close()
@@ -0,0 +1,96 @@
+"""
+Unit tests for generate_data_multithreaded.py module.
+
+Tests for running batched commands and splitting their output into cells.
+"""
+import os
+import threading
+import pytest
+from listpick.utils.generate_cache import ResultCache
+from listpick.utils.cell_scheduler import CellScheduler
+from listpick.utils.generate_data_multithreaded import (
+    BatchedColumn,
+    command_to_batch_func,
+    command_to_func,
+    generate_picker_data,
+    replace_batch_braces,
+    single_file_command,
+    split_batch_output,
+)
+
+
+FILES = ["a b", "c", "d'e", "f"]
+
+
+def generate(column_functions, batched_columns=None, visible_rows_indices=[], **kwargs):
+    """ Generate the data for FILES and wait for it to finish. """
+    items, header = [], []
+    state = {
+        "thread_stop_event": threading.Event(),
+        "data_generation_queue": CellScheduler(),
+        "generate_data_for_hidden_columns": True,
+        "hidden_columns": [],
+        "threads": [],
+    }
+    generate_picker_data(FILES, column_functions, ["file"], items, header, visible_rows_indices, threading.Event(), state, batched_columns=batched_columns, **kwargs)
+    for thread in state["threads"]:
+        thread.join(5)
+    state["thread_stop_event"].set()
+    return items
+
+
+class TestBatchCommands:
+    """Test the functions for building batched commands."""
+
+    def test_replace_batch_braces(self):
+        """Test that {...} is replaced by the quoted files and {{...}} is kept."""
+        assert replace_batch_braces("ls {...} | awk '{{print $1}}'", ["a b", "c"]) == "ls 'a b' c | awk '{{print $1}}'"
+
+    def test_single_file_command(self):
+        """Test that a batched command can be run for a single file."""
+        assert single_file_command("stat {...} {{...}}") == "stat {} {{...}}"
+
+    def test_split_by_lines(self):
+        """Test splitting the output into a number of lines per file."""
+        assert split_batch_output("1\n2\n3\n4\n", 2, lines_per_file=2) == ["1\n2", "3\n4"]
+        with pytest.raises(ValueError):
+            split_batch_output("1\n2\n3\n", 2)
+
+    def test_split_by_delimiter(self):
+        """Test splitting the output by a delimiter."""
+        assert split_batch_output("1\n2--3--", 2, delimiter="--") == ["1\n2", "3"]
+
+
+class TestGenerateBatched:
+    """Test generate_picker_data with batched columns."""
+
+    def test_matches_single_file_commands(self):
+        """Test that batched columns give the same cells as running the command for each file."""
+        command = "printf '%s\\n' {...} | tr a-z A-Z"
+        expected = generate([command_to_func(single_file_command(command))])
+        batched = {0: BatchedColumn(command_to_batch_func(command), max_size=3)}
+        assert generate([command_to_func(single_file_command(command))], batched, visible_rows_indices=[3]) == expected
+        assert expected[0] == ["a b", "A B"]
+
+    def test_falls_back_when_output_does_not_split(self):
+        """Test that each file is run separately if the batched output has the wrong number of lines."""
+        batched = {0: BatchedColumn(command_to_batch_func("echo {...}"))}
+        items = generate([command_to_func("echo {}")], batched)
+        assert [row[1] for row in items] == FILES
+        assert not batched[0].enabled
+
+    def test_cached_cells_are_not_generated(self, tmp_path):
+        """Test that cells found in the cache are filled without running the command."""
+        for file in FILES:
+            (tmp_path / file).write_text(file)
+        cwd = os.getcwd()
+        os.chdir(tmp_path)
+        try:
+            cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+            cache.put("echo {}", FILES[0], "cached")
+            cache.flush()
+            items = generate([command_to_func("echo {}")], cache=cache, cache_keys=["echo {}"])
+        finally:
+            os.chdir(cwd)
+        assert [row[1] for row in items] == ["cached"] + FILES[1:]
+        assert ResultCache(str(tmp_path / "cache.sqlite3")).lookup("echo {}", [os.path.join(tmp_path, file) for file in FILES]) == {0: "cached", 1: "c", 2: "d'e", 3: "f"}
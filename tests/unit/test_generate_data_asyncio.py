@@ -0,0 +1,103 @@
+"""
+Unit tests for generate_data_asyncio.py module.
+
+Tests that the asyncio engine fills the same cells as the threaded engine and that commands which time out are killed.
+"""
+import asyncio
+import os
+import threading
+import time
+import pytest
+from listpick.utils.cell_scheduler import CellScheduler
+from listpick.utils.generate_data_asyncio import AsyncioGenerator, generate_picker_data_asyncio, run_command
+from listpick.utils.generate_data_multithreaded import schedule_cells
+
+
+FILES = ["a b", "c", "d'e", "f"]
+OPTIONS = {"engine": "asyncio", "concurrency": 8, "timeout": 5, "max_size": 2, "delimiter": "", "lines_per_file": 1}
+
+
+def generate(commands, **options):
+    """ Generate the data for FILES with the asyncio engine and wait for it to finish. """
+    items, header, getting_data = [], [], threading.Event()
+    state = {
+        "thread_stop_event": threading.Event(),
+        "data_generation_queue": CellScheduler(),
+        "generate_data_for_hidden_columns": True,
+        "hidden_columns": [],
+        "threads": [],
+    }
+    generate_picker_data_asyncio(FILES, commands, ["file"], items, header, getting_data, state, {**OPTIONS, **options})
+    assert getting_data.wait(10)
+    return items
+
+
+def is_running(pid):
+    """ Return True if pid is a running (i.e., not a zombie) process. """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+class TestAsyncioEngine:
+    """Test the asyncio engine."""
+
+    def test_fills_cells(self):
+        """Test that single-file and batched commands fill every cell."""
+        items = generate(["echo {}", "printf '%s\\n' {...} | tr a-z A-Z"])
+        assert items == [[file, file, file.upper()] for file in FILES]
+
+    def test_concurrency(self):
+        """Test that commands which wait are run at the same time."""
+        start = time.time()
+        items = generate(["sleep 0.5; echo {}"], concurrency=len(FILES))
+        assert time.time() - start < 0.5*len(FILES)
+        assert [row[1] for row in items] == FILES
+
+    @pytest.mark.skipif(not os.path.exists("/proc"), reason="checks the process state in /proc")
+    def test_timeout_kills_process_group(self, tmp_path):
+        """Test that a command which times out is killed along with the processes it started."""
+        pid_file = tmp_path / "pid"
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(run_command(f"sh -c 'echo $$ > {pid_file}; sleep 5'; echo done", timeout=0.5))
+        pid = int(pid_file.read_text())
+        time.sleep(0.1)
+        assert not is_running(pid)
+
+    def test_timed_out_cell_is_left_unfilled(self):
+        """Test that the other cells are filled when one command times out."""
+        items = generate(["if [ {} = c ]; then sleep 5; fi; echo ok"], timeout=0.5)
+        assert [row[1] for row in items] == ["ok", "...", "ok", "ok"]
+
+    def test_undecodable_output(self):
+        """Test that a command whose output isn't UTF-8 leaves its cell unfilled without stopping the others."""
+        items = generate(["if [ {} = c ]; then printf '\\377'; else echo ok; fi"])
+        assert [row[1] for row in items] == ["ok", "...", "ok", "ok"]
+        items = generate(["printf '\\377\\n%.0s' {...}"])
+        assert [row[1] for row in items] == ["...", "...", "...", "..."]
+
+    def test_batch_timeout_is_retried_in_smaller_chunks(self):
+        """Test that a chunk which times out is split rather than batching being turned off for the column."""
+        state = {
+            "thread_stop_event": threading.Event(),
+            "data_generation_queue": CellScheduler(),
+            "generate_data_for_hidden_columns": True,
+            "hidden_columns": [],
+        }
+        items = [[file, "..."] for file in FILES]
+        command = "set -- {...}; if [ $# -gt 1 ]; then sleep 5; fi; echo \"$1\""
+        scheduler, generation = schedule_cells(FILES, 1, items, state)
+        generator = AsyncioGenerator(FILES, [command], items, scheduler, generation, state, {**OPTIONS, "timeout": 0.5})
+        asyncio.run(generator.run())
+        assert [row[1] for row in items] == FILES
+        assert generator.batched_columns[0].enabled
+        assert generator.batched_columns[0].max_size == 1
+
+    def test_failed_batch_cells_each_take_a_slot(self, tmp_path):
+        """Test that the cells of a chunk which can't be batched are filled one command per concurrency slot."""
+        lock = tmp_path / "lock"
+        command = f"set -- {{...}}; [ $# -gt 1 ] && exit 1; mkdir {lock} || echo overlap; sleep 0.1; rmdir {lock}; echo \"$1\""
+        items = generate([command], concurrency=1, max_size=len(FILES))
+        assert [row[1] for row in items] == FILES
@@ -0,0 +1,56 @@
+"""
+Unit tests for generate_data_multiprocessing.py module.
+
+Tests that the process engine fills the same cells as the threaded engine.
+"""
+import os
+import threading
+import pytest
+from listpick.utils.cell_scheduler import CellScheduler
+from listpick.utils.generate_data_multiprocessing import generate_picker_data_processes
+from listpick.utils.generate_data_multithreaded import column_function
+
+
+FILES = ["/a b/x.txt", "/c/y", "d'e", "f"]
+
+
+def generate(column_functions):
+    """ Generate the data for FILES in worker processes and wait for it to finish. """
+    items, header = [], []
+    state = {
+        "thread_stop_event": threading.Event(),
+        "data_generation_queue": CellScheduler(),
+        "generate_data_for_hidden_columns": True,
+        "hidden_columns": [],
+        "threads": [],
+        "processes": [],
+    }
+    generate_picker_data_processes(FILES, column_functions, ["file"], items, header, threading.Event(), state)
+    for thread in state["threads"]:
+        thread.join(20)
+    state["thread_stop_event"].set()
+    assert not any(process.is_alive() for process in state["processes"])
+    return items
+
+
+class TestGenerateProcesses:
+    """Test generate_picker_data_processes."""
+
+    def test_commands_and_python_functions(self):
+        """Test that shell commands and py:module.function columns are run in the workers."""
+        items = generate(["echo {} | tr a-z A-Z", "py:os.path.basename"])
+        assert items == [[file, file.upper(), os.path.basename(file)] for file in FILES]
+
+    def test_picklable_function(self):
+        """Test that a function defined at the top level of a module can be passed directly."""
+        assert [row[1] for row in generate([os.path.dirname])] == [os.path.dirname(file) for file in FILES]
+
+    def test_falls_back_to_threads(self):
+        """Test that functions which can't be pickled are run in threads."""
+        assert [row[1] for row in generate([lambda file: file[::-1]])] == [file[::-1] for file in FILES]
+
+    def test_column_function(self):
+        """Test that py:module.function commands are imported."""
+        assert column_function("py:os.path.basename")("/a/b") == "b"
+        with pytest.raises(ImportError):
+            column_function("py:no_such_module.func")
@@ -0,0 +1,132 @@
+"""
+Unit tests for lazy_table.py module.
+
+Tests that a LazyTable gives the same rows as table_to_list while only keeping a bounded number of parsed rows.
+"""
+import threading
+import dill as pickle
+import pytest
+from listpick.utils.lazy_table import LazyTable, LazyIndexedRows, index_table_in_chunks
+from listpick.utils.table_to_list_of_lists import table_to_list
+from listpick.utils.filtering import filter_items
+from listpick.utils.sorting import sort_items, sort_items_by_levels
+
+
+CSV_DATA = 'name, n, job\nalice, 3, "a, b"\n\nbob,10\ncarol , 7, c\ndave,1,d\n'
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text(CSV_DATA)
+    return str(path)
+
+
+def load(file_path, file_type="csv", chunk_bytes=8, **kwargs):
+    """ Index file_path in small chunks and wait for it to finish. """
+    table, header = LazyTable(file_path, file_type=file_type, **kwargs), []
+    getting_data = threading.Event()
+    index_table_in_chunks(table, header, getting_data, {}, chunk_bytes=chunk_bytes)
+    assert getting_data.wait(5)
+    return table, header
+
+
+class TestLazyTable:
+    """Test the LazyTable class."""
+
+    def test_matches_table_to_list(self, csv_file):
+        """Test that the rows and header are the same as those returned by table_to_list, with blank lines skipped."""
+        items, header, _ = table_to_list(csv_file, file_type="csv", first_row_is_header=True)
+        table, table_header = load(csv_file)
+        assert table_header == header
+        assert len(table) == 4
+        assert table == [row + [""]*(3-len(row)) for row in items if row]
+        assert table[-1][0] == "dave"
+
+    def test_cache_is_bounded(self, csv_file):
+        """Test that only cache_size parsed rows are kept."""
+        table, _ = load(csv_file, cache_size=2)
+        for row in table:
+            row[0]
+        assert list(table.cache) == [2, 3]
+
+    def test_edits_are_kept(self, csv_file):
+        """Test that an edited row keeps its value after it is evicted from the cache."""
+        table, _ = load(csv_file, cache_size=1)
+        table[0][1] = "30"
+        for row in table:
+            row[0]
+        assert table[0][1] == "30"
+        assert list(table.iter_rows([0, 1]))[0][1][1] == "30"
+
+    def test_pickle(self, csv_file):
+        """Test that a pickled table reopens its file."""
+        table, _ = load(csv_file)
+        table[1][2] = "x"
+        copy = pickle.loads(pickle.dumps(table))
+        assert copy == table
+
+    def test_reload_closes_old_table(self, tmp_path, caplog):
+        """Test that the indexer of a replaced table stops before reading it once it has been closed under data_lock."""
+        path = tmp_path / "big.csv"
+        path.write_text("a,b\n" + "".join(f"{i},{i*2}\n" for i in range(20000)))
+        state = {"data_lock": threading.Lock(), "load_progress": {}}
+        threads = set(threading.enumerate())
+        old = LazyTable(str(path))
+        index_table_in_chunks(old, [], threading.Event(), state, chunk_bytes=64)
+        with state["data_lock"]:
+            # The indexer is waiting for the lock; a new call takes over the progress and the Picker closes the old table
+            state["load_progress"]["loader"] = object()
+            old.close()
+        for thread in set(threading.enumerate()) - threads:
+            thread.join(5)
+        assert "error reading" not in caplog.text
+
+
+class TestLazyIndexedRows:
+    """Test the LazyIndexedRows class with filter_items and sort_items."""
+
+    def test_filter_returns_lazy_rows(self, csv_file):
+        """Test that filtering a LazyTable only stores the matching indices."""
+        table, _ = load(csv_file)
+        result = filter_items(table, [], "a")
+        assert isinstance(result, LazyIndexedRows)
+        assert [i for i, _ in result] == [0, 2, 3]
+        assert result[1][1][0] == "carol"
+
+    def test_extend_keeps_range(self, csv_file):
+        """Test that appending the following rows keeps the order as a range."""
+        table, _ = load(csv_file)
+        rows = table.indexed_rows(range(2))
+        rows.extend(table.indexed_rows(range(2, 4)))
+        assert rows.order == range(4)
+        rows.extend([(1, table[1])])
+        assert list(rows.order) == [0, 1, 2, 3, 1]
+
+    def test_sort(self, csv_file):
+        """Test sorting by a column and back into the original order."""
+        table, _ = load(csv_file)
+        rows = table.indexed_rows()
+        sort_items(rows, sort_method=1, sort_column=0, sort_reverse=True)
+        assert [row[0] for _, row in rows] == ["dave", "carol", "bob", "alice"]
+        sort_items(rows, sort_method=0, sort_column=0)
+        assert [i for i, _ in rows] == [0, 1, 2, 3]
+        sort_items(rows, sort_method=0, sort_column=0, sort_reverse=True)
+        assert [i for i, _ in rows] == [3, 2, 1, 0]
+
+    def test_sort_without_row_tuples(self, csv_file, monkeypatch):
+        """Test that sorting by a column, or by several levels, gives the order of a list without creating a tuple for each row."""
+        table, _ = load(csv_file)
+        expected = list(enumerate(list(table)))
+        sort_items(expected, sort_method=6, sort_column=1, sort_reverse=True)
+        levels = [(2, 1, False), (1, 6, False)]
+        expected_levels = list(enumerate(list(table)))
+        sort_items_by_levels(expected_levels, levels)
+
+        monkeypatch.setattr(LazyIndexedRows, "__iter__", lambda self: pytest.fail("the rows were iterated"))
+        monkeypatch.setattr(LazyIndexedRows, "__getitem__", lambda self, k: pytest.fail("a row was accessed"))
+        rows = table.indexed_rows()
+        sort_items(rows, sort_method=6, sort_column=1, sort_reverse=True)
+        assert list(rows.order) == [i for i, _ in expected] == [1, 2, 0, 3]
+        sort_items_by_levels(rows, levels)
+        assert list(rows.order) == [i for i, _ in expected_levels]
@@ -0,0 +1,182 @@
+"""
+Unit tests for pane_data.py module.
+
+Tests that pane data is got in the background, cached by row id and requested only once the cursor settles.
+"""
+import threading
+import time
+from listpick.pane.pane_data import PaneDataError, PaneDataService
+
+
+class Notifier:
+    """A stand-in for a Wakeup which counts its notifications."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.count = 0
+
+    def notify(self):
+        self.count += 1
+        self.event.set()
+
+    def wait(self, timeout=5):
+        assert self.event.wait(timeout)
+        self.event.clear()
+
+
+def make_state(cursor_pos=0):
+    rows = [["a", "1"], ["b", "2"], ["c", "3"], ["d", "4"]]
+    return {"indexed_items": list(enumerate(rows)), "cursor_pos": cursor_pos, "id_column": 0}
+
+
+def make_pane(calls, **kwargs):
+    def get_data(data, state):
+        row_id = state["indexed_items"][state["cursor_pos"]][1][0]
+        calls.append(row_id)
+        return [f"data for {row_id}", row_id]
+    pane = {"auto_refresh": False, "get_data": get_data, "data": [], "refresh_time": 1.0, "async": True}
+    pane.update(kwargs)
+    return pane
+
+
+def settle(service, wakeup, pane, state, expected):
+    """Look up the pane until the data for the cursor row has arrived."""
+    for _ in range(50):
+        data = service.lookup(pane, state)
+        if data is not None and data[1] == expected:
+            return data
+        wakeup.event.wait(0.1)
+        wakeup.event.clear()
+    raise AssertionError(f"no data for {expected}")
+
+
+class TestPaneDataService:
+    """Test the PaneDataService class."""
+
+    def test_placeholder_then_data(self):
+        """Test that lookup returns None until the data has been got and then returns the cached data."""
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, debounce=0)
+        pane, state = make_pane(calls), make_state()
+        assert service.lookup(pane, state) is None
+        wakeup.wait()
+        assert service.lookup(pane, state) == ["data for a", "a"]
+        assert service.lookup(pane, state) == ["data for a", "a"]
+        assert calls == ["a"]
+        service.close()
+
+    def test_rows_are_cached_by_id(self):
+        """Test that returning to a row uses its cached data."""
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, debounce=0)
+        pane = make_pane(calls)
+        settle(service, wakeup, pane, make_state(0), "a")
+        settle(service, wakeup, pane, make_state(1), "b")
+        assert service.lookup(pane, make_state(0)) == ["data for a", "a"]
+        assert calls == ["a", "b"]
+        service.close()
+
+    def test_ttl(self):
+        """Test that data older than cache_ttl is got again while the stale data is still returned."""
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, debounce=0)
+        pane, state = make_pane(calls, cache_ttl=0.05), make_state()
+        settle(service, wakeup, pane, state, "a")
+        time.sleep(0.1)
+        assert service.lookup(pane, state) == ["data for a", "a"]
+        wakeup.wait()
+        assert calls == ["a", "a"]
+        service.close()
+
+    def test_lru_eviction(self):
+        """Test that the least recently used rows are dropped when the cache is full."""
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, cache_size=2, debounce=0)
+        pane = make_pane(calls)
+        for i, row_id in enumerate("abc"):
+            settle(service, wakeup, pane, make_state(i), row_id)
+        assert len(service.cache) == 2
+        assert service.lookup(pane, make_state(0)) is None
+        service.close()
+
+    def test_debounce(self):
+        """Test that rows which the cursor moves quickly past are not requested."""
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, debounce=0.2)
+        pane = make_pane(calls)
+        settle(service, wakeup, pane, make_state(0), "a")
+        for i in (1, 2, 3):
+            assert service.lookup(pane, make_state(i)) is None
+        assert service.next_deadline() is not None
+        time.sleep(0.25)
+        service.lookup(pane, make_state(3))
+        wakeup.wait()
+        assert calls == ["a", "d"]
+        service.close()
+
+    def test_prefetch(self):
+        """Test that the rows next to the cursor are got when prefetch is set."""
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, debounce=0)
+        pane = make_pane(calls, prefetch=1)
+        settle(service, wakeup, pane, make_state(1), "b")
+        deadline = time.time() + 5
+        while len(service.cache) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert sorted(calls) == ["a", "b", "c"]
+        calls.clear()
+        assert service.lookup(pane, make_state(2)) == ["data for c", "c"]
+        service.close()
+
+    def test_failed_get_data(self):
+        """Test that an exception in get_data doesn't stop the service and that its error is returned in place of the data."""
+        wakeup = Notifier()
+        service = PaneDataService(wakeup, debounce=0)
+        pane = {"auto_refresh": False, "get_data": lambda data, state: 1/0, "data": [], "refresh_time": 1.0, "async": True}
+        assert service.lookup(pane, make_state()) is None
+        wakeup.wait()
+        error = service.lookup(pane, make_state())
+        assert isinstance(error, PaneDataError) and "ZeroDivisionError" in error
+        service.close()
+
+    def test_failed_get_data_is_retried(self, monkeypatch):
+        """Test that a row whose data couldn't be got is tried again after PANE_ERROR_TTL, not the pane's TTL."""
+        monkeypatch.setattr("listpick.pane.pane_data.PANE_ERROR_TTL", 0.05)
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, debounce=0)
+        pane, state = make_pane(calls, cache_ttl=60), make_state()
+        get_data = pane["get_data"]
+        pane["get_data"] = lambda data, state: 1/0
+        service.lookup(pane, state)
+        wakeup.wait()
+        assert isinstance(service.lookup(pane, state), PaneDataError)
+        pane["get_data"] = get_data
+        time.sleep(0.1)
+        assert settle(service, wakeup, pane, state, "a") == ["data for a", "a"]
+        service.close()
+
+    def test_failed_refresh_keeps_data(self):
+        """Test that the stale data is kept when get_data fails after data has been got."""
+        wakeup, calls = Notifier(), []
+        service = PaneDataService(wakeup, debounce=0)
+        pane, state = make_pane(calls), make_state()
+        settle(service, wakeup, pane, state, "a")
+        pane["get_data"] = lambda data, state: 1/0
+        service.refresh(pane, state)
+        wakeup.wait()
+        assert service.lookup(pane, state) == ["data for a", "a"]
+        service.close()
+
+    def test_rows_requested_after_close(self):
+        """Test that a row whose fetch was cancelled by close() is requested again when the service is next used."""
+        wakeup, calls, gate = Notifier(), [], threading.Event()
+        service = PaneDataService(wakeup, debounce=0, workers=1)
+        pane = make_pane(calls)
+        get_data = pane["get_data"]
+        pane["get_data"] = lambda data, state: gate.wait(5) and get_data(data, state)
+        service.lookup(pane, make_state(0))
+        service.lookup(pane, make_state(1))
+        service.close()
+        gate.set()
+        assert settle(service, wakeup, pane, make_state(1), "b") == ["data for b", "b"]
+        service.close()
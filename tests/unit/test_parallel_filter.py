@@ -0,0 +1,103 @@
+"""
+Unit tests for parallel_filter.py module.
+
+Tests that matching rows in worker processes gives the same result as matching them in the main process.
+"""
+import threading
+import pytest
+from listpick.utils.parallel_filter import ParallelMatcher, FilterCancelled, match_shard, read_blocks
+from listpick.utils.lazy_table import LazyTable, LazyIndexedRows, index_table_in_chunks
+from listpick.utils.filtering import filter_items, FilterState
+from listpick.utils.searching import search, SearchState
+
+
+ITEMS = [[f"name{i}", str(i % 7), "odd" if i % 2 else "even"] for i in range(200)]
+
+
+@pytest.fixture
+def matcher():
+    matcher = ParallelMatcher(workers=2, min_rows=10)
+    yield matcher
+    matcher.close()
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("name,n,parity\n" + "\n".join(",".join(row) for row in ITEMS) + "\n")
+    return str(path)
+
+
+class TestParallelMatcher:
+    """Test the ParallelMatcher class."""
+
+    @pytest.mark.parametrize("query", ["name1", "--1 3", "odd --v", "--i NAME5 --3 even"])
+    def test_filter_matches_serial(self, matcher, query):
+        """Test that a parallel filter returns the same rows as a serial one."""
+        assert filter_items(ITEMS, [], query, matcher=matcher) == filter_items(ITEMS, [], query)
+
+    def test_appended_rows(self, matcher):
+        """Test that only the rows from appended_from are returned."""
+        assert filter_items(ITEMS, [], "name", appended_from=150, matcher=matcher) == [(i, ITEMS[i]) for i in range(150, 200)]
+
+    def test_separator_in_cell(self, matcher):
+        """Test that rows which can't be packed are matched in the main process."""
+        items = [row[:] for row in ITEMS]
+        items[3][0] = "a\x1fb"
+        assert matcher.matching_rows(items, "a") is None
+        assert filter_items(items, [], "b", matcher=matcher) == [(3, items[3])]
+
+    def test_cancel(self, matcher):
+        """Test that FilterCancelled is raised when cancel returns True."""
+        with pytest.raises(FilterCancelled):
+            filter_items(ITEMS, [], "name", matcher=matcher, cancel=lambda: True)
+
+    def test_cancel_in_main_process(self, monkeypatch):
+        """Test that rows matched in the main process are cancelled too and that the filter state is left as it was."""
+        monkeypatch.setattr("listpick.utils.parallel_filter.CANCEL_CHECK_ROWS", 16)
+        filter_state = FilterState()
+        filter_items(ITEMS, [], "name1", filter_state=filter_state)
+        with pytest.raises(FilterCancelled):
+            filter_items(ITEMS, [], "name", filter_state=filter_state, cancel=lambda: True)
+        assert filter_state.matched_indices == [i for i, _ in filter_items(ITEMS, [], "name1")]
+        with pytest.raises(FilterCancelled):
+            search("name", list(enumerate(ITEMS)), search_state=SearchState(), cancel=lambda: True)
+        checks = []
+        assert len(filter_items(ITEMS, [], "name", cancel=lambda: checks.append(1))) == 200
+        assert len(checks) == 200 // 16
+
+    def test_read_blocks(self, monkeypatch):
+        """Test that a buffer is split into small blocks at separators, including rows longer than a block."""
+        monkeypatch.setattr("listpick.utils.parallel_filter.SHARD_BLOCK_BYTES", 8)
+        buffer = b"ab\ncdefghijklmnop\nq\n\nrs"
+        blocks = list(read_blocks(buffer, 0, len(buffer), b"\n"))
+        assert max(len(block) for block in blocks[:1] + blocks[2:]) <= 8
+        assert b"\n".join(blocks) == buffer
+        assert b"\n".join(read_blocks(buffer, 3, 18, b"\n")) == buffer[3:18]
+
+    def test_shard_matched_in_blocks(self, monkeypatch, csv_file):
+        """Test that a shard gives the same matches when it is read a few rows at a time."""
+        table, getting_data = LazyTable(csv_file), threading.Event()
+        index_table_in_chunks(table, [], getting_data, {})
+        assert getting_data.wait(5)
+        args = (("file", csv_file, "csv"), "--2 odd", 10, table.offsets[10], table.row_end(149), table.column_count)
+        expected = match_shard(*args)
+        monkeypatch.setattr("listpick.utils.parallel_filter.SHARD_BLOCK_BYTES", 64)
+        assert match_shard(*args) == expected
+        assert len(expected) == 8 * 70
+
+    def test_lazy_table(self, matcher, csv_file):
+        """Test that the rows of a LazyTable, including edited rows, are matched in parallel."""
+        table, getting_data = LazyTable(csv_file), threading.Event()
+        index_table_in_chunks(table, [], getting_data, {})
+        assert getting_data.wait(5)
+        table[4][2] = "odd"
+        result = filter_items(table, [], "odd", matcher=matcher)
+        assert isinstance(result, LazyIndexedRows)
+        assert [i for i, _ in result] == [i for i in range(200) if i % 2 or i == 4]
+
+    def test_search(self, matcher):
+        """Test that a parallel search finds the same matches as a serial one."""
+        indexed_items = list(enumerate(ITEMS))[::3]
+        expected = search("--2 3", indexed_items, cursor_pos=5)
+        assert search("--2 3", indexed_items, cursor_pos=5, items=ITEMS, matcher=matcher) == expected
@@ -0,0 +1,65 @@
+"""
+Unit tests for picker_state.py module.
+
+Tests that a PickerState reads the current values from the picker without copying them.
+"""
+import pytest
+from listpick.utils.picker_state import PickerState
+
+
+class FakePicker:
+    """A picker with a few of the attributes of the state."""
+
+    def __init__(self):
+        self.items = [["a", "1"], ["b", "2"]]
+        self.cursor_pos = 0
+        self.hidden_columns = []
+        self.logger = None
+        self.state = PickerState(self)
+
+    def get_function_data(self) -> dict:
+        return {
+            "self": self,
+            "items": self.items,
+            "cursor_pos": self.cursor_pos,
+            "hidden_columns": self.hidden_columns,
+        }
+
+
+class TestPickerState:
+    """Test the PickerState class."""
+
+    def test_keys_match_function_data(self):
+        """Test that the state has the keys of get_function_data(), in the same order."""
+        picker = FakePicker()
+        data = picker.get_function_data()
+        assert list(picker.state) == list(data)
+        assert len(picker.state) == len(data)
+        assert dict(picker.state) == data
+        assert picker.state["self"] is picker
+
+    def test_values_are_live(self):
+        """Test that changes to the picker are seen by the state and that values are not copied."""
+        picker = FakePicker()
+        state = picker.state
+        assert state["items"] is picker.items
+        picker.cursor_pos = 1
+        picker.hidden_columns = [1]
+        assert state["cursor_pos"] == 1
+        assert state["hidden_columns"] == [1]
+        assert state.get("cursor_pos") == 1
+
+    def test_unknown_key(self):
+        """Test that attributes which are not part of the state can't be looked up."""
+        picker = FakePicker()
+        with pytest.raises(KeyError):
+            picker.state["logger"]
+        assert "logger" not in picker.state
+        assert picker.state.get("logger") is None
+
+    def test_read_only(self):
+        """Test that the state can't be assigned to."""
+        picker = FakePicker()
+        with pytest.raises(TypeError):
+            picker.state["cursor_pos"] = 1
+        assert picker.cursor_pos == 0
@@ -0,0 +1,67 @@
+"""
+Unit tests for row_merge.py module.
+
+Tests that refreshed rows are merged by their id and that the delta records what has changed.
+"""
+from listpick.utils.row_merge import merge_rows
+
+
+def rows():
+    return [["a", "1", "x"], ["b", "2", "y"], ["c", "3", "z"]]
+
+
+class TestMergeRows:
+    """Test the merge_rows function."""
+
+    def test_unchanged(self):
+        """Test that identical rows are merged in place without changes."""
+        items = rows()
+        merged, delta = merge_rows(items, rows(), 0)
+        assert merged == items and all(a is b for a, b in zip(merged, items))
+        assert delta.in_place and delta.changed == []
+
+    def test_changed_rows_are_updated_in_place(self):
+        """Test that changed rows keep their row object and that the changed columns are recorded."""
+        items = rows()
+        b = items[1]
+        merged, delta = merge_rows(items, [["a", "1", "x"], ["b", 5, "y"], ["c", "3", None]], 0)
+        assert merged[1] is b and b == ["b", "5", "y"]
+        assert merged[2] == ["c", "3", ""]
+        assert delta.in_place
+        assert delta.changed == [1, 2] and delta.changed_columns == {1, 2}
+
+    def test_inserts_and_removals(self):
+        """Test that new ids are inserted and missing ids are removed, in the order of the new rows."""
+        items = rows()
+        c = items[2]
+        merged, delta = merge_rows(items, [["d", "4", "w"], ["c", "3", "z"], ["a", "1", "x"]], 0)
+        assert [row[0] for row in merged] == ["d", "c", "a"]
+        assert merged[1] is c
+        assert delta.inserted == [0] and delta.removed == 1 and delta.reordered
+        assert delta.new_index == [2, -1, 1] and delta.shuffled
+        assert not delta.in_place
+
+    def test_removals_keep_order(self):
+        """Test that removing rows moves the rows after them without changing their order."""
+        merged, delta = merge_rows(rows(), [["b", "2", "y"], ["c", "3", "z"], ["e", "5", "v"]], 0)
+        assert delta.new_index == [-1, 0, 1] and delta.inserted == [2]
+        assert delta.reordered and not delta.shuffled
+
+    def test_reordered(self):
+        """Test that moving rows is not an in-place merge."""
+        merged, delta = merge_rows(rows(), rows()[::-1], 0)
+        assert delta.reordered and delta.shuffled and not delta.in_place and delta.changed == []
+        assert delta.new_index == [2, 1, 0]
+
+    def test_duplicate_ids(self):
+        """Test that rows without unique ids can't be merged."""
+        items = [["a", "1"], ["a", "2"]]
+        assert merge_rows(items, [["a", "3"], ["a", "4"]], 0) is None
+        assert items == [["a", "1"], ["a", "2"]]
+        assert merge_rows([[]], rows(), 0) is None
+
+    def test_id_column(self):
+        """Test merging by a column other than the first."""
+        items = rows()
+        merged, delta = merge_rows(items, [["A", "1", "x"], ["b", "2", "y"], ["c", "3", "z"]], 2)
+        assert delta.in_place and delta.changed == [0] and delta.changed_columns == {0}
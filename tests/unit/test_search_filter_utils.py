@@ -4,7 +4,7 @@ Unit tests for search_and_filter_utils.py module.
 Tests for tokenise and apply_filter functions.
 """
 import pytest
-from listpick.utils.search_and_filter_utils import apply_filter, tokenise
+from listpick.utils.search_and_filter_utils import apply_filter, tokenise, compile_query, CompiledQuery, HighlightRules
 
 
 # ============================================================================
@@ -269,3 +269,127 @@ class TestApplyFilter:
         # This should be case sensitive automatically
         result = apply_filter(sample_row, filters)
         assert result is True
+
+
+# ============================================================================
+# Tests for compile_query
+# ============================================================================
+
+class TestCompileQuery:
+    """Test the compile_query function and CompiledQuery."""
+
+    @pytest.fixture
+    def sample_row(self):
+        """Sample row for matching tests."""
+        return ["Alice", "30", "Engineer", "alice@example.com"]
+
+    def test_compile_query_is_cached(self):
+        """Test that the same query string returns the same compiled query."""
+        assert compile_query("alice --1 30") is compile_query("alice --1 30")
+
+    def test_compile_query_filters_match_tokenise(self):
+        """Test that the compiled query holds the tokenised filters."""
+        compiled = compile_query("--0 alice manager")
+        assert isinstance(compiled, CompiledQuery)
+        assert compiled.filters == tokenise("--0 alice manager")
+
+    def test_compile_query_empty(self):
+        """Test that an empty query is falsy."""
+        assert not compile_query("")
+
+    def test_compiled_query_matches(self, sample_row):
+        """Test matching a row against a compiled query."""
+        assert compile_query("alice --2 eng").matches(sample_row) is True
+        assert compile_query("bob").matches(sample_row) is False
+
+    def test_compiled_query_agrees_with_apply_filter(self, sample_row):
+        """Test that compiled queries give the same result as apply_filter."""
+        for query in ["alice", "ALICE", "--1 3", "--5 alice", "--0 Alice example"]:
+            assert compile_query(query).matches(sample_row) == apply_filter(sample_row, tokenise(query))
+
+    def test_compiled_query_invert(self, sample_row):
+        """Test that --v inverts the match."""
+        compiled = compile_query("--v bob")
+        assert compiled.invert_filter is True
+        assert compiled.matches(sample_row) is True
+        assert compile_query("--v alice").matches(sample_row) is False
+
+    def test_compiled_query_case_sensitive(self, sample_row):
+        """Test that --i makes lowercase patterns case-sensitive."""
+        compiled = compile_query("--i engineer")
+        assert compiled.case_sensitive is True
+        assert compiled.matches(sample_row) is False
+        assert compile_query("engineer").matches(sample_row) is True
+
+    def test_compiled_query_highlights(self):
+        """Test the search highlights produced by a compiled query."""
+        highlights = compile_query("--1 30 alice").highlights()
+        assert {"match": "30", "field": 1, "color": 10, "type": "search", "level": 1} in highlights
+        assert {"match": "alice", "field": "all", "color": 10, "type": "search", "level": 1} in highlights
+
+    def test_compiled_query_inverted_has_no_highlights(self):
+        """Test that inverted queries do not add highlights."""
+        assert compile_query("--v alice").highlights() == []
+
+    def test_compiled_query_invert_without_patterns(self, sample_row):
+        """Test that a query of only flags matches every row rather than none."""
+        for query in ("--v", "--v --i", "--v ("):
+            compiled = compile_query(query)
+            assert compiled.invert_filter is False
+            assert compiled.matches(sample_row) is True
+
+    def test_compiled_query_case_sensitive_highlights(self):
+        """Test that the highlights of case-sensitive patterns are matched case-sensitively."""
+        rules = HighlightRules()
+        rules.update(compile_query("--i ali").highlights() + compile_query("Bob eve").highlights())
+        ali, bob, eve = rules.levels[1]
+        assert ali.pattern.search("ali") and not ali.pattern.search("ALI")
+        assert bob.pattern.search("Bob") and not bob.pattern.search("bob")
+        assert eve.pattern.search("EVE")
+
+    def test_compiled_query_narrows(self):
+        """Test detecting when a query narrows the previous query."""
+        assert compile_query("alic").narrows(compile_query("ali")) is True
+        assert compile_query("ali bob").narrows(compile_query("ali")) is True
+        assert compile_query("--0 alic").narrows(compile_query("ali")) is True
+        assert compile_query("ali").narrows(compile_query("--0 ali")) is False
+        assert compile_query("ali").narrows(compile_query("alic")) is False
+        assert compile_query("al.c").narrows(compile_query("al.")) is False
+        assert compile_query("--i ali").narrows(compile_query("ali")) is True
+        assert compile_query("ali").narrows(compile_query("--i ali")) is False
+        assert compile_query("--v alic").narrows(compile_query("--v ali")) is False
+
+
+class TestHighlightRules:
+    """Test the HighlightRules class."""
+
+    def test_levels(self):
+        """Test that highlights are compiled and split by level, with invalid levels drawn at level 0."""
+        rules = HighlightRules()
+        rules.update([
+            {"match": "ali", "field": "all", "color": 8},
+            {"match": "bob", "field": 1, "color": 9, "level": 1},
+            {"match": "eve", "field": 0, "color": 10, "level": 2, "row": 3},
+            {"match": "dan", "field": 0, "color": 10, "level": 5},
+        ])
+        l0, l1, l2 = rules.levels
+        assert [rule.field for rule in l0] == ["all", 0]
+        assert l0[0].pattern.search("ALICE") and l0[0].row is None
+        assert [(rule.field, rule.color) for rule in l1] == [(1, 9)]
+        assert l2[0].row == 3
+
+    def test_version_changes_only_when_highlights_change(self):
+        """Test that the highlights are only compiled again when they change."""
+        rules = HighlightRules()
+        highlights = [{"match": "ali", "field": "all", "color": 8}]
+        version = rules.update(highlights)
+        assert rules.update([dict(h) for h in highlights]) == version
+        highlights[0]["color"] = 9
+        assert rules.update(highlights) > version
+        assert rules.levels[0][0].color == 9
+
+    def test_invalid_highlights_are_skipped(self):
+        """Test that highlights with an invalid pattern or missing keys are skipped."""
+        rules = HighlightRules()
+        rules.update([{"match": "(", "field": "all", "color": 8}, {"match": "a", "color": 8}, {"match": "b", "field": "all", "color": 8}])
+        assert [rule.pattern.pattern for rule in rules.levels[0]] == ["b"]
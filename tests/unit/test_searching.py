@@ -4,7 +4,7 @@ Unit tests for searching.py module.
 Tests for search function with highlighting and cursor positioning.
 """
 import pytest
-from listpick.utils.searching import search
+from listpick.utils.searching import search, SearchState
 
 
 class TestSearch:
@@ -248,3 +248,65 @@ class TestSearch:
         assert isinstance(search_index, int)
         assert isinstance(search_count, int)
         assert isinstance(highlights, list)
+
+
+class TestSearchState:
+    """Test that searches which reuse a SearchState give the same results as searching every row."""
+
+    @pytest.fixture
+    def items(self):
+        return [[f"row{i}", "match" if i % 3 == 0 else "other"] for i in range(30)]
+
+    def test_same_as_uncached(self, items):
+        """Test next/previous from every position, with unselectable rows, against an uncached search."""
+        indexed_items = list(enumerate(items))[::-1]
+        state = SearchState()
+        keys = {"search_state": state, "items_key": (id(items), 0), "order_key": (id(indexed_items), 0, 0)}
+        for reverse in (False, True):
+            for cursor_pos in range(len(indexed_items)):
+                expected = search("match", indexed_items, cursor_pos=cursor_pos, unselectable_indices=[2], reverse=reverse)
+                assert search("match", indexed_items, cursor_pos=cursor_pos, unselectable_indices=[2], reverse=reverse, **keys) == expected
+
+    def test_matches_are_reused(self, items):
+        """Test that rows are only checked again when the query or items key changes."""
+        indexed_items = list(enumerate(items))
+        state = SearchState()
+        search("match", indexed_items, search_state=state, items_key=(id(items), 0), order_key=(0,))
+        state.row_matches[1] = True
+        found, cursor_pos, search_index, search_count, _ = search("match", indexed_items, cursor_pos=0, search_state=state, items_key=(id(items), 0), order_key=(1,))
+        assert cursor_pos == 1 and search_count == 11
+        found, cursor_pos, search_index, search_count, _ = search("match", indexed_items, cursor_pos=0, search_state=state, items_key=(id(items), 1), order_key=(1,))
+        assert cursor_pos == 3 and search_count == 10
+
+    def test_rows_changed(self, items):
+        """Test that rows which change in place are checked again on their own."""
+        indexed_items = list(enumerate(items))
+        state = SearchState()
+        keys = {"search_state": state, "items_key": (id(items), 0), "order_key": (0,)}
+        assert search("match", indexed_items, cursor_pos=0, **keys)[3] == 10
+        items[1][1] = "match"
+        assert search("match", indexed_items, cursor_pos=0, **keys)[3] == 10
+        state.rows_changed([1])
+        found, cursor_pos, search_index, search_count, _ = search("match", indexed_items, cursor_pos=0, **keys)
+        assert cursor_pos == 1 and search_index == 2 and search_count == 11
+
+    def test_rows_moved(self, items):
+        """Test that checked rows keep their matches at their new indices and that new rows are checked."""
+        state = SearchState()
+        keys = {"search_state": state, "items_key": (id(items), 0), "order_key": (0,)}
+        search("match", list(enumerate(items)), **keys)
+        state.row_matches[1] = True
+        items.pop(0)
+        items.append(["new", "match"])
+        state.rows_moved([-1] + list(range(len(items) - 1)))
+        found, cursor_pos, search_index, search_count, _ = search("match", list(enumerate(items)), cursor_pos=28, **keys)
+        assert state.row_matches[0] is True and len(state.row_matches) == 30
+        assert cursor_pos == 29 and search_count == 11
+
+    def test_reordered(self, items):
+        """Test that the positions of the matches follow a new order of indexed_items."""
+        indexed_items = list(enumerate(items))
+        state = SearchState()
+        assert search("row3$", indexed_items, cursor_pos=0, search_state=state, items_key=(0,), order_key=(0,))[1] == 3
+        indexed_items.reverse()
+        assert search("row3$", indexed_items, cursor_pos=0, search_state=state, items_key=(0,), order_key=(1,))[1] == 26
@@ -0,0 +1,144 @@
+"""
+Unit tests for selection.py module.
+
+Tests for the sparse Selections and CellSelections classes and the selection helpers in utils.py.
+"""
+import pytest
+from listpick.utils.selection import Selections, CellSelections
+from listpick.utils.utils import get_selected_indices, get_selected_cells_by_row, get_selection_count
+
+
+class TestSelections:
+    """Test the Selections class."""
+
+    def test_behaves_like_dict(self):
+        """Test that Selections behaves like a {row: bool} dict."""
+        selections = Selections(4, [1, 3])
+        assert len(selections) == 4
+        assert selections[1] is True
+        assert selections[0] is False
+        assert dict(selections) == {0: False, 1: True, 2: False, 3: True}
+        assert selections == {0: False, 1: True, 2: False, 3: True}
+
+    def test_out_of_range_raises_key_error(self):
+        """Test that rows outside of the size raise KeyError."""
+        with pytest.raises(KeyError):
+            Selections(2)[2]
+
+    def test_from_dict(self):
+        """Test creating Selections from a dict."""
+        selections = Selections.from_dict({0: False, 1: True, 2: False})
+        assert len(selections) == 3
+        assert selections.selected_indices() == [1]
+
+    def test_select_all_and_invert(self):
+        """Test selecting all and inverting without storing every row."""
+        selections = Selections(1000)
+        selections.select_all()
+        assert selections.count() == 1000
+        assert len(selections.marked) == 0
+        selections[5] = False
+        assert selections.count() == 999
+        selections.invert()
+        assert selections.selected_indices() == [5]
+        selections.deselect_all()
+        assert selections.count() == 0
+
+    def test_resize(self):
+        """Test growing and shrinking the number of rows."""
+        selections = Selections(5, [1, 4])
+        selections.resize(3)
+        assert selections.selected_indices() == [1]
+        selections.resize(6)
+        assert len(selections) == 6
+        assert selections[5] is False
+
+    def test_resize_after_select_all(self):
+        """Test that rows added after selecting all are not selected."""
+        selections = Selections(3)
+        selections.select_all()
+        selections.resize(5)
+        assert selections.selected_indices() == [0, 1, 2]
+        selections[6] = False
+        assert selections.selected_indices() == [0, 1, 2]
+        assert selections.count() == 3
+
+    def test_remap(self):
+        """Test that selections follow their rows when rows are inserted, removed and reordered."""
+        selections = Selections(4, [0, 2])
+        selections.remap([3, -1, 0, 1], 5)
+        assert selections.selected_indices() == [0, 3] and len(selections) == 5
+        selections.select_all()
+        selections[1] = False
+        selections.remap([-1, 2, 0, 1, 4], 6)
+        assert selections.selected_indices() == [0, 1, 4]
+
+
+class TestCellSelections:
+    """Test the CellSelections class."""
+
+    def test_behaves_like_dict(self):
+        """Test that CellSelections behaves like a {(row, col): bool} dict."""
+        cell_selections = CellSelections(2, 2, [(0, 1)])
+        assert len(cell_selections) == 4
+        assert cell_selections[(0, 1)] is True
+        assert cell_selections[(1, 1)] is False
+        assert (2, 0) not in cell_selections
+
+    def test_select_all_and_invert(self):
+        """Test selecting all and inverting cells."""
+        cell_selections = CellSelections(100, 10)
+        cell_selections.select_all()
+        assert cell_selections.count() == 1000
+        cell_selections[(3, 4)] = False
+        cell_selections.invert()
+        assert cell_selections.selected_cells() == [(3, 4)]
+
+    def test_selected_cells_by_row(self):
+        """Test grouping the selected cells by row."""
+        cell_selections = CellSelections(3, 3, [(0, 1), (2, 0), (0, 2)])
+        assert cell_selections.selected_cells_by_row() == {0: [1, 2], 2: [0]}
+
+    def test_resize_drops_cells_outside_shape(self):
+        """Test that shrinking forgets cells outside of the new shape."""
+        cell_selections = CellSelections(3, 3, [(2, 2), (0, 0)])
+        cell_selections.resize(2, 3)
+        assert cell_selections.selected_cells() == [(0, 0)]
+
+    def test_resize_after_select_all(self):
+        """Test that rows and columns added after selecting all are not selected."""
+        cell_selections = CellSelections(2, 2)
+        cell_selections.select_all()
+        cell_selections.resize(3, 3)
+        assert cell_selections.selected_cells() == [(0, 0), (0, 1), (1, 0), (1, 1)]
+        cell_selections[(3, 0)] = True
+        assert cell_selections.count() == 5
+        assert cell_selections[(3, 1)] is False
+
+    def test_remap(self):
+        """Test that selected cells follow their rows and that the cells of new rows are not selected."""
+        cell_selections = CellSelections(3, 2, [(0, 1), (2, 0)])
+        cell_selections.remap([1, -1, 0], 3)
+        assert cell_selections.selected_cells() == [(0, 0), (1, 1)]
+        cell_selections.select_all()
+        cell_selections.remap([2, 0, -1], 3)
+        assert cell_selections.selected_cells() == [(0, 0), (0, 1), (2, 0), (2, 1)]
+
+
+class TestSelectionHelpers:
+    """Test the selection helpers with both dicts and sparse selections."""
+
+    def test_get_selected_indices(self):
+        """Test get_selected_indices with a dict and with Selections."""
+        assert get_selected_indices({0: True, 1: False, 2: True}) == [0, 2]
+        assert get_selected_indices(Selections(3, [0, 2])) == [0, 2]
+
+    def test_get_selection_count(self):
+        """Test get_selection_count with a dict and with Selections."""
+        assert get_selection_count({0: True, 1: False, 2: True}) == 2
+        assert get_selection_count(Selections(3, [0, 2])) == 2
+
+    def test_get_selected_cells_by_row(self):
+        """Test get_selected_cells_by_row with a dict and with CellSelections."""
+        assert get_selected_cells_by_row({(0, 1): True, (1, 0): False}) == {0: [1]}
+        assert get_selected_cells_by_row(CellSelections(2, 2, [(0, 1)])) == {0: [1]}
@@ -10,7 +10,10 @@ from listpick.utils.sorting import (
     parse_size,
     time_to_seconds,
     time_sort,
-    sort_items
+    sort_items,
+    sort_items_by_levels,
+    SortKeyCache,
+    TimeSortKey,
 )
 
 
@@ -436,3 +439,134 @@ class TestSortItems:
         assert data[0][0] == 0
         assert data[1][0] == 1
         assert data[2][0] == 2
+
+
+# ============================================================================
+# Tests for SortKeyCache
+# ============================================================================
+
+class TestSortKeyCache:
+    """Test sorting with a SortKeyCache."""
+
+    @pytest.fixture
+    def rows(self):
+        return [["b", "10 KB", "2024-01-03"], ["a", "1 MB", "2024-01-01"], ["c", "5 B", "2024-01-02"]]
+
+    def test_matches_uncached_sort(self, rows):
+        """Test that every method gives the same order with and without a cache."""
+        key_cache = SortKeyCache()
+        for sort_method in range(8):
+            for sort_column in range(3):
+                for sort_reverse in [False, True]:
+                    expected = list(enumerate(rows))
+                    sort_items(expected, sort_method=sort_method, sort_column=sort_column, sort_reverse=sort_reverse)
+                    result = list(enumerate(rows))
+                    sort_items(result, sort_method=sort_method, sort_column=sort_column, sort_reverse=sort_reverse, key_cache=key_cache)
+                    assert [i for i, _ in result] == [i for i, _ in expected]
+
+    def test_keys_are_reused(self, rows):
+        """Test that keys are only calculated for new or changed cells."""
+        calls = []
+        key_cache = SortKeyCache()
+        sort_items(list(enumerate(rows)), sort_method=6, sort_column=1, key_cache=key_cache)
+        column_keys = key_cache.columns[(1, 'num')]
+        column_keys.key_function = lambda value: calls.append(value) or parse_numerical(value)
+
+        sort_items(list(enumerate(rows)), sort_method=6, sort_column=1, sort_reverse=True, key_cache=key_cache)
+        assert calls == []
+
+        rows[0][1] = "2 KB"
+        indexed_items = list(enumerate(rows))
+        sort_items(indexed_items, sort_method=6, sort_column=1, key_cache=key_cache)
+        assert calls == ["2 KB"]
+        assert [i for i, _ in indexed_items] == [1, 0, 2]
+
+    def test_swap_columns(self, rows):
+        """Test that swapping columns swaps their keys."""
+        key_cache = SortKeyCache()
+        sort_items(list(enumerate(rows)), sort_method=1, sort_column=0, key_cache=key_cache)
+        key_cache.swap_columns(0, 2)
+        assert list(key_cache.columns) == [(2, 'lex')]
+
+    def test_rows_moved(self, rows):
+        """Test that the keys of rows which move are kept and only the keys of new rows are calculated."""
+        calls = []
+        key_cache = SortKeyCache()
+        sort_items(list(enumerate(rows)), sort_method=7, sort_column=1, key_cache=key_cache)
+        key_cache.columns[(1, 'size')].key_function = lambda value: calls.append(value) or parse_size(value)
+        rows[:] = [rows[2], ["d", "3 KB", "2024-01-04"], rows[0]]
+        key_cache.rows_moved([2, -1, 0])
+        indexed_items = list(enumerate(rows))
+        sort_items(indexed_items, sort_method=7, sort_column=1, key_cache=key_cache)
+        assert calls == ["3 KB"]
+        assert [row[0] for _, row in indexed_items] == ["c", "d", "b"]
+
+    def test_invalidate_column(self, rows):
+        """Test forgetting the keys of a single column."""
+        key_cache = SortKeyCache()
+        sort_items(list(enumerate(rows)), sort_method=1, sort_column=0, key_cache=key_cache)
+        sort_items(list(enumerate(rows)), sort_method=1, sort_column=2, key_cache=key_cache)
+        key_cache.invalidate(0)
+        assert list(key_cache.columns) == [(2, 'lex')]
+
+
+class TestTimeSortKey:
+    """Test the TimeSortKey class."""
+
+    def test_matches_time_sort(self):
+        """Test that TimeSortKey gives the same result as time_sort."""
+        time_key = TimeSortKey()
+        for value in ["2021-03-16 15:30", "05/03/2024", "04:30", "not a date", "2021-03-16"]:
+            assert time_key(value) == time_sort(value)
+
+    def test_remembers_matched_format(self):
+        """Test that the format which matched is tried first next time."""
+        time_key = TimeSortKey()
+        time_key("05/03/2024")
+        assert time_key.formats[0] == "%d/%m/%Y"
+
+
+# ============================================================================
+# Tests for sort_items_by_levels
+# ============================================================================
+
+class TestSortItemsByLevels:
+    """Test sorting by several columns."""
+
+    @pytest.fixture
+    def jobs(self):
+        return [
+            ["running", "10 KB"],
+            ["done", "1 MB"],
+            ["running", "5 MB"],
+            ["done", "5 B"],
+            ["failed", "1 KB"],
+        ]
+
+    def test_second_level_breaks_ties(self, jobs):
+        """Test sorting by status and then by size descending."""
+        indexed_items = list(enumerate(jobs))
+        sort_items_by_levels(indexed_items, [(0, 1, False), (1, 7, True)])
+        assert [i for i, _ in indexed_items] == [1, 3, 4, 2, 0]
+
+    def test_descending_first_level(self, jobs):
+        """Test a descending first level with an ascending second level."""
+        indexed_items = list(enumerate(jobs))
+        sort_items_by_levels(indexed_items, [(0, 1, True), (1, 7, False)])
+        assert [i for i, _ in indexed_items] == [0, 2, 4, 3, 1]
+
+    def test_single_level_matches_sort_items(self, jobs):
+        """Test that a single level sorts the same as sort_items."""
+        for sort_method in range(8):
+            for sort_reverse in [False, True]:
+                expected = list(enumerate(jobs))
+                sort_items(expected, sort_method=sort_method, sort_column=1, sort_reverse=sort_reverse)
+                result = list(enumerate(jobs))
+                sort_items_by_levels(result, [(1, sort_method, sort_reverse)], key_cache=SortKeyCache())
+                assert [i for i, _ in result] == [i for i, _ in expected]
+
+    def test_invalid_column_is_ignored(self, jobs):
+        """Test that levels with out of range columns are skipped."""
+        indexed_items = list(enumerate(jobs))
+        sort_items_by_levels(indexed_items, [(5, 1, False), (0, 1, False)])
+        assert [i for i, _ in indexed_items] == [1, 3, 4, 0, 2]
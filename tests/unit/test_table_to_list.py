@@ -0,0 +1,143 @@
+"""
+Unit tests for table_to_list_of_lists.py module.
+
+Tests that reading csv and tsv files row by row and in chunks gives the same table as table_to_list.
+"""
+import threading
+import time
+import pytest
+from listpick.utils.column_store import ColumnStore
+from listpick.utils.table_to_list_of_lists import table_to_list, read_table_rows, load_table_in_chunks, table_to_column_store
+
+
+CSV_DATA = 'name, n, job\nalice, 3, "a, b"\nbob,10,\n\ncarol , 7, c\n'
+TSV_DATA = '\n\nname\tn\tjob\nalice\t3\t"a b"\n\nbob\t10\tx\n\n'
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text(CSV_DATA)
+    return str(path)
+
+
+@pytest.fixture
+def tsv_file(tmp_path):
+    path = tmp_path / "table.tsv"
+    path.write_text(TSV_DATA)
+    return str(path)
+
+
+class Gate:
+    """A data_lock which lets the first chunk through and holds the rest until open is set."""
+
+    def __init__(self):
+        self.open = threading.Event()
+        self.entered = 0
+
+    def __enter__(self):
+        self.entered += 1
+        if self.entered > 2:
+            assert self.open.wait(5)
+
+    def __exit__(self, *exc):
+        return False
+
+
+def load(file_path, file_type, **kwargs):
+    """ Load file_path with load_table_in_chunks and wait for it to finish. """
+    items, header, state = [], [], {"load_progress": {}}
+    getting_data = threading.Event()
+    load_table_in_chunks(file_path, items, header, getting_data, state, file_type=file_type, **kwargs)
+    assert getting_data.wait(5)
+    return items, header, state
+
+
+class TestReadTableRows:
+    """Test the read_table_rows function."""
+
+    def test_csv_matches_table_to_list(self, csv_file):
+        """Test that the csv rows are the same as those returned by table_to_list."""
+        items, header, _ = table_to_list(csv_file, file_type="csv", first_row_is_header=False)
+        with open(csv_file) as f:
+            assert list(read_table_rows(f, "csv")) == items
+
+    def test_tsv_matches_table_to_list(self, tsv_file):
+        """Test that the tsv rows are the same as those returned by table_to_list."""
+        items, header, _ = table_to_list(tsv_file, file_type="tsv", first_row_is_header=False)
+        with open(tsv_file) as f:
+            assert list(read_table_rows(f, "tsv")) == items
+
+
+class TestTableToColumnStore:
+    """Test the table_to_column_store function."""
+
+    @pytest.mark.parametrize("file_type", ["csv", "tsv"])
+    def test_matches_from_rows(self, csv_file, tsv_file, file_type):
+        """Test that the table is the same as a ColumnStore built from the rows returned by table_to_list."""
+        file_path = csv_file if file_type == "csv" else tsv_file
+        for first_row_is_header in [True, False]:
+            items, header, _ = table_to_list(file_path, file_type=file_type, first_row_is_header=first_row_is_header)
+            store, store_header, _ = table_to_column_store(file_path, file_type=file_type, first_row_is_header=first_row_is_header)
+            assert isinstance(store, ColumnStore)
+            assert store_header == header
+            assert store.to_lists() == ColumnStore.from_rows(items).to_lists()
+
+
+class TestLoadTableInChunks:
+    """Test the load_table_in_chunks function."""
+
+    def test_loads_whole_file(self, csv_file):
+        """Test that every row is loaded when the file is larger than the chunks."""
+        expected_items, expected_header, _ = table_to_list(csv_file, file_type="csv", first_row_is_header=True)
+        items, header, state = load(csv_file, "csv", first_chunk_size=1, chunk_size=1)
+        assert items == expected_items
+        assert header == expected_header
+        assert state["load_progress"]["done"]
+        assert state["load_progress"]["rows"] == len(items)
+
+    def test_stop_event(self, csv_file):
+        """Test that loading stops after the first chunk when the thread_stop_event is set."""
+        items, header = [], []
+        stop_event = threading.Event()
+        stop_event.set()
+        getting_data = threading.Event()
+        load_table_in_chunks(csv_file, items, header, getting_data, {"thread_stop_event": stop_event}, first_chunk_size=1)
+        assert getting_data.wait(5)
+        assert len(items) == 1
+
+    def test_reload_stops_previous_loader(self, csv_file):
+        """Test that loading again with the same progress stops the earlier loader before it sets getting_data."""
+        progress, gate = {}, Gate()
+        old_items, old_getting_data = [], threading.Event()
+        load_table_in_chunks(csv_file, old_items, [], old_getting_data, {"data_lock": gate, "load_progress": progress}, first_chunk_size=1, chunk_size=1)
+        # The earlier loader waits at the gate to append its next chunk while the file is loaded again
+        items, header, getting_data = [], [], threading.Event()
+        load_table_in_chunks(csv_file, items, header, getting_data, {"load_progress": progress}, first_chunk_size=1, chunk_size=1)
+        gate.open.set()
+        assert getting_data.wait(5)
+        assert not old_getting_data.wait(0.2)
+        assert len(old_items) < len(items) == 4
+        assert progress["done"] and progress["rows"] == 4
+
+    def test_reload_into_same_items(self, csv_file):
+        """Test that the earlier loader can't append to the items after they have been cleared by loading again."""
+        expected_items, _, _ = table_to_list(csv_file, file_type="csv", first_row_is_header=True)
+        progress, gate, items = {}, Gate(), []
+        load_table_in_chunks(csv_file, items, [], threading.Event(), {"data_lock": gate, "load_progress": progress}, first_chunk_size=1, chunk_size=1)
+        getting_data = threading.Event()
+        load_table_in_chunks(csv_file, items, [], getting_data, {"load_progress": progress}, first_chunk_size=1, chunk_size=1)
+        gate.open.set()
+        assert getting_data.wait(5)
+        time.sleep(0.1)
+        assert items == expected_items
+
+    def test_column_store_is_kept(self, csv_file):
+        """Test that loading into a ColumnStore replaces its rows rather than the store."""
+        expected_items, _, _ = table_to_list(csv_file, file_type="csv", first_row_is_header=True)
+        items = ColumnStore.from_rows([["x", "y", "z"]])
+        getting_data = threading.Event()
+        load_table_in_chunks(csv_file, items, [], getting_data, {}, first_chunk_size=1, chunk_size=1)
+        assert getting_data.wait(5)
+        assert isinstance(items, ColumnStore)
+        assert items.to_lists() == ColumnStore.from_rows(expected_items).to_lists()
@@ -0,0 +1,80 @@
+"""
+Unit tests for time_series.py module.
+
+Tests the fixed-capacity RingBuffer used for graph data and the downsampling of a series to the width of a pane.
+"""
+import pytest
+from listpick.pane.time_series import RingBuffer, downsample
+
+
+class TestRingBuffer:
+    """Test the RingBuffer class."""
+
+    def test_append_and_index(self):
+        """Test that a RingBuffer behaves like a list until it is full."""
+        buffer = RingBuffer([1, 2], capacity=5)
+        buffer.append(3)
+        assert len(buffer) == 3
+        assert list(buffer) == [1.0, 2.0, 3.0]
+        assert buffer[0] == 1 and buffer[-1] == 3
+        assert buffer[1:] == [2.0, 3.0]
+        with pytest.raises(IndexError):
+            buffer[3]
+
+    def test_wraps_at_capacity(self):
+        """Test that only the last `capacity` values are kept."""
+        buffer = RingBuffer(range(10), capacity=4)
+        assert len(buffer) == 4
+        assert buffer.tolist() == [6.0, 7.0, 8.0, 9.0]
+        assert buffer[0] == 6 and buffer[-1] == 9
+        buffer.append(buffer[-1] + 1)
+        assert buffer.tolist() == [7.0, 8.0, 9.0, 10.0]
+
+    def test_version(self):
+        """Test that the version changes when values are added or cleared."""
+        buffer = RingBuffer(capacity=2)
+        version = buffer.version
+        buffer.append(1)
+        assert buffer.version > version
+        version = buffer.version
+        buffer.clear()
+        assert buffer.version > version and len(buffer) == 0
+
+    def test_invalid_capacity(self):
+        """Test that a RingBuffer must hold at least one value."""
+        with pytest.raises(ValueError):
+            RingBuffer(capacity=0)
+
+
+class TestDownsample:
+    """Test the downsample function."""
+
+    def test_short_series_unchanged(self):
+        """Test that a series with no more points than buckets is returned as it is."""
+        xs, mins, maxs, means = downsample([0, 1, 2], [5, 3, 4], 10)
+        assert xs == [0, 1, 2]
+        assert mins == maxs == means == [5, 3, 4]
+
+    def test_buckets(self):
+        """Test that each bucket gives its min, max and mean."""
+        xs, mins, maxs, means = downsample(RingBuffer(range(8)), RingBuffer([1, 3, 2, 2, 0, 8, 5, 5]), 4)
+        assert xs == [0, 2, 4, 6]
+        assert mins == [1, 2, 0, 5]
+        assert maxs == [3, 2, 8, 5]
+        assert means == [2, 2, 4, 5]
+
+
+class TestGraphString:
+    """Test that graphs of RingBuffers are cached."""
+
+    def test_cached_until_points_added(self):
+        """Test that the graph is rendered again only when a point is added or the size changes."""
+        pytest.importorskip("plotille")
+        from listpick.pane.pane_utils import get_graph_string
+        x_vals, y_vals = RingBuffer(range(1000)), RingBuffer(i % 7 for i in range(1000))
+        graph = get_graph_string(x_vals, y_vals, width=40, height=20)
+        assert get_graph_string(x_vals, y_vals, width=40, height=20) is graph
+        assert get_graph_string(x_vals, y_vals, width=50, height=20) is not graph
+        x_vals.append(1000)
+        y_vals.append(3)
+        assert get_graph_string(x_vals, y_vals, width=40, height=20) is not graph
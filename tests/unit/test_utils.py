@@ -0,0 +1,99 @@
+"""
+Unit tests for utils.py module.
+
+Tests for display width calculation, truncation, clipping and the row string cache.
+"""
+import pytest
+from wcwidth import wcswidth
+from listpick.utils.utils import (
+    display_width,
+    truncate_to_display_width,
+    clip_left,
+    RowStringCache,
+)
+
+
+@pytest.fixture
+def strings():
+    """Strings with ASCII, wide and zero-width characters."""
+    return ["hello", "", "tab\there", "日本語", "café", "é", "mixed 日本 text"]
+
+
+class TestDisplayWidth:
+    """Test the display_width function."""
+
+    def test_matches_wcswidth(self, strings):
+        """Test that display_width gives the same result as wcswidth."""
+        for text in strings:
+            assert display_width(text) == wcswidth(text)
+
+
+class TestTruncateToDisplayWidth:
+    """Test the truncate_to_display_width function."""
+
+    def test_ascii_truncate_and_pad(self):
+        """Test truncating and padding ASCII strings."""
+        assert truncate_to_display_width("hello", 3) == "hel"
+        assert truncate_to_display_width("hi", 4) == "hi  "
+        assert truncate_to_display_width("hi", 4, centre=True) == " hi "
+        assert truncate_to_display_width("hello", -1) == ""
+
+    def test_wide_characters(self):
+        """Test that wide characters are not split."""
+        assert truncate_to_display_width("日本語", 5) == "日本 "
+        assert display_width(truncate_to_display_width("mixed 日本 text", 9)) == 9
+
+
+class TestClipLeft:
+    """Test the clip_left function."""
+
+    def test_ascii(self):
+        """Test clipping ASCII strings."""
+        assert clip_left("hello", 2) == "llo"
+        assert clip_left("hello", 0) == "hello"
+        assert clip_left("hello", 10) == ""
+
+    def test_wide_characters(self):
+        """Test clipping strings with wide characters."""
+        assert clip_left("日本語", 2) == "本語"
+        assert clip_left("日本語", 1) == "日本語"
+
+
+class TestRowStringCache:
+    """Test the RowStringCache class."""
+
+    def test_get_and_set(self):
+        """Test that cached strings are returned while the row is unchanged."""
+        cache = RowStringCache()
+        row = ["a", "b"]
+        cache.set(0, row, ("a b", "a b"))
+        assert cache.get(0, row) == ("a b", "a b")
+        assert cache.get(1, row) is None
+
+    def test_changed_row_is_invalidated(self):
+        """Test that an entry is discarded when its row changes."""
+        cache = RowStringCache()
+        row = ["a", "b"]
+        cache.set(0, row, ("a b", "a b"))
+        row[1] = "c"
+        assert cache.get(0, row) is None
+
+    def test_layout_change_clears_cache(self):
+        """Test that changing the layout clears the cache."""
+        cache = RowStringCache()
+        cache.set_layout((10, 0))
+        cache.set(0, ["a"], ("a", "a"))
+        cache.set_layout((10, 0))
+        assert cache.get(0, ["a"]) == ("a", "a")
+        cache.set_layout((10, 5))
+        assert cache.get(0, ["a"]) is None
+
+    def test_least_recently_used_row_is_evicted(self):
+        """Test that the least recently used row is evicted when the cache is full."""
+        cache = RowStringCache(max_size=2)
+        cache.set(0, ["a"], ("a", "a"))
+        cache.set(1, ["b"], ("b", "b"))
+        cache.get(0, ["a"])
+        cache.set(2, ["c"], ("c", "c"))
+        assert cache.get(1, ["b"]) is None
+        assert cache.get(0, ["a"]) == ("a", "a")